@@ -1,8 +1,23 @@
 from django.contrib import admin
 from .models import CasDeTest
+from .search import full_text_filter, uses_full_text
 
 @admin.register(CasDeTest)
 class CasDeTestAdmin(admin.ModelAdmin):
-    list_display = ("projet", "marco_scenario", "test_state", "prio", "criticality")
+    list_display = ("projet", "marco_scenario", "test_state", "prio", "criticality", "date_creation")
     list_filter = ("projet", "test_state", "prio", "criticality", "profile")
     search_fields = ("marco_scenario", "test_cases", "expected_result")
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # Liste : seules les colonnes affichées et filtrées sont lues, pas les champs texte
+        changelist = f'{self.opts.app_label}_{self.opts.model_name}_changelist'
+        if request.resolver_match and request.resolver_match.url_name == changelist:
+            return queryset.slim()
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        # PostgreSQL : index plein texte (GIN) plutôt que ILIKE sur les champs texte
+        if search_term.strip() and uses_full_text(queryset.db):
+            return full_text_filter(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
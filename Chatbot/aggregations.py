@@ -0,0 +1,378 @@
+"""
+Moteur d'agrégation des cas de test (tableaux croisés pour les heatmaps,
+résumés multi-dimensions en une requête GROUPING SETS)
+"""
+
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .filters import apply_filters, is_simple
+from .models import DIMENSION_FIELDS, CasDeTest, CasDeTestCount, CasDeTestDailyCount
+
+
+# Colonnes catégorielles de CasDeTest utilisables comme dimension
+CROSSTAB_FIELDS = DIMENSION_FIELDS
+
+
+def _count_query(fields, queryset=None, order_by=None, filters=None):
+    fields = list(fields)
+    if queryset is None and getattr(settings, 'CHART_USE_COUNTS_TABLE', True):
+        source = apply_filters(CasDeTestCount.objects.all(), filters)
+        rows = source.order_by().values(*fields).annotate(count=Sum('count'))
+    else:
+        if queryset is None:
+            queryset = CasDeTest.objects.all()
+        # COUNT(*) plutôt que COUNT(id) : l'index des colonnes groupées suffit
+        rows = apply_filters(queryset, filters).order_by().values(*fields).annotate(count=Count('*'))
+    if order_by:
+        rows = rows.order_by(*order_by) if isinstance(order_by, (list, tuple)) else rows.order_by(order_by)
+    return rows
+
+
+def count_by(fields, queryset=None, order_by=None, filters=None):
+    """
+    Comptes de cas de test groupés par `fields` : liste de dicts avec une clé 'count'.
+
+    Sans queryset explicite, la lecture se fait dans la table agrégée
+    CasDeTestCount (quelques centaines de lignes, quelle que soit la taille
+    de CasDeTest). Un queryset explicite (fenêtre de dates...) est agrégé
+    directement sur CasDeTest. `filters` (forme normalisée de
+    filters.parse_filters) devient la clause WHERE de la requête.
+    """
+    return list(_count_query(fields, queryset, order_by, filters))
+
+
+async def acount_by(fields, queryset=None, order_by=None, filters=None):
+    """Variante asynchrone de count_by (ORM asynchrone)"""
+    return [row async for row in _count_query(fields, queryset, order_by, filters)]
+
+
+# Granularités des séries temporelles
+PERIOD_TRUNCS = {
+    'month': TruncMonth,
+    'week': TruncWeek,
+}
+
+
+def _period_query(granularity='month', start=None, end=None, filters=None):
+    trunc = PERIOD_TRUNCS[granularity]
+    if not filters and getattr(settings, 'CHART_USE_COUNTS_TABLE', True):
+        # Compteurs journaliers : fenêtre arrondie aux jours entiers
+        rows = CasDeTestDailyCount.objects.all()
+        if start:
+            rows = rows.filter(day__gte=start.date() if hasattr(start, 'date') else start)
+        if end:
+            rows = rows.filter(day__lte=end.date() if hasattr(end, 'date') else end)
+        rows = rows.annotate(periode=trunc('day')).values('periode').annotate(count=Sum('count'))
+    else:
+        rows = apply_filters(CasDeTest.objects.all(), filters)
+        if start:
+            rows = rows.filter(date_creation__gte=start)
+        if end:
+            rows = rows.filter(date_creation__lte=end)
+        rows = rows.annotate(periode=trunc('date_creation')).values('periode').annotate(count=Count('*'))
+    return rows.order_by('periode')
+
+
+def _period_row(row):
+    # TruncMonth d'un DateTimeField renvoie un datetime : même type (date) pour les deux sources
+    periode = row['periode']
+    return {'periode': periode.date() if hasattr(periode, 'date') else periode, 'count': row['count']}
+
+
+def count_by_period(granularity='month', start=None, end=None, filters=None):
+    """
+    Nombre de cas de test créés par mois ou par semaine ('month', 'week'),
+    entre `start` et `end` : liste de dicts {'periode': date, 'count'}.
+
+    Sans filtre, la série est agrégée depuis CasDeTestDailyCount (un compteur
+    par jour, quelle que soit la taille de l'historique) ; avec filtres, sur
+    CasDeTest via l'index de date_creation.
+    """
+    return [_period_row(row) for row in _period_query(granularity, start, end, filters)]
+
+
+async def acount_by_period(granularity='month', start=None, end=None, filters=None):
+    """Variante asynchrone de count_by_period"""
+    return [_period_row(row) async for row in _period_query(granularity, start, end, filters)]
+
+
+def dimension_grouping_sets(dimensions=DIMENSION_FIELDS, depth=2):
+    """
+    Regroupements d'un résumé : total, chaque dimension seule et toutes les
+    combinaisons jusqu'à `depth` dimensions (depth=len(dimensions) : CUBE).
+    """
+    dimensions = tuple(dimensions)
+    return [
+        fields
+        for size in range(min(depth, len(dimensions)) + 1)
+        for fields in combinations(dimensions, size)
+    ]
+
+
+def summarize(grouping_sets=None, filters=None, queryset=None):
+    """
+    Comptes de plusieurs regroupements en un seul aller-retour, sous forme
+    de CountSummary.
+
+    `grouping_sets` : liste de tuples de colonnes, ex. [('prio',), ('projet',),
+    ('prio', 'criticality')] ; par défaut toutes les dimensions et leurs paires
+    (voir dimension_grouping_sets). `filters` : filtre normalisé (voir
+    filters.parse_filters) appliqué à tous les regroupements.
+
+    Sous PostgreSQL une requête GROUP BY GROUPING SETS ; ailleurs (SQLite)
+    un GROUP BY au grain le plus fin, agrégé ensuite avec pandas.
+    """
+    if grouping_sets is None:
+        grouping_sets = dimension_grouping_sets()
+    grouping_sets = list(dict.fromkeys(tuple(fields) for fields in grouping_sets))
+    columns = list(dict.fromkeys(field for fields in grouping_sets for field in fields))
+    if not columns:
+        raise ValueError("Au moins une dimension est nécessaire")
+    for field_name in columns:
+        if field_name not in DIMENSION_FIELDS:
+            raise ValueError(f"Dimension non supportée: {field_name}")
+
+    use_counts_table = queryset is None and getattr(settings, 'CHART_USE_COUNTS_TABLE', True)
+    if use_counts_table:
+        source = CasDeTestCount.objects.all()
+    else:
+        source = queryset if queryset is not None else CasDeTest.objects.all()
+    source = apply_filters(source, filters)
+
+    if connections[source.db].vendor == 'postgresql':
+        return CountSummary(_grouping_sets_sql(source, grouping_sets, columns, use_counts_table), filters)
+
+    # Repli portable : grain le plus fin puis agrégation de chaque regroupement
+    measure = Sum('count') if use_counts_table else Count('*')
+    finest = pd.DataFrame.from_records(
+        list(source.order_by().values_list(*columns).annotate(n=measure)),
+        columns=[*columns, 'count'],
+    )
+    return CountSummary.from_frame(finest, grouping_sets, filters)
+
+
+def _grouping_sets_sql(source, grouping_sets, columns, use_counts_table):
+    """Exécute la requête GROUPING SETS ; retourne les tables colonnaires"""
+    connection = connections[source.db]
+    quote = connection.ops.quote_name
+    inner = source.order_by().values(*columns, *(['count'] if use_counts_table else []))
+    inner_sql, params = inner.query.sql_with_params()
+
+    column_sql = ', '.join(f'source.{quote(name)}' for name in columns)
+    measure = f'SUM(source.{quote("count")})' if use_counts_table else 'COUNT(*)'
+    sets_sql = ', '.join(
+        '(' + ', '.join(f'source.{quote(name)}' for name in fields) + ')' for fields in grouping_sets
+    )
+    sql = (
+        f'SELECT {column_sql}, GROUPING({column_sql}), {measure} '
+        f'FROM ({inner_sql}) AS source GROUP BY GROUPING SETS ({sets_sql})'
+    )
+
+    # GROUPING() : un bit par colonne (la première est le bit de poids fort),
+    # à 1 quand la colonne ne fait pas partie du regroupement de la ligne
+    width = len(columns)
+    masks = {
+        sum(1 << (width - 1 - i) for i, name in enumerate(columns) if name not in fields): fields
+        for fields in grouping_sets
+    }
+    positions = {name: i for i, name in enumerate(columns)}
+    decoders = [getattr(CasDeTest._meta.get_field(name), 'decode', None) for name in columns]
+
+    tables = {fields: _empty_table(fields) for fields in grouping_sets}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for *values, mask, n in cursor.fetchall():
+            fields = masks[mask]
+            table = tables[fields]
+            for name in fields:
+                value, decode = values[positions[name]], decoders[positions[name]]
+                table[name].append(decode(value) if decode else value)
+            table['count'].append(int(n))
+    return tables
+
+
+def _empty_table(fields):
+    return {**{name: [] for name in fields}, 'count': []}
+
+
+class CountSummary:
+    """
+    Résumé colonnaire des comptes de cas de test.
+
+    Une table par regroupement : {('prio', 'criticality'): {'prio': [...],
+    'criticality': [...], 'count': [...]}, ...}. Les graphiques découpent le
+    résumé (filtres, agrégation d'un regroupement plus fin) sans retourner
+    en base ; il se met en cache tel quel. `filters` : filtres déjà appliqués
+    à la source du résumé.
+    """
+
+    def __init__(self, tables, filters=None):
+        self.tables = tables
+        self.filters = dict(filters or {})
+
+    @classmethod
+    def from_frame(cls, frame, grouping_sets, filters=None):
+        """Résumé à partir d'un DataFrame au grain le plus fin (colonnes + 'count')"""
+        tables = {}
+        for fields in grouping_sets:
+            if not fields:
+                tables[fields] = {'count': [int(frame['count'].sum())]}
+                continue
+            grouped = frame.groupby(list(fields), dropna=False, sort=False)['count'].sum().reset_index()
+            grouped = grouped.astype(object).where(grouped.notna(), None)
+            tables[fields] = {name: grouped[name].tolist() for name in (*fields, 'count')}
+            tables[fields]['count'] = [int(n) for n in tables[fields]['count']]
+        return cls(tables, filters)
+
+    @property
+    def grouping_sets(self):
+        return list(self.tables)
+
+    @property
+    def total(self):
+        fields = min(self.tables, key=len)
+        return sum(self.tables[fields]['count'])
+
+    def _pending(self, filters):
+        """
+        Conditions restant à appliquer : celles de la source sont déjà prises
+        en compte (et le restent même si `filters` les omet). Seules des
+        appartenances se découpent dans le résumé.
+        """
+        filters = filters or {}
+        if filters == self.filters:
+            return {}
+        if not (is_simple(filters) and is_simple(self.filters)):
+            raise KeyError("Filtre non découpable dans le résumé")
+        return {name: values for name, values in filters.items() if values != self.filters.get(name)}
+
+    def covers(self, fields, filters=None):
+        """Vrai si le résumé peut servir `fields` restreint à `filters`"""
+        try:
+            columns = {*fields, *self._pending(filters)}
+        except KeyError:
+            return False
+        return any(columns <= set(stored) for stored in self.tables)
+
+    def _source(self, columns):
+        """Regroupement stocké le plus petit qui contient `columns`"""
+        candidates = [fields for fields in self.tables if set(columns) <= set(fields)]
+        if not candidates:
+            raise KeyError(f"Regroupement absent du résumé: {', '.join(columns)}")
+        return min(candidates, key=lambda fields: (len(fields), len(self.tables[fields]['count'])))
+
+    def rows(self, fields, filters=None, order_by=None):
+        """
+        Lignes groupées par `fields` (mêmes dicts que count_by), restreintes
+        à `filters` ({colonne: [valeurs]}) et ordonnées comme `order_by`
+        """
+        fields = tuple(fields)
+        filters = self._pending(filters)
+        table = self.tables[self._source((*fields, *filters))]
+
+        keep = [True] * len(table['count'])
+        for name, values in filters.items():
+            allowed = set(values)
+            keep = [kept and value in allowed for kept, value in zip(keep, table[name])]
+
+        totals = Counter()
+        keys = zip(*(table[name] for name in fields)) if fields else [()] * len(table['count'])
+        for key, n, kept in zip(keys, table['count'], keep):
+            if kept:
+                totals[key] += n
+        rows = [dict(zip(fields, key), count=n) for key, n in totals.items()]
+        return order_rows(rows, order_by) if order_by else rows
+
+    def counts(self, field_name, filters=None):
+        """{modalité: compte} d'une dimension"""
+        return {row[field_name]: row['count'] for row in self.rows((field_name,), filters)}
+
+    def crosstab(self, row_field, col_field, filters=None, row_labels=None, col_labels=None):
+        """Matrice de comptes (voir crosstab) découpée dans le résumé"""
+        _check_crosstab_fields(row_field, col_field)
+        rows = self.rows((row_field, col_field), filters)
+        return crosstab_matrix(row_field, col_field, rows, row_labels, col_labels)
+
+
+def order_rows(rows, order_by):
+    """Ordonne des lignes de comptes comme `queryset.order_by(order_by)`"""
+    descending = order_by.startswith('-')
+    column = order_by.lstrip('-')
+    if column == 'count':
+        return sorted(rows, key=lambda row: row['count'], reverse=descending)
+    # Colonne à choix : ordre des choices (ordre des codes en base)
+    rank = {label: i for i, label in enumerate(dimension_labels(column, (row[column] for row in rows)))}
+    return sorted(rows, key=lambda row: rank.get(row[column], len(rank)), reverse=descending)
+
+
+def dimension_labels(field_name, observed=()):
+    """
+    Retourne les modalités d'une dimension dans l'ordre d'affichage.
+    Pour un champ à choix, l'ordre des `choices` du modèle fait foi ;
+    sinon on trie les valeurs observées.
+    """
+    field = CasDeTest._meta.get_field(field_name)
+    if field.choices:
+        return [value for value, _ in field.choices]
+    return sorted({value for value in observed if value is not None})
+
+
+def crosstab(row_field, col_field, queryset=None, row_labels=None, col_labels=None, filters=None):
+    """
+    Construit la matrice N×M des comptes sur deux colonnes de CasDeTest
+    en un seul aller-retour `values(a, b).annotate(Count)` (voir count_by).
+
+    Retourne (row_labels, col_labels, matrix) où `matrix` est un tableau
+    NumPy d'entiers de forme (len(row_labels), len(col_labels)).
+    """
+    _check_crosstab_fields(row_field, col_field)
+    rows = count_by((row_field, col_field), queryset, filters=filters)
+    return crosstab_matrix(row_field, col_field, rows, row_labels, col_labels)
+
+
+async def acrosstab(row_field, col_field, queryset=None, row_labels=None, col_labels=None, filters=None):
+    """Variante asynchrone de crosstab"""
+    _check_crosstab_fields(row_field, col_field)
+    rows = await acount_by((row_field, col_field), queryset, filters=filters)
+    return crosstab_matrix(row_field, col_field, rows, row_labels, col_labels)
+
+
+def _check_crosstab_fields(*field_names):
+    for field_name in field_names:
+        if field_name not in CROSSTAB_FIELDS:
+            raise ValueError(f"Dimension non supportée: {field_name}")
+
+
+def crosstab_matrix(row_field, col_field, rows, row_labels=None, col_labels=None):
+    """Matrice des comptes à partir des lignes groupées de count_by"""
+    rows = [(row[row_field], row[col_field], row['count']) for row in rows]
+
+    if row_labels is None:
+        row_labels = dimension_labels(row_field, (r for r, _, _ in rows))
+    if col_labels is None:
+        col_labels = dimension_labels(col_field, (c for _, c, _ in rows))
+
+    row_index = {label: i for i, label in enumerate(row_labels)}
+    col_index = {label: j for j, label in enumerate(col_labels)}
+
+    matrix = np.zeros((len(row_labels), len(col_labels)), dtype=np.int64)
+    if rows:
+        # Les couples hors des modalités demandées sont ignorés
+        kept = [
+            (row_index[r], col_index[c], n)
+            for r, c, n in rows
+            if r in row_index and c in col_index
+        ]
+        if kept:
+            i, j, n = np.array(kept, dtype=np.int64).T
+            np.add.at(matrix, (i, j), n)
+
+    return list(row_labels), list(col_labels), matrix
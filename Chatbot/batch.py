@@ -0,0 +1,88 @@
+"""
+Planification groupée des graphiques d'un tableau de bord
+
+Chaque widget est décrit par une dimension (clé du registre, alias de
+groupby ou colonne), un type de graphique optionnel et des filtres (voir
+filters.parse_filters). Les
+widgets sont découpés dans le résumé du tableau de bord quand il les couvre ;
+les autres, regroupés par filtres, sont calculés ensemble par une seule
+requête GROUPING SETS (voir aggregations.summarize).
+"""
+
+import json
+
+from .aggregations import summarize
+from .charts import CHART_REGISTRY, GROUPBY_COLUMNS, dashboard_summary
+from .filters import FilterError, parse_filters
+from .models import DIMENSION_FIELDS
+
+
+# Graphique du registre associé à chaque colonne (première entrée qui l'utilise)
+COLUMN_CHARTS = {}
+for _key, _spec in CHART_REGISTRY.items():
+    if 'column' in _spec:
+        COLUMN_CHARTS.setdefault(_spec['column'], _key)
+
+CHART_TYPES = ('bar', 'line', 'pie', 'doughnut', 'radar', 'polarArea')
+
+# Nombre maximal de widgets par lot
+MAX_BATCH_SIZE = 50
+
+
+class WidgetError(ValueError):
+    """Description de widget invalide (dimension, type ou filtre inconnu)"""
+
+
+def resolve_widget(item):
+    """
+    Normalise la description d'un widget. Retourne
+    {'key', 'fields', 'chart_type', 'filters'} ; 'key' vaut 'matrice' pour
+    une heatmap (colonnes 'rows' × 'cols').
+    """
+    if not isinstance(item, dict):
+        raise WidgetError('Widget invalide : objet JSON attendu')
+    dimension = str(item.get('dimension', '')).strip()
+    try:
+        filters = parse_filters(item.get('filters'))
+    except FilterError as e:
+        raise WidgetError(str(e))
+
+    if dimension == 'matrice':
+        row_field = GROUPBY_COLUMNS.get(item.get('rows', 'prio'), item.get('rows'))
+        col_field = GROUPBY_COLUMNS.get(item.get('cols', 'criticality'), item.get('cols'))
+        if row_field not in DIMENSION_FIELDS or col_field not in DIMENSION_FIELDS:
+            raise WidgetError(f"Dimensions non supportées: {item.get('rows')} × {item.get('cols')}")
+        return {'key': 'matrice', 'fields': (row_field, col_field), 'chart_type': 'heatmap', 'filters': filters}
+
+    key = dimension if dimension in CHART_REGISTRY else COLUMN_CHARTS.get(GROUPBY_COLUMNS.get(dimension, dimension))
+    if key is None:
+        raise WidgetError(f"Dimension inconnue: {dimension}")
+    spec = CHART_REGISTRY[key]
+    chart_type = item.get('chart_type') or spec['chart_type']
+    if chart_type not in CHART_TYPES:
+        raise WidgetError(f"Type de graphique non supporté: {chart_type}")
+    return {'key': key, 'fields': (spec['column'],), 'chart_type': chart_type, 'filters': filters}
+
+
+def widget_summaries(widgets):
+    """
+    Résumé de comptes à découper pour chaque widget (liste alignée sur
+    `widgets`). Le résumé du tableau de bord (dimensions et paires) sert
+    les widgets qu'il couvre, filtres compris ; pour les autres, une requête
+    par jeu de filtres distinct, tous regroupements confondus.
+    """
+    dashboard = dashboard_summary()
+    summaries = [None] * len(widgets)
+    groups = {}
+    for position, widget in enumerate(widgets):
+        if dashboard.covers(widget['fields'], widget['filters']):
+            summaries[position] = dashboard
+            continue
+        group_key = json.dumps(widget['filters'], sort_keys=True)
+        groups.setdefault(group_key, (widget['filters'], []))[1].append(position)
+
+    for filters, positions in groups.values():
+        summary = summarize([widgets[position]['fields'] for position in positions], filters=filters)
+        for position in positions:
+            summaries[position] = summary
+    return summaries
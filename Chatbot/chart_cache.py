@@ -0,0 +1,150 @@
+"""
+Cache versionné des graphiques calculés sur CasDeTest
+
+Chaque entrée est indexée par (dimension, filtres, type de graphique) et par
+le numéro de version des données. Toute écriture sur CasDeTest (save, delete,
+opérations en masse) incrémente ce numéro : les anciennes entrées ne sont
+plus jamais lues et expirent d'elles-mêmes. Tant que les données ne changent
+pas, un graphique est servi en O(1) sans toucher PostgreSQL.
+
+La version est publiée au commit de la transaction d'écriture (un lecteur
+concurrent ne peut pas mettre en cache des données d'avant le commit sous la
+nouvelle version) et tenue dans un cache partagé entre processus
+(CHART_VERSION_CACHE_ALIAS : base de données, Redis, Memcached) : les
+écritures des commandes de gestion invalident aussi les caches des workers
+web. Un cache local au processus est refusé au démarrage (voir checks.py).
+"""
+
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+VERSION_KEY = 'casdetest:data_version'
+
+
+def _cache():
+    return caches[getattr(settings, 'CHART_RESULT_CACHE_ALIAS', 'default')]
+
+
+def version_cache_alias():
+    return getattr(settings, 'CHART_VERSION_CACHE_ALIAS', getattr(settings, 'CHART_RESULT_CACHE_ALIAS', 'default'))
+
+
+def _version_cache():
+    return caches[version_cache_alias()]
+
+
+def _new_version():
+    # Jeton unique plutôt qu'incr() : incr n'est pas atomique sur tous les
+    # backends (get puis set), deux écritures concurrentes pourraient publier
+    # la même version
+    return uuid.uuid4().hex
+
+
+def get_data_version():
+    """Version courante des données CasDeTest (nouvelle si la clé a expiré)"""
+    return _version_cache().get_or_set(VERSION_KEY, _new_version, timeout=None)
+
+
+def publish_data_version():
+    """Publie immédiatement une nouvelle version des données"""
+    version = _new_version()
+    _version_cache().set(VERSION_KEY, version, timeout=None)
+    return version
+
+
+def bump_data_version(using=None, **kwargs):
+    """
+    Invalide tous les graphiques en cache (appelé à chaque écriture sur
+    CasDeTest) : au commit de la transaction en cours sur `using`, ou tout
+    de suite hors transaction
+    """
+    transaction.on_commit(publish_data_version, using=using)
+
+
+async def aget_data_version():
+    """Version courante des données CasDeTest (vues asynchrones)"""
+    return await _version_cache().aget_or_set(VERSION_KEY, _new_version, timeout=None)
+
+
+def _chart_digest(dimension, filters, chart_type):
+    payload = json.dumps([dimension, filters or {}, chart_type], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def chart_cache_key(dimension, filters=None, chart_type=None):
+    return f'chart:{get_data_version()}:{_chart_digest(dimension, filters, chart_type)}'
+
+
+def is_error_chart(chart_data):
+    """Les graphiques de repli ne doivent pas être mis en cache"""
+    return chart_data.get('data', {}).get('labels') == ['Erreur']
+
+
+def cached_chart(dimension, filters, chart_type, builder):
+    """
+    Retourne le graphique en cache pour (dimension, filtres, type) à la
+    version courante des données, sinon le calcule avec `builder()`
+    """
+    cache = _cache()
+    key = chart_cache_key(dimension, filters, chart_type)
+    chart_data = cache.get(key)
+    if chart_data is None:
+        chart_data = builder()
+        if not is_error_chart(chart_data):
+            cache.set(key, chart_data, timeout=getattr(settings, 'CHART_RESULT_CACHE_TTL', 24 * 3600))
+    return chart_data
+
+
+def cached_charts(entries, builder):
+    """
+    Variante groupée de cached_chart pour une liste de (dimension, filtres,
+    type). Une lecture get_many ; `builder(positions)` calcule en une fois
+    les graphiques absents et retourne {position: graphique}.
+    """
+    cache = _cache()
+    version = get_data_version()
+    keys = [f'chart:{version}:{_chart_digest(*entry)}' for entry in entries]
+    found = cache.get_many(keys)
+    charts = [found.get(key) for key in keys]
+    missing = [position for position, chart_data in enumerate(charts) if chart_data is None]
+    if missing:
+        built = builder(missing)
+        cache.set_many(
+            {keys[position]: chart_data for position, chart_data in built.items() if not is_error_chart(chart_data)},
+            timeout=getattr(settings, 'CHART_RESULT_CACHE_TTL', 24 * 3600),
+        )
+        for position, chart_data in built.items():
+            charts[position] = chart_data
+    return charts
+
+
+def cached_summary(name, filters, builder):
+    """
+    Résumé de comptes (aggregations.CountSummary) en cache à la version
+    courante des données, sinon calculé avec `builder()`
+    """
+    cache = _cache()
+    key = f'summary:{get_data_version()}:{_chart_digest(name, filters, None)}'
+    summary = cache.get(key)
+    if summary is None:
+        summary = builder()
+        cache.set(key, summary, timeout=getattr(settings, 'CHART_RESULT_CACHE_TTL', 24 * 3600))
+    return summary
+
+
+async def acached_chart(dimension, filters, chart_type, builder):
+    """Variante asynchrone de cached_chart : `builder` est une coroutine"""
+    cache = _cache()
+    key = f'chart:{await aget_data_version()}:{_chart_digest(dimension, filters, chart_type)}'
+    chart_data = await cache.aget(key)
+    if chart_data is None:
+        chart_data = await builder()
+        if not is_error_chart(chart_data):
+            await cache.aset(key, chart_data, timeout=getattr(settings, 'CHART_RESULT_CACHE_TTL', 24 * 3600))
+    return chart_data
@@ -0,0 +1,342 @@
+"""
+Registre déclaratif des graphiques par dimension de CasDeTest
+et routage des requêtes utilisateur par mots-clés
+"""
+
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+
+from .aggregations import acount_by, count_by, summarize
+from .chart_cache import acached_chart, cached_chart, cached_summary
+
+logger = logging.getLogger(__name__)
+
+
+# Palettes partagées
+LEVEL_COLORS = {
+    'High': '#e74c3c',    # Rouge
+    'Medium': '#f39c12',  # Orange
+    'Low': '#27ae60'      # Vert
+}
+STATE_COLORS = {
+    'OK': '#27ae60',           # Vert
+    'KO': '#e74c3c',           # Rouge
+    'KO JDD': '#c0392b',       # Rouge foncé
+    'In Progress': '#f39c12',  # Orange
+    'Not Started': '#95a5a6',  # Gris
+    'Blocked': '#8e44ad',      # Violet
+    'N/A': '#34495e'           # Gris foncé
+}
+CATEGORY_PALETTE = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22', '#34495e']
+DEFAULT_COLOR = '#3498db'
+ERROR_COLOR = '#ff6b6b'
+
+
+# Une entrée par graphique. L'ordre des entrées fixe la priorité du routage :
+# si une requête contient des mots-clés de plusieurs entrées, la première gagne.
+CHART_REGISTRY = {
+    'matrice': {
+        'keywords': ['matrice', 'priorité/criticité', 'priorite/criticite', 'heatmap'],
+        'is_heatmap': True,
+    },
+    'priorite': {
+        'keywords': ['priorité', 'priorite', 'priority', 'prio'],
+        'column': 'prio',
+        'chart_type': 'bar',
+        'order_by': '-count',
+        'color_map': LEVEL_COLORS,
+        'title': 'Répartition par Priorité',
+        'description': 'Nombre de cas de test par niveau de priorité',
+        'chart_title': 'Répartition des Cas de Test par Priorité',
+        'x_label': 'Niveau de priorité',
+        'legend': {'display': False},
+    },
+    'projet': {
+        'keywords': ['projet', 'project'],
+        'column': 'projet',
+        'chart_type': 'pie',
+        'order_by': '-count',
+        'palette': CATEGORY_PALETTE,
+        'title': 'Répartition par Projet',
+        'description': 'Nombre de cas de test par projet',
+        'chart_title': 'Répartition des Cas de Test par Projet',
+    },
+    'statut': {
+        'keywords': ['statut', 'status'],
+        'column': 'test_state',
+        'chart_type': 'bar',
+        'order_by': '-count',
+        'color_map': STATE_COLORS,
+        'title': 'Répartition par Statut',
+        'description': 'Nombre de cas de test par statut',
+        'chart_title': 'Répartition des Cas de Test par Statut',
+        'x_label': 'Statut du test',
+        'legend': {'display': False},
+    },
+    'perimetre': {
+        'keywords': ['périmètre', 'perimetre', 'perimeter'],
+        'column': 'test_perimeter',
+        'chart_type': 'doughnut',
+        'order_by': '-count',
+        'palette': CATEGORY_PALETTE,
+        'border_color': '#ffffff',
+        'title': 'Répartition par Périmètre de Test',
+        'description': 'Nombre de cas de test par périmètre de test',
+        'chart_title': 'Répartition des Cas de Test par Périmètre',
+        'legend': {'position': 'right'},
+    },
+    'etat': {
+        'keywords': ['état', 'etat', 'state'],
+        'column': 'test_state',
+        'chart_type': 'bar',
+        'order_by': 'test_state',
+        'color_map': STATE_COLORS,
+        'title': 'Répartition par État des Tests',
+        'description': 'Nombre de cas de test par état des tests',
+        'chart_title': 'Répartition des Cas de Test par État',
+        'x_label': 'État du test',
+        'legend': {'display': False},
+    },
+    'profil': {
+        'keywords': ['profil', 'profile'],
+        'column': 'profile',
+        'chart_type': 'pie',
+        'order_by': '-count',
+        'palette': ['#e74c3c', '#3498db', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c'],
+        'border_color': '#ffffff',
+        'title': 'Répartition par Profil',
+        'description': 'Nombre de cas de test par profil',
+        'chart_title': 'Répartition des Cas de Test par Profil',
+        'legend': {'position': 'bottom'},
+    },
+    'criticite': {
+        'keywords': ['criticité', 'criticite', 'criticality'],
+        'column': 'criticality',
+        'chart_type': 'bar',
+        'order_by': 'criticality',
+        'color_map': LEVEL_COLORS,
+        'title': 'Répartition par Criticité',
+        'description': 'Nombre de cas de test par niveau de criticité',
+        'chart_title': 'Répartition des Cas de Test par Criticité',
+        'x_label': 'Niveau de criticité',
+        'legend': {'display': False},
+    },
+}
+
+# Valeurs de `groupby` renvoyées par l'analyse Mistral → colonne de CasDeTest
+GROUPBY_COLUMNS = {
+    'test_state': 'test_state',
+    'état': 'test_state',
+    'statut': 'test_state',
+    'projet': 'projet',
+    'périmètre': 'test_perimeter',
+    'test_perimeter': 'test_perimeter',
+    'profil': 'profile',
+    'profile': 'profile',
+    'priorité': 'prio',
+    'prio': 'prio',
+    'criticité': 'criticality',
+    'criticality': 'criticality',
+}
+
+# Valeurs de `groupby` désignant une série temporelle des créations
+GROUPBY_PERIODS = {
+    'mois': 'month',
+    'mensuel': 'month',
+    'month': 'month',
+    'semaine': 'week',
+    'hebdomadaire': 'week',
+    'week': 'week',
+}
+
+# Valeurs de `groupby` désignant l'évolution des comptes d'une dimension
+# (photographies CasDeTestSnapshot, voir snapshots.py)
+GROUPBY_HISTORY = ('historique', 'évolution', 'history')
+
+# Granularité des courbes d'évolution selon la période demandée
+HISTORY_GRANULARITIES = {
+    '1_mois': 'day',
+    '3_mois': 'day',
+    '6_mois': 'week',
+    '1_an': 'week',
+    'tout': 'month',
+}
+
+
+# Matcher compilé une seule fois à l'import : une alternance unique, les
+# mots-clés les plus longs d'abord pour que 'profile' l'emporte sur 'profil'.
+_CHART_RANK = {key: rank for rank, key in enumerate(CHART_REGISTRY)}
+_KEYWORD_OWNER = {
+    keyword: key
+    for key in reversed(list(CHART_REGISTRY))
+    for keyword in CHART_REGISTRY[key]['keywords']
+}
+_KEYWORD_PATTERN = re.compile(
+    '|'.join(re.escape(keyword) for keyword in sorted(_KEYWORD_OWNER, key=len, reverse=True))
+)
+
+
+def match_chart(user_query):
+    """
+    Retourne la clé du registre correspondant à la requête, ou None.
+    Un seul passage sur le texte ; l'entrée la plus prioritaire l'emporte.
+    """
+    best = None
+    for match in _KEYWORD_PATTERN.finditer(user_query.lower()):
+        rank = _CHART_RANK[_KEYWORD_OWNER[match.group(0)]]
+        if best is None or rank < best:
+            best = rank
+            if best == 0:
+                break
+    if best is None:
+        return None
+    return list(CHART_REGISTRY)[best]
+
+
+def error_chart(chart_type='bar'):
+    """Graphique de repli affiché quand la génération échoue"""
+    return {
+        'type': chart_type,
+        'data': {
+            'labels': ['Erreur'],
+            'datasets': [{
+                'label': 'Erreur de génération',
+                'data': [0],
+                'backgroundColor': [ERROR_COLOR]
+            }]
+        }
+    }
+
+
+def chart_colors(spec, labels):
+    """Couleurs des barres/secteurs selon la configuration de la dimension"""
+    if 'color_map' in spec:
+        return [spec['color_map'].get(label, DEFAULT_COLOR) for label in labels]
+    return spec['palette'][:len(labels)]
+
+
+def build_chart(spec, labels, values):
+    """Assemble la configuration Chart.js d'une dimension à partir des comptes"""
+    if labels:
+        colors = chart_colors(spec, labels)
+    else:
+        # Données par défaut si la base est vide
+        labels, values, colors = ['Aucune donnée'], [0], [ERROR_COLOR]
+
+    dataset = {
+        'label': 'Nombre de cas de test',
+        'data': values,
+        'backgroundColor': colors,
+        'borderWidth': 2,
+    }
+    if 'border_color' in spec:
+        dataset['borderColor'] = spec['border_color']
+    elif 'color_map' in spec:
+        dataset['borderColor'] = colors
+
+    plugins = {
+        'title': {
+            'display': True,
+            'text': spec['chart_title']
+        }
+    }
+    if 'legend' in spec:
+        plugins['legend'] = spec['legend']
+
+    options = {'responsive': True, 'plugins': plugins}
+    if 'x_label' in spec:
+        options['scales'] = {
+            'y': {
+                'beginAtZero': True,
+                'title': {'display': True, 'text': 'Nombre de cas'}
+            },
+            'x': {
+                'title': {'display': True, 'text': spec['x_label']}
+            }
+        }
+
+    return {
+        'type': spec['chart_type'],
+        'data': {
+            'labels': labels,
+            'datasets': [dataset]
+        },
+        'options': options
+    }
+
+
+def dashboard_summary(filters=None):
+    """
+    Résumé de toutes les dimensions et de leurs paires (une requête
+    GROUPING SETS), en cache jusqu'à la prochaine écriture sur CasDeTest.
+    Les graphiques par dimension et les matrices y sont découpés.
+    """
+    return cached_summary('dashboard', filters, lambda: summarize(filters=filters))
+
+
+adashboard_summary = sync_to_async(dashboard_summary)
+
+
+def generate_dimension_chart(key, queryset=None, filters=None):
+    """
+    Génère le graphique Chart.js d'une entrée du registre.
+    Sans queryset explicite, le graphique est découpé dans le résumé du
+    tableau de bord et servi par le cache versionné ; sinon une requête
+    GROUP BY sur le queryset. `filters` (forme normalisée de
+    filters.parse_filters) fait partie de la clé de cache ; un filtre que
+    le résumé ne couvre pas devient la clause WHERE d'un GROUP BY.
+    """
+    spec = CHART_REGISTRY[key]
+    if queryset is None:
+        return cached_chart(
+            key, filters, spec['chart_type'], lambda: _build_dimension_chart(key, spec, None, filters)
+        )
+    return _build_dimension_chart(key, spec, queryset, filters)
+
+
+async def agenerate_dimension_chart(key, queryset=None, filters=None):
+    """Variante asynchrone de generate_dimension_chart (ORM et cache asynchrones)"""
+    spec = CHART_REGISTRY[key]
+    if queryset is None:
+        return await acached_chart(
+            key, filters, spec['chart_type'], lambda: _abuild_dimension_chart(key, spec, None, filters)
+        )
+    return await _abuild_dimension_chart(key, spec, queryset, filters)
+
+
+def _build_dimension_chart(key, spec, queryset, filters=None):
+    try:
+        columns = [spec['column']]
+        summary = dashboard_summary() if queryset is None else None
+        if summary is not None and summary.covers(columns, filters):
+            data = summary.rows(columns, filters, order_by=spec['order_by'])
+        else:
+            data = count_by(columns, queryset, order_by=spec['order_by'], filters=filters)
+        return chart_from_rows(spec, data)
+    except Exception:
+        logger.exception("Erreur dans generate_dimension_chart(%s)", key)
+        return error_chart(spec['chart_type'])
+
+
+async def _abuild_dimension_chart(key, spec, queryset, filters=None):
+    try:
+        columns = [spec['column']]
+        summary = await adashboard_summary() if queryset is None else None
+        if summary is not None and summary.covers(columns, filters):
+            data = summary.rows(columns, filters, order_by=spec['order_by'])
+        else:
+            data = await acount_by(columns, queryset, order_by=spec['order_by'], filters=filters)
+        return chart_from_rows(spec, data)
+    except Exception:
+        logger.exception("Erreur dans agenerate_dimension_chart(%s)", key)
+        return error_chart(spec['chart_type'])
+
+
+def chart_from_rows(spec, data):
+    """Graphique Chart.js d'une dimension à partir des lignes de count_by (déjà ordonnées)"""
+    column = spec['column']
+    labels = [item[column] for item in data]
+    values = [item['count'] for item in data]
+    return build_chart(spec, labels, values)
@@ -0,0 +1,48 @@
+"""
+Vérifications au démarrage (python manage.py check)
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .chart_cache import version_cache_alias
+from .llm import llm_setting
+
+
+# Backends dont le contenu n'est pas partagé entre processus
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_version_cache(app_configs, **kwargs):
+    """La version des données CasDeTest doit être vue par tous les processus"""
+    alias = version_cache_alias()
+    if alias not in settings.CACHES:
+        return [Error(
+            f"CHART_VERSION_CACHE_ALIAS désigne un cache inconnu: '{alias}'",
+            id='Chatbot.E001',
+        )]
+    backend = settings.CACHES[alias].get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f"Le cache '{alias}' de la version des données CasDeTest est local au processus ({backend}) : "
+            "les écritures des autres processus (commandes, workers) n'invalideraient pas les graphiques.",
+            hint="Utiliser un cache partagé : DatabaseCache (python manage.py createcachetable), Redis ou Memcached.",
+            id='Chatbot.E002',
+        )]
+    return []
+
+
+@register()
+def check_mistral_api_key(app_configs, **kwargs):
+    """Le repli Mistral échouerait à la première requête non reconnue"""
+    if llm_setting('LLM_BACKEND') == 'mistral' and not llm_setting('MISTRAL_API_KEY'):
+        return [Warning(
+            "MISTRAL_API_KEY n'est pas définie : les requêtes non reconnues localement échoueront.",
+            hint="Exporter MISTRAL_API_KEY, ou LLM_BACKEND=stub pour travailler sans réseau.",
+            id='Chatbot.W001',
+        )]
+    return []
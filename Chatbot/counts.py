@@ -0,0 +1,75 @@
+"""
+Maintenance des tables agrégées CasDeTestCount et CasDeTestDailyCount
+
+Chaque fonction prend l'alias `using` de la base écrite : les compteurs sont
+tenus dans la même base que les cas de test qu'ils décrivent.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DIMENSION_FIELDS, CasDeTest, CasDeTestCount, CasDeTestDailyCount
+
+
+def _apply_deltas(model, fields, deltas, using=None):
+    """
+    Applique des variations {clé: +n/-n} aux compteurs de `model`, la clé
+    étant le tuple des valeurs de `fields`. Une clé absente est créée ;
+    les compteurs tombés à zéro sont supprimés.
+    """
+    manager = model.objects.db_manager(using)
+    emptied = []
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        lookup = dict(zip(fields, key))
+        with transaction.atomic(using=manager.db):
+            updated = manager.filter(**lookup).update(count=F('count') + delta)
+            if not updated and delta > 0:
+                try:
+                    with transaction.atomic(using=manager.db):
+                        manager.create(count=delta, **lookup)
+                except IntegrityError:
+                    # Créée entre-temps par une écriture concurrente
+                    manager.filter(**lookup).update(count=F('count') + delta)
+        if delta < 0:
+            emptied.append(lookup)
+    for lookup in emptied:
+        manager.filter(count__lte=0, **lookup).delete()
+
+
+def apply_count_deltas(deltas, using=None):
+    """Variations {clé de dimensions: +n/-n} de CasDeTestCount"""
+    _apply_deltas(CasDeTestCount, DIMENSION_FIELDS, deltas, using)
+
+
+def apply_day_deltas(day_deltas, using=None):
+    """Variations {jour de création: +n/-n} de CasDeTestDailyCount"""
+    _apply_deltas(CasDeTestDailyCount, ('day',), {(day,): delta for day, delta in day_deltas.items()}, using)
+
+
+def rebuild_day_counts(using=None):
+    """Recalcule entièrement les compteurs journaliers depuis CasDeTest"""
+    manager = CasDeTestDailyCount.objects.db_manager(using)
+    with transaction.atomic(using=manager.db):
+        manager.all().delete()
+        rows = (
+            CasDeTestDailyCount(day=day, count=n)
+            for day, n in CasDeTest.objects.using(manager.db).day_counts().items()
+        )
+        manager.bulk_create(rows, batch_size=1000)
+    return manager.count()
+
+
+def rebuild_counts(using=None):
+    """Recalcule entièrement les tables agrégées depuis CasDeTest"""
+    manager = CasDeTestCount.objects.db_manager(using)
+    with transaction.atomic(using=manager.db):
+        manager.all().delete()
+        rows = (
+            CasDeTestCount(count=n, **dict(zip(DIMENSION_FIELDS, key)))
+            for key, n in CasDeTest.objects.using(manager.db).dimension_counts().items()
+        )
+        manager.bulk_create(rows, batch_size=1000)
+        rebuild_day_counts(manager.db)
+    return manager.count()
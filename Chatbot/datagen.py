@@ -0,0 +1,184 @@
+"""
+Génération de cas de test synthétiques pour les tests de charge
+
+Les lignes sont produites par lots. Chaque lot a sa propre graine, dérivée
+de la graine globale et de son numéro : le jeu de données obtenu est
+identique quel que soit le nombre de workers ou l'ordre d'exécution.
+
+Ce module est importé par les processus workers avant l'initialisation
+de Django : les modèles n'y sont importés qu'à l'intérieur des fonctions.
+"""
+
+import io
+import random
+from datetime import datetime, timedelta, timezone
+
+
+# Distributions pondérées (reprises de simple_test_data.py)
+LEVELS = ['High', 'Medium', 'Low']
+PRIO_WEIGHTS = [3, 5, 2]
+CRITICALITY_WEIGHTS = [2, 4, 4]
+TEST_STATES = ['Not Started', 'In Progress', 'Blocked', 'KO', 'KO JDD', 'OK', 'N/A']
+TEST_STATE_WEIGHTS = [2, 3, 1, 2, 1, 4, 1]
+PERIMETERS = ['Frontend', 'Backend', 'API', 'Base de données', 'UI/UX']
+PROFILES = ['Admin', 'Utilisateur', 'Testeur', 'Développeur', 'Chef de projet']
+
+# Colonnes métier d'un cas de test (celles d'un fichier d'import)
+COLUMNS = (
+    'projet', 'marco_scenario', 'test_perimeter', 'pre_requisites', 'profile',
+    'test_cases', 'prio', 'criticality', 'test_state', 'step_test', 'expected_result',
+)
+TIMESTAMP_COLUMNS = ('date_creation', 'date_update')
+
+# Ordre des colonnes produites par generate_batch (et du COPY)
+ROW_COLUMNS = COLUMNS + TIMESTAMP_COLUMNS
+
+# Profondeur d'historique par défaut des dates de création (jours)
+HISTORY_DAYS = 730
+
+
+def batch_rng(seed, batch_index):
+    """Générateur aléatoire propre à un lot"""
+    return random.Random(f'{seed}:{batch_index}')
+
+
+def generate_batch(seed, batch_index, size, first_number=1, projects=20,
+                   history_days=HISTORY_DAYS, until=None):
+    """
+    Retourne `size` lignes (tuples dans l'ordre de ROW_COLUMNS, libellés en
+    clair) numérotées à partir de `first_number`. Les dates de création
+    sont réparties sur les `history_days` jours précédant `until` (par
+    défaut maintenant) ; la mise à jour suit la création de 0 à 30 jours.
+    """
+    rng = batch_rng(seed, batch_index)
+    projets = rng.choices([f'Projet_{i}' for i in range(1, projects + 1)], k=size)
+    perimeters = rng.choices(PERIMETERS, k=size)
+    profiles = rng.choices(PROFILES, k=size)
+    prios = rng.choices(LEVELS, weights=PRIO_WEIGHTS, k=size)
+    criticalities = rng.choices(LEVELS, weights=CRITICALITY_WEIGHTS, k=size)
+    states = rng.choices(TEST_STATES, weights=TEST_STATE_WEIGHTS, k=size)
+
+    until = until or datetime.now(timezone.utc)
+    history = history_days * 86400
+    ages = [rng.uniform(0, history) for _ in range(size)]
+    edits = [rng.uniform(0, 30 * 86400) for _ in range(size)]
+
+    rows = []
+    for i in range(size):
+        n = first_number + i
+        created = until - timedelta(seconds=ages[i])
+        rows.append((
+            projets[i],
+            f'Scenario_{n}',
+            perimeters[i],
+            f'Prérequis pour le test {n}',
+            profiles[i],
+            f'Cas de test pour le scénario {n}',
+            prios[i],
+            criticalities[i],
+            states[i],
+            'Étape 1: Préparer\nÉtape 2: Exécuter\nÉtape 3: Vérifier',
+            f'Résultat attendu pour le test {n}',
+            created,
+            created + timedelta(seconds=min(edits[i], ages[i])),
+        ))
+    return rows
+
+
+def _copy_escape(value):
+    """Échappement du format texte de COPY"""
+    if value is None:
+        return '\\N'
+    if not isinstance(value, str):
+        return str(value)
+    return (
+        value.replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def _db_rows(rows, columns=ROW_COLUMNS):
+    """Libellés → valeurs en base (codes des champs à choix codés)"""
+    from .models import CasDeTest
+
+    # Seules les colonnes codées changent : conversion par dictionnaire
+    coded = [
+        (index, CasDeTest._meta.get_field(name).codes)
+        for index, name in enumerate(columns)
+        if hasattr(CasDeTest._meta.get_field(name), 'codes')
+    ]
+    converted = []
+    for row in rows:
+        row = list(row)
+        for index, codes in coded:
+            row[index] = codes[row[index]]
+        converted.append(row)
+    return converted
+
+
+def copy_rows(rows, using='default', table=None, columns=ROW_COLUMNS):
+    """
+    Insère les lignes via COPY FROM STDIN (PostgreSQL), dans la table de
+    CasDeTest ou dans `table` (table temporaire de même structure)
+    """
+    from django.db import connections
+
+    from .models import CasDeTest
+
+    connection = connections[using]
+    buffer = io.StringIO()
+    for row in _db_rows(rows, columns):
+        buffer.write('\t'.join(_copy_escape(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(table or CasDeTest._meta.db_table)
+    column_list = ', '.join(connection.ops.quote_name(name) for name in columns)
+    sql = f'COPY {table} ({column_list}) FROM STDIN'
+    connection.ensure_connection()
+    with connection.connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, buffer)  # psycopg2
+        else:
+            with cursor.copy(sql) as copy:  # psycopg 3
+                copy.write(buffer.getvalue())
+
+
+def bulk_create_rows(rows, using='default'):
+    """
+    Insère les lignes via bulk_create. Le manager de base est utilisé :
+    les compteurs agrégés sont recalculés une fois à la fin de la génération
+    plutôt qu'à chaque lot. date_update (auto_now) y prend l'heure d'insertion.
+    """
+    from .models import CasDeTest
+
+    objs = [CasDeTest(**dict(zip(ROW_COLUMNS, row))) for row in rows]
+    CasDeTest._base_manager.using(using).bulk_create(objs, batch_size=len(objs))
+
+
+WRITERS = {
+    'copy': copy_rows,
+    'bulk': bulk_create_rows,
+}
+
+
+def write_batch(task):
+    """
+    Génère et écrit un lot. `task` = (seed, batch_index, size, first_number,
+    projects, history_days, until, method, using) ; retourne le nombre de
+    lignes écrites.
+    """
+    seed, batch_index, size, first_number, projects, history_days, until, method, using = task
+    rows = generate_batch(seed, batch_index, size, first_number, projects, history_days, until)
+    WRITERS[method](rows, using)
+    return len(rows)
+
+
+def init_worker():
+    """Initialisation d'un processus worker (nouvelle connexion par processus)"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        # Démarrage par spawn (Windows, macOS) : Django n'est pas initialisé
+        django.setup()
@@ -0,0 +1,208 @@
+"""
+Reconnaissance des valeurs de dimensions citées dans une requête
+
+"projet alpha", "ProjetA" ou "projet_1" désignent des valeurs réelles de
+CasDeTest (projet, profil, périmètre) sans passer par le LLM : un
+dictionnaire des valeurs distinctes, lu dans la table agrégée
+CasDeTestCount, est indexé en mémoire par trigrammes (comme pg_trgm). Il
+est reconstruit quand la version des données change (voir chart_cache) ;
+une requête est analysée en une fraction de milliseconde.
+
+Une mention est une suite de 1 à 3 mots de la requête. Elle correspond à une
+valeur si leurs formes compactes (minuscules, sans accents ni séparateurs)
+sont identiques, ou si la similarité de leurs trigrammes dépasse le seuil,
+à nombres identiques ('projet 1' ne désigne jamais 'Projet_10'). Une
+mention ambiguë (plusieurs valeurs au même score) est ignorée, de même
+qu'une mention qui suit 'par' ("par testeur" est un regroupement, pas un
+filtre) et qu'un pluriel seulement proche d'une valeur ("les utilisateurs"
+ne désigne pas le profil Utilisateur).
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .aggregations import count_by
+from .chart_cache import get_data_version
+
+
+DEFAULT_SETTINGS = {
+    'FIELDS': ('projet', 'profile', 'test_perimeter'),
+    'THRESHOLD': 0.5,
+}
+
+# Longueur minimale (forme compacte) d'une mention comparée par trigrammes
+MIN_FUZZY_LENGTH = 4
+
+# Mots les plus longs d'une mention
+MAX_MENTION_WORDS = 3
+
+# Mots qui ne commencent ni ne terminent une mention
+STOPWORDS = {
+    'le', 'la', 'les', 'l', 'de', 'des', 'du', 'd', 'un', 'une', 'et', 'ou', 'en', 'au', 'aux',
+    'par', 'pour', 'sur', 'avec', 'dans', 'sans', 'entre', 'a', 'que', 'qui', 'quel', 'quels',
+    'montre', 'moi', 'affiche', 'donne', 'combien', 'nombre', 'the', 'of', 'for', 'by', 'and',
+    'selon', 'per',
+}
+
+# Mots annonçant un regroupement : la mention qui suit nomme l'axe, pas une valeur
+GROUPING_WORDS = {'par', 'selon', 'by', 'per'}
+
+# Noms de colonnes : "projet" seul ne désigne aucun projet
+FIELD_WORDS = {
+    'projet', 'projets', 'project', 'projects', 'profil', 'profils', 'profile', 'profiles',
+    'perimetre', 'perimetres', 'perimeter', 'test', 'tests', 'cas',
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_WORD_RE = re.compile(r'[^\W_]+')
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def entity_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'ENTITY_MATCHING', {})}
+
+
+def fold(text):
+    """Minuscules sans accents"""
+    folded = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in folded if not unicodedata.combining(char))
+
+
+def compact(text):
+    """Forme compacte : 'Projet_A' → 'projeta'"""
+    return ''.join(_TOKEN_RE.findall(fold(text)))
+
+
+def trigrams(word):
+    """Trigrammes d'un mot, complété comme pg_trgm (deux espaces devant, un derrière)"""
+    padded = f'  {word} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def _is_plural(token):
+    """'utilisateurs', 'developpeurs', 'reseaux' (mot sans chiffre de plus de 3 lettres)"""
+    return len(token) > 3 and token[-1] in 'sx' and not _DIGITS_RE.search(token)
+
+
+def _numbers(word):
+    return [int(number) for number in _DIGITS_RE.findall(word)]
+
+
+class ValueIndex:
+    """Index trigrammes des valeurs de dimensions : [(colonne, valeur)] par forme compacte"""
+
+    def __init__(self, values, threshold=0.5):
+        self.threshold = threshold
+        self.exact = defaultdict(set)
+        self.entries = []
+        self.postings = defaultdict(list)
+        for field, value in values:
+            key = compact(value)
+            if not key:
+                continue
+            self.exact[key].add((field, value))
+            grams = trigrams(key)
+            position = len(self.entries)
+            self.entries.append((field, value, len(grams), _numbers(key)))
+            for gram in grams:
+                self.postings[gram].append(position)
+
+    def lookup(self, key):
+        """(score, colonne, valeur) de la valeur désignée par une forme compacte, ou None"""
+        exact = self.exact.get(key)
+        if exact:
+            return (1.0, *next(iter(exact))) if len(exact) == 1 else None
+        if len(key) < MIN_FUZZY_LENGTH:
+            return None
+        grams = trigrams(key)
+        shared = Counter(position for gram in grams for position in self.postings.get(gram, ()))
+        numbers = _numbers(key)
+        best, matches = 0.0, set()
+        for position, common in shared.items():
+            field, value, size, value_numbers = self.entries[position]
+            if value_numbers != numbers:
+                continue
+            score = common / (len(grams) + size - common)
+            if score > best:
+                best, matches = score, {(field, value)}
+            elif score == best:
+                matches.add((field, value))
+        if best < self.threshold or len(matches) != 1:
+            return None
+        return (best, *matches.pop())
+
+    def resolve(self, text):
+        """
+        Valeurs citées dans un texte : ({colonne: [valeurs]}, texte sans les
+        mentions reconnues, pour le routage par mots-clés)
+        """
+        words = list(_WORD_RE.finditer(text))
+        tokens = [compact(word.group(0)) for word in words]
+        candidates = []
+        for size in range(MAX_MENTION_WORDS, 0, -1):
+            for start in range(len(tokens) - size + 1):
+                mention = tokens[start:start + size]
+                # "par testeur", "tests par testeur" : axe de regroupement
+                grouping = GROUPING_WORDS.intersection(tokens[max(start - 1, 0):start + size])
+                if (mention[0] in STOPWORDS or mention[-1] in STOPWORDS
+                        or all(token in FIELD_WORDS for token in mention)
+                        or grouping):
+                    continue
+                match = self.lookup(''.join(mention))
+                # Pluriel générique : seule une correspondance exacte compte
+                if match and match[0] < 1.0 and _is_plural(mention[-1]):
+                    continue
+                if match:
+                    candidates.append((match, start, size))
+
+        # Meilleures mentions d'abord (score, puis longueur), sans chevauchement
+        used, found = set(), defaultdict(set)
+        for (_, field, value), start, size in sorted(candidates, key=lambda item: (-item[0][0], -item[2], item[1])):
+            span = set(range(start, start + size))
+            if span & used:
+                continue
+            used |= span
+            found[field].add(value)
+        filters = {field: sorted(values) for field, values in sorted(found.items())}
+        rest = text
+        for index in sorted(used, reverse=True):
+            rest = rest[:words[index].start()] + rest[words[index].end():]
+        return filters, rest
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_value_index():
+    """Index des valeurs courantes, reconstruit après toute écriture sur CasDeTest"""
+    global _index, _index_version
+    version = get_data_version()
+    with _index_lock:
+        if _index is None or _index_version != version:
+            config = entity_settings()
+            values = [
+                (field, row[field])
+                for field in config['FIELDS']
+                for row in count_by([field])
+                if row['count'] and row[field]
+            ]
+            _index, _index_version = ValueIndex(values, config['THRESHOLD']), version
+        return _index
+
+
+def entity_filters(user_query):
+    """
+    Filtres (forme normalisée) des valeurs de dimensions citées dans la
+    requête, et requête sans ces mentions
+    """
+    return get_value_index().resolve(user_query)
+
+
+aentity_filters = sync_to_async(entity_filters)
@@ -0,0 +1,239 @@
+"""
+Export en flux des cas de test (CSV, JSON Lines, Parquet)
+
+Les lignes sont lues par values_list() sur les seules colonnes demandées
+(les grands champs texte ne sont chargés que s'ils sont demandés) et
+parcourues par iterator(chunk_size=...) : curseur côté serveur sous
+PostgreSQL, aucun cache de résultats côté Django. Chaque lot est écrit puis
+envoyé aussitôt : la mémoire reste bornée quelle que soit la taille de la
+table. Sous ASGI, le flux doit être asynchrone (astream_export) : Django
+consommerait sinon le générateur synchrone en entier avant le premier octet.
+"""
+
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .filters import apply_filters
+from .models import CasDeTest
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+DEFAULT_SETTINGS = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Bornes du paramètre chunk_size de l'API
+MIN_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 20000
+
+# Colonnes exportables, dans l'ordre du modèle (sauf le vecteur de recherche)
+EXPORT_COLUMNS = tuple(
+    field.attname for field in CasDeTest._meta.concrete_fields if field.attname != 'search_vector'
+)
+
+# Colonnes par défaut : tout sauf les grands champs texte
+DEFAULT_COLUMNS = tuple(
+    field.attname for field in CasDeTest._meta.concrete_fields
+    if field.attname in EXPORT_COLUMNS and field.get_internal_type() != 'TextField'
+)
+
+
+class ExportError(ValueError):
+    """Format ou colonnes d'export invalides"""
+
+
+def export_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'CASDETEST_EXPORT', {})}
+
+
+def parse_columns(spec):
+    """
+    Colonnes demandées ('id,projet,prio' ou liste) ; DEFAULT_COLUMNS si vide.
+    Lève ExportError pour une colonne inconnue.
+    """
+    if not spec:
+        return list(DEFAULT_COLUMNS)
+    if isinstance(spec, str):
+        spec = spec.split(',')
+    columns = [name.strip() for name in spec if name.strip()]
+    unknown = [name for name in columns if name not in EXPORT_COLUMNS]
+    if unknown:
+        raise ExportError(
+            f"Colonnes inconnues: {', '.join(unknown)} (disponibles: {', '.join(EXPORT_COLUMNS)})"
+        )
+    if len(set(columns)) != len(columns):
+        raise ExportError('Colonne demandée plusieurs fois')
+    return columns or list(DEFAULT_COLUMNS)
+
+
+def parse_chunk_size(value):
+    """Taille des lots lus en base, bornée ; défaut : CASDETEST_EXPORT['CHUNK_SIZE']"""
+    if value in (None, ''):
+        return export_settings()['CHUNK_SIZE']
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ExportError(f'chunk_size invalide: {value}')
+    return min(max(value, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
+
+def export_rows(columns, filters=None, chunk_size=None):
+    """Tuples des colonnes demandées, par ordre de clé primaire, lus par lots"""
+    chunk_size = chunk_size or export_settings()['CHUNK_SIZE']
+    queryset = apply_filters(CasDeTest.objects.all(), filters).order_by('pk')
+    return queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _cell(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream_csv(columns, rows, chunk_size):
+    """En-tête puis un bloc de texte CSV par lot de lignes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in _batches(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_cell(value) for value in row] for row in batch])
+        yield buffer.getvalue()
+
+
+def stream_jsonl(columns, rows, chunk_size):
+    """Un objet JSON par ligne, envoyés par lots"""
+    for batch in _batches(rows, chunk_size):
+        yield ''.join(
+            json.dumps(dict(zip(columns, map(_cell, row))), ensure_ascii=False) + '\n'
+            for row in batch
+        )
+
+
+class _ParquetSink:
+    """Fichier en écriture seule dont le contenu est vidé après chaque groupe de lignes"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def _parquet_schema(columns):
+    import pyarrow as pa
+
+    types = {
+        'AutoField': pa.int64(),
+        'BigAutoField': pa.int64(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+        # CodedChoiceField : exporté par libellé
+        'SmallIntegerField': pa.string(),
+    }
+    fields = {field.attname: field for field in CasDeTest._meta.concrete_fields}
+    return pa.schema([
+        (name, types.get(fields[name].get_internal_type(), pa.string())) for name in columns
+    ])
+
+
+def stream_parquet(columns, rows, chunk_size):
+    """Un groupe de lignes Parquet par lot, envoyé dès qu'il est écrit"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _batches(rows, chunk_size):
+            values = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(values, schema)], schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {
+    'csv': stream_csv,
+    'jsonl': stream_jsonl,
+    'parquet': stream_parquet,
+}
+
+
+def check_format(file_format):
+    """Vérifie le format (et pyarrow pour Parquet) avant de commencer le flux"""
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(f"Format non supporté: {file_format} (attendu: {', '.join(EXPORT_FORMATS)})")
+    if file_format == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportError("L'export Parquet nécessite le paquet pyarrow.")
+
+
+def stream_export(file_format, columns, filters=None, chunk_size=None):
+    """Générateur des blocs (str ou bytes) du fichier exporté"""
+    check_format(file_format)
+    chunk_size = chunk_size or export_settings()['CHUNK_SIZE']
+    rows = export_rows(columns, filters, chunk_size)
+    return EXPORT_WRITERS[file_format](columns, rows, chunk_size)
+
+
+async def astream_export(file_format, columns, filters=None, chunk_size=None):
+    """
+    Variante asynchrone de stream_export : chaque bloc est produit dans le
+    thread synchrone de Django (même connexion, même curseur) puis envoyé
+    """
+    chunks = await sync_to_async(stream_export)(file_format, columns, filters, chunk_size)
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # Ferme le curseur côté serveur, y compris si le client se déconnecte
+        await sync_to_async(chunks.close)()
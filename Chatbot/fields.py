@@ -0,0 +1,71 @@
+"""
+Champs de modèle personnalisés
+"""
+
+from django.db import models
+
+
+class CodedChoiceField(models.SmallIntegerField):
+    """
+    Colonne à choix fixes stockée comme petit entier (smallint, 2 octets)
+    mais exposée partout sous forme de libellé : instances, filtres ORM
+    (`prio='High'`, `prio__in=[...]`), values(), formulaires et admin.
+
+    `codes` associe chaque libellé à son code en base. Les codes sont
+    persistés : on peut ajouter des libellés, jamais renuméroter.
+    """
+
+    def __init__(self, *args, codes=None, **kwargs):
+        self.codes = dict(codes or {})
+        self.labels = {code: label for label, code in self.codes.items()}
+        kwargs['choices'] = [(label, label) for label in self.codes]
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop('choices', None)
+        kwargs['codes'] = self.codes
+        return name, path, args, kwargs
+
+    @property
+    def validators(self):
+        # Pas de bornes entières : la valeur manipulée est le libellé
+        return [*self.default_validators, *self._validators]
+
+    def encode(self, value):
+        """Libellé → code en base"""
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise ValueError(
+                f"Valeur inconnue pour '{self.name}': {value!r} "
+                f"(attendu: {', '.join(self.codes)})"
+            )
+
+    def decode(self, code):
+        """Code en base → libellé"""
+        if code is None:
+            return None
+        return self.labels.get(code, code)
+
+    def from_db_value(self, value, expression, connection):
+        return self.decode(value)
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+        if isinstance(value, int):
+            return self.decode(value)
+        if isinstance(value, str) and value.isdigit():
+            return self.decode(int(value))
+        return value
+
+    def get_prep_value(self, value):
+        if hasattr(value, 'resolve_expression'):
+            return value
+        return self.encode(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
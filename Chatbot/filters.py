@@ -0,0 +1,179 @@
+"""
+Filtres des graphiques : petit langage JSON validé puis compilé en Q
+
+Forme acceptée (clés combinées par ET) :
+
+    {"projet": "Projet A"}                        égalité
+    {"prio": ["High", "Medium"]}                  appartenance
+    {"test_state": {"ne": "OK"}}                  différence (aussi "not_in")
+    {"or": [{"prio": "High"}, {"criticality": "High"}]}
+    {"not": {"profile": "Admin"}}
+
+Les noms de colonnes acceptent les alias usuels ('priorité', 'état'...), les
+libellés des colonnes à choix sont insensibles à la casse ('high' → 'High').
+La forme normalisée (parse_filters) est stable : elle sert de clé de cache.
+Les filtres portent sur les colonnes de dimensions, présentes à l'identique
+dans CasDeTest et CasDeTestCount : le même Q s'applique aux deux tables.
+"""
+
+import json
+import re
+import unicodedata
+
+from django.db.models import Q
+
+from .models import DIMENSION_FIELDS, CasDeTest
+
+
+# Colonnes filtrables
+FILTER_FIELDS = DIMENSION_FIELDS
+
+# Alias (sans accents, en minuscules) → colonne
+FIELD_ALIASES = {
+    'priorite': 'prio',
+    'priority': 'prio',
+    'criticite': 'criticality',
+    'etat': 'test_state',
+    'statut': 'test_state',
+    'status': 'test_state',
+    'state': 'test_state',
+    'project': 'projet',
+    'perimetre': 'test_perimeter',
+    'perimeter': 'test_perimeter',
+    'profil': 'profile',
+}
+
+# Opérateurs d'une condition sous forme d'objet
+POSITIVE_OPERATORS = ('eq', 'in')
+NEGATIVE_OPERATORS = ('ne', 'not_in')
+
+
+class FilterError(ValueError):
+    """Filtre invalide (colonne, opérateur ou valeur inconnus)"""
+
+
+def filter_column(name):
+    """'Priorité' → 'prio' ; FilterError si la colonne n'est pas filtrable"""
+    text = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+    column = FIELD_ALIASES.get(text, text)
+    if column not in FILTER_FIELDS:
+        raise FilterError(f"Filtre non supporté: {name}")
+    return column
+
+
+def _values(column, values):
+    """Valeurs d'une condition : liste triée, libellés des choix validés"""
+    if not isinstance(values, (list, tuple, set)):
+        values = [values]
+    values = {str(value).strip() for value in values if value is not None and str(value).strip()}
+    field = CasDeTest._meta.get_field(column)
+    if field.choices:
+        labels = {str(value).lower(): value for value, _ in field.choices}
+        unknown = sorted(value for value in values if value.lower() not in labels)
+        if unknown:
+            raise FilterError(f"Valeurs inconnues pour {column}: {', '.join(unknown)}")
+        values = {labels[value.lower()] for value in values}
+    return sorted(values)
+
+
+def _condition(column, value):
+    """Condition normalisée : liste (IN) ou {'not_in': liste}"""
+    if not isinstance(value, dict):
+        return _values(column, value)
+    if len(value) != 1:
+        raise FilterError(f"Un seul opérateur par condition: {column}")
+    (operator, operand), = value.items()
+    if operator in POSITIVE_OPERATORS:
+        return _values(column, operand)
+    if operator in NEGATIVE_OPERATORS:
+        return {'not_in': _values(column, operand)}
+    raise FilterError(f"Opérateur non supporté: {operator}")
+
+
+def parse_filters(spec):
+    """
+    Valide et normalise un filtre. Les conditions vides ({"projet": ""},
+    null) sont ignorées ; retourne {} sans filtre. Lève FilterError.
+    """
+    if not spec:
+        return {}
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError:
+            raise FilterError('Filtres invalides : JSON attendu')
+        if not spec:
+            return {}
+    if not isinstance(spec, dict):
+        raise FilterError('Filtres invalides : objet JSON attendu')
+
+    normalized = {}
+    for name, value in spec.items():
+        if name == 'or':
+            if not isinstance(value, list) or not value:
+                raise FilterError('"or" attend une liste non vide de filtres')
+            branches = [parse_filters(branch) for branch in value]
+            if any(not branch for branch in branches):
+                # Une branche sans condition rend le OU toujours vrai
+                continue
+            normalized['or'] = sorted(branches, key=lambda branch: json.dumps(branch, sort_keys=True))
+        elif name == 'not':
+            negated = parse_filters(value)
+            if negated:
+                normalized['not'] = negated
+        else:
+            column = filter_column(name)
+            if column in normalized:
+                raise FilterError(f"Colonne filtrée deux fois: {column}")
+            condition = _condition(column, value)
+            if condition:
+                normalized[column] = condition
+    return dict(sorted(normalized.items()))
+
+
+def is_simple(filters):
+    """Vrai pour une conjonction d'appartenances ({colonne: [valeurs]})"""
+    return all(isinstance(value, list) and name in FILTER_FIELDS for name, value in filters.items())
+
+
+def compile_filters(filters):
+    """Filtre normalisé → Q (égalités et IN sur des colonnes indexées)"""
+    condition = Q()
+    for name, value in (filters or {}).items():
+        if name == 'or':
+            branches = Q()
+            for branch in value:
+                branches |= compile_filters(branch)
+            condition &= branches
+        elif name == 'not':
+            condition &= ~compile_filters(value)
+        elif isinstance(value, dict):
+            condition &= ~Q(**{f'{name}__in': value['not_in']})
+        elif len(value) == 1:
+            condition &= Q(**{name: value[0]})
+        else:
+            condition &= Q(**{f'{name}__in': value})
+    return condition
+
+
+def apply_filters(queryset, filters):
+    """Restreint un queryset (CasDeTest ou CasDeTestCount) au filtre normalisé"""
+    if not filters:
+        return queryset
+    return queryset.filter(compile_filters(filters))
+
+
+def describe_filters(filters):
+    """Texte court d'un filtre normalisé, pour les descriptions de graphiques"""
+    parts = []
+    for name, value in filters.items():
+        if name == 'or':
+            parts.append('(' + ' ou '.join(describe_filters(branch) for branch in value) + ')')
+        elif name == 'not':
+            parts.append(f'non ({describe_filters(value)})')
+        elif isinstance(value, dict):
+            parts.append(f"{name} ≠ {', '.join(value['not_in'])}")
+        else:
+            parts.append(f"{name} = {', '.join(value)}")
+    return ' ; '.join(parts)
@@ -0,0 +1,404 @@
+"""
+Import en masse de cas de test depuis un fichier CSV ou Excel (XLSX)
+
+Le fichier est lu par blocs (pandas pour le CSV, openpyxl en lecture seule
+pour le XLSX) : la mémoire reste bornée quelle que soit sa taille. Chaque
+bloc est validé en vectoriel (colonnes à choix, champs obligatoires,
+longueurs), puis chargé par COPY (PostgreSQL) ou bulk_create. Avec l'upsert,
+une ligne dont le couple (projet, marco_scenario) existe déjà met à jour
+le cas de test existant au lieu d'en créer un nouveau.
+
+L'API d'upload traite dans la requête les fichiers jusqu'à SYNC_MAX_BYTES ;
+au-delà, le fichier est enregistré et mis en file (ImportJob), puis chargé
+par la commande import_worker.
+"""
+
+import csv
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+import pandas as pd
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .datagen import COLUMNS, ROW_COLUMNS, copy_rows
+from .models import (
+    DIMENSION_FIELDS, CasDeTest, ImportJob, casdetest_bulk_changed, creation_day, dimension_key,
+)
+from .reports import worker_name
+
+logger = logging.getLogger(__name__)
+
+
+# Clé métier d'un cas de test pour l'upsert
+UPSERT_KEY = ('projet', 'marco_scenario')
+
+# En-têtes usuels des campagnes → champs du modèle
+HEADER_ALIASES = {
+    'scenario': 'marco_scenario',
+    'macro_scenario': 'marco_scenario',
+    'perimetre': 'test_perimeter',
+    'prerequis': 'pre_requisites',
+    'prerequisites': 'pre_requisites',
+    'profil': 'profile',
+    'cas_de_test': 'test_cases',
+    'priorite': 'prio',
+    'priority': 'prio',
+    'criticite': 'criticality',
+    'etat': 'test_state',
+    'statut': 'test_state',
+    'status': 'test_state',
+    'etapes': 'step_test',
+    'resultat_attendu': 'expected_result',
+}
+
+SUPPORTED_FORMATS = ('csv', 'xlsx')
+
+DEFAULT_SETTINGS = {
+    'SYNC_MAX_BYTES': 2 * 1024 * 1024,
+    'POLL_INTERVAL': 2,
+}
+
+# Lignes par UPDATE de bulk_update (un CASE par ligne et par champ)
+UPDATE_BATCH_SIZE = 500
+
+# Lignes rejetées conservées au maximum dans le rapport (les suivantes sont
+# seulement comptées ; voir `on_rejects` pour les recevoir toutes)
+MAX_REPORTED_REJECTS = 100
+
+
+class ImportFormatError(ValueError):
+    """Fichier illisible ou colonnes obligatoires manquantes"""
+
+
+def import_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'CASDETEST_IMPORT', {})}
+
+
+def normalize_header(header):
+    """'Pré-requisites ' → 'pre_requisites', puis alias éventuel"""
+    text = unicodedata.normalize('NFKD', str(header)).encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+    return HEADER_ALIASES.get(text, text)
+
+
+def detect_format(name):
+    extension = os.path.splitext(name or '')[1].lower().lstrip('.')
+    if extension not in SUPPORTED_FORMATS:
+        raise ImportFormatError(f"Format non supporté: '{extension}' (attendu: csv ou xlsx)")
+    return extension
+
+
+def _csv_delimiter(source):
+    """Séparateur ';' (Excel français) ou ',' d'après la première ligne"""
+    position = source.tell()
+    first = source.readline()
+    source.seek(position)
+    if isinstance(first, bytes):
+        first = first.decode('utf-8', 'ignore')
+    try:
+        return csv.Sniffer().sniff(first, delimiters=';,\t').delimiter
+    except csv.Error:
+        return ','
+
+
+def iter_csv_chunks(source, chunksize):
+    if isinstance(source, str):
+        with open(source, 'rb') as handle:
+            yield from iter_csv_chunks(handle, chunksize)
+        return
+    reader = pd.read_csv(
+        source, sep=_csv_delimiter(source), dtype=str, keep_default_na=False,
+        chunksize=chunksize, encoding='utf-8-sig',
+    )
+    for chunk in reader:
+        yield chunk
+
+
+def iter_xlsx_chunks(source, chunksize):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("La lecture des fichiers XLSX nécessite le paquet openpyxl.")
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(value) if value is not None else '' for value in header]
+        buffer = []
+        for row in rows:
+            buffer.append(['' if value is None else str(value) for value in row])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+CHUNK_READERS = {
+    'csv': iter_csv_chunks,
+    'xlsx': iter_xlsx_chunks,
+}
+
+
+def _field_rules():
+    """Règles de validation dérivées du modèle : (champ, obligatoire, longueur max, libellés)"""
+    rules = []
+    for name in COLUMNS:
+        field = CasDeTest._meta.get_field(name)
+        labels = {str(value).lower(): value for value, _ in field.choices} if field.choices else None
+        rules.append((name, not (field.null or field.blank), getattr(field, 'max_length', None), labels))
+    return rules
+
+
+def validate_chunk(chunk, first_line):
+    """
+    Valide un bloc en vectoriel. Retourne (lignes valides, lignes rejetées,
+    doublons écartés) : deux DataFrames, le second avec les colonnes 'line'
+    et 'errors', puis le nombre de lignes valides dont la clé (projet,
+    marco_scenario) réapparaît plus loin dans le bloc.
+    """
+    chunk = chunk.rename(columns=normalize_header)
+    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+    missing = [name for name in COLUMNS if name not in chunk.columns and name != 'pre_requisites']
+    if missing:
+        raise ImportFormatError(f"Colonnes manquantes: {', '.join(missing)}")
+    if 'pre_requisites' not in chunk.columns:
+        chunk['pre_requisites'] = ''
+
+    chunk = chunk[list(COLUMNS)].astype(str).apply(lambda column: column.str.strip())
+    chunk.index = range(first_line, first_line + len(chunk))
+    errors = pd.Series('', index=chunk.index)
+
+    for name, required, max_length, labels in _field_rules():
+        column = chunk[name]
+        if required:
+            errors[column.eq('')] += f'{name} vide; '
+        if max_length:
+            errors[column.str.len() > max_length] += f'{name} dépasse {max_length} caractères; '
+        if labels:
+            # Libellés insensibles à la casse ('high' → 'High')
+            normalized = column.str.lower().map(labels)
+            errors[normalized.isna() & column.ne('')] += f'{name} hors choix; '
+            chunk[name] = normalized.fillna(column)
+
+    invalid = errors.ne('')
+    rejected = chunk[invalid].assign(errors=errors[invalid].str.rstrip('; '))
+    valid = chunk[~invalid]
+    # Doublons de clé dans le bloc : la dernière occurrence l'emporte
+    duplicated = valid.duplicated(subset=list(UPSERT_KEY), keep='last')
+    valid = valid[~duplicated]
+    return valid, rejected.rename_axis('line').reset_index(), int(duplicated.sum())
+
+
+def _existing_rows(valid, using):
+    """{(projet, marco_scenario): [(pk, clé de dimensions, date de création), ...]} pour les clés du bloc"""
+    wanted = set(zip(valid['projet'], valid['marco_scenario']))
+    existing = defaultdict(list)
+    rows = (
+        CasDeTest._base_manager.using(using)
+        .filter(projet__in={projet for projet, _ in wanted},
+                marco_scenario__in={scenario for _, scenario in wanted})
+        .values_list('pk', 'date_creation', *UPSERT_KEY, *DIMENSION_FIELDS)
+    )
+    for pk, created, projet, scenario, *dimensions in rows:
+        if (projet, scenario) in wanted:
+            existing[(projet, scenario)].append((pk, tuple(dimensions), created))
+    return existing
+
+
+def copy_update_rows(rows, using=DEFAULT_DB_ALIAS):
+    """
+    Met à jour des cas de test existants (PostgreSQL) : COPY des lignes
+    (pk en tête, puis ROW_COLUMNS) dans une table temporaire puis un seul
+    UPDATE ... FROM. La date de création n'est pas modifiée.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(CasDeTest._meta.db_table)
+    staging = 'casdetest_import_staging'
+    assignments = ', '.join(f'{quote(name)} = s.{quote(name)}' for name in (*COLUMNS, 'date_update'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {staging} '
+            f'(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        )
+        copy_rows(rows, using, table=staging, columns=('id', *ROW_COLUMNS))
+        cursor.execute(f'UPDATE {table} AS t SET {assignments} FROM {staging} AS s WHERE t.id = s.id')
+        cursor.execute(f'TRUNCATE {staging}')
+
+
+def load_chunk(valid, upsert=True, method='bulk', using=DEFAULT_DB_ALIAS):
+    """
+    Charge un bloc validé. Les compteurs agrégés reçoivent les variations
+    exactes du bloc en un seul signal. Retourne (créés, mis à jour).
+    """
+    records = [dict(zip(COLUMNS, row)) for row in valid.itertuples(index=False, name=None)]
+    existing = _existing_rows(valid, using) if upsert else {}
+    now = timezone.now()
+
+    to_create, to_update = [], []
+    deltas = Counter()
+    for record in records:
+        record['pre_requisites'] = record['pre_requisites'] or None
+        record['date_update'] = now
+        matches = existing.get((record['projet'], record['marco_scenario']), ())
+        for pk, before, created in matches:
+            to_update.append((pk, dict(record, date_creation=created)))
+            deltas[before] -= 1
+            deltas[dimension_key(record)] += 1
+        if not matches:
+            to_create.append(dict(record, date_creation=now))
+            deltas[dimension_key(record)] += 1
+    day_deltas = Counter({creation_day(now): len(to_create)})
+
+    with transaction.atomic(using=using):
+        manager = CasDeTest._base_manager.using(using)
+        if to_update:
+            if method == 'copy':
+                copy_update_rows(
+                    [(pk, *(record[name] for name in ROW_COLUMNS)) for pk, record in to_update], using
+                )
+            else:
+                # Gestionnaire de base : pas de signal par lot, les variations
+                # du bloc entier sont envoyées ci-dessous
+                manager.bulk_update(
+                    [CasDeTest(pk=pk, **record) for pk, record in to_update],
+                    (*COLUMNS, 'date_update'), batch_size=UPDATE_BATCH_SIZE,
+                )
+        if to_create:
+            if method == 'copy':
+                copy_rows([tuple(record[name] for name in ROW_COLUMNS) for record in to_create], using)
+            else:
+                manager.bulk_create([CasDeTest(**record) for record in to_create], batch_size=1000)
+        if to_create or to_update:
+            casdetest_bulk_changed.send(
+                sender=CasDeTest, operation='import', deltas=deltas, day_deltas=day_deltas, using=using,
+            )
+    return len(to_create), len(to_update)
+
+
+def import_casdetest(source, file_format=None, chunksize=5000, upsert=True,
+                     method='auto', using=DEFAULT_DB_ALIAS, progress=None, on_rejects=None):
+    """
+    Importe un fichier CSV/XLSX (chemin ou fichier ouvert en binaire).
+
+    `progress(report)` est appelé après chaque bloc, `on_rejects(lignes)`
+    avec toutes les lignes rejetées du bloc. Retourne le rapport :
+    {'rows', 'created', 'updated', 'rejected' (nombre), 'rejects' (les
+    MAX_REPORTED_REJECTS premières lignes rejetées, avec numéro de ligne et
+    erreurs), 'duplicates' (lignes écartées car leur clé réapparaît plus loin
+    dans le même bloc), 'chunks'}.
+    """
+    if file_format is None:
+        file_format = detect_format(source if isinstance(source, str) else getattr(source, 'name', ''))
+    if file_format not in CHUNK_READERS:
+        raise ImportFormatError(f"Format non supporté: '{file_format}'")
+    if method == 'auto':
+        method = 'copy' if connections[using].vendor == 'postgresql' else 'bulk'
+
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'rejected': 0, 'rejects': [], 'duplicates': 0, 'chunks': 0}
+    first_line = 2  # ligne 1 : en-têtes
+    for chunk in CHUNK_READERS[file_format](source, chunksize):
+        valid, rejected, duplicates = validate_chunk(chunk, first_line)
+        first_line += len(chunk)
+        if len(valid):
+            created, updated = load_chunk(valid, upsert=upsert, method=method, using=using)
+            report['created'] += created
+            report['updated'] += updated
+        report['rows'] += len(chunk)
+        report['rejected'] += len(rejected)
+        report['duplicates'] += duplicates
+        room = MAX_REPORTED_REJECTS - len(report['rejects'])
+        if room > 0:
+            report['rejects'].extend(rejected.head(room).to_dict('records'))
+        if on_rejects and len(rejected):
+            on_rejects(rejected.to_dict('records'))
+        report['chunks'] += 1
+        if progress:
+            progress(report)
+    return report
+
+
+def write_rejects(rejects, target, header=True):
+    """Écrit les lignes rejetées en CSV (numéro de ligne, erreurs, valeurs)"""
+    writer = csv.DictWriter(target, fieldnames=['line', 'errors', *COLUMNS], extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows(rejects)
+
+
+def queue_import(upload, upsert=True, requested_by=''):
+    """Enregistre un fichier envoyé et le met en file pour import_worker ; retourne l'ImportJob"""
+    file_format = detect_format(upload.name)
+    job = ImportJob(file_format=file_format, upsert=upsert, requested_by=requested_by)
+    job.source.save(os.path.basename(upload.name), upload, save=False)
+    job.save()
+    return job
+
+
+def claim_import_job(worker):
+    """Réserve le prochain import en attente (mise à jour conditionnelle, comme claim_task)"""
+    while True:
+        job = ImportJob.objects.filter(status='pending').order_by('id').first()
+        if job is None:
+            return None
+        if ImportJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', worker=worker, date_debut=timezone.now(),
+        ):
+            job.refresh_from_db()
+            return job
+
+
+def run_import_job(job):
+    """Charge le fichier d'un import réservé ; le fichier est supprimé une fois importé"""
+    try:
+        with job.source.open('rb') as source:
+            report = import_casdetest(source, file_format=job.file_format, upsert=job.upsert)
+    except Exception as e:
+        logger.exception("Échec de l'import %s", job.pk)
+        ImportJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), date_fin=timezone.now())
+        return False
+    ImportJob.objects.filter(pk=job.pk).update(status='done', report=report, date_fin=timezone.now())
+    job.source.delete(save=False)
+    return True
+
+
+def work_imports(worker=None, once=False, poll_interval=None, stop=None):
+    """Boucle de import_worker (voir reports.work) ; retourne le nombre d'imports traités"""
+    worker = worker or worker_name()
+    poll_interval = poll_interval or import_settings()['POLL_INTERVAL']
+    processed = 0
+    while not (stop and stop()):
+        job = claim_import_job(worker)
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_import_job(job)
+        processed += 1
+    return processed
+
+
+def import_job_status(job):
+    """État d'un import en file pour l'API (rapport une fois terminé)"""
+    return {
+        'id': job.pk,
+        'file': os.path.basename(job.source.name),
+        'status': job.status,
+        'report': job.report or None,
+        'error': job.error or None,
+        'created': job.date_creation.isoformat(),
+        'finished': job.date_fin.isoformat() if job.date_fin else None,
+    }
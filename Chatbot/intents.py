@@ -0,0 +1,432 @@
+"""
+Classifieur local des demandes de graphique, consulté avant le LLM
+
+Les demandes courantes ("combien de tests en échec", "créations mensuelles")
+sont classées sans appel au LLM : chaque requête est représentée par ses
+n-grammes de caractères (3 à 5, dans les mots) et ses mots, pondérés en
+TF-IDF, puis comparée par similarité cosinus aux exemples étiquetés (plus
+proches voisins). Les exemples sont indexés par n-gramme (index inversé en
+tableaux numpy) : une prédiction coûte une fraction de milliseconde.
+Un exemple quasi identique à la requête (similarité ≥ EXACT_MATCH) décide
+seul ; sinon, les plus proches voisins votent pour leur intention (groupby,
+dimension), chacun avec sa similarité. La confiance est la part des votes
+de l'intention retenue multipliée par la similarité moyenne de ses voisins.
+
+L'étiquette d'un exemple est le triplet (groupby, chart_type, dimension) ;
+la période et les états cités ("sur 6 mois", "les KO") sont extraits par
+expressions régulières. Sous le seuil de confiance, la requête part au LLM.
+
+Le modèle est entraîné sur intent_examples.json et, par la commande
+train_intent_classifier, sur les analyses du LLM journalisées
+(ChartQueryLog) ; il est relu dès que son fichier change.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .charts import GROUPBY_COLUMNS, GROUPBY_HISTORY, GROUPBY_PERIODS
+from .entities import fold
+from .models import ChartQueryLog
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'THRESHOLD': 0.35,
+    'MODEL_PATH': None,
+    'EXAMPLES_PATH': os.path.join(os.path.dirname(__file__), 'intent_examples.json'),
+}
+
+CHART_TYPES = ('bar', 'line', 'pie', 'doughnut', 'radar')
+
+# Tailles des n-grammes de caractères
+NGRAM_SIZES = (3, 4, 5)
+
+# Voisins consultés pour une prédiction
+NEIGHBORS = 7
+
+# Similarité au-delà de laquelle le plus proche exemple décide sans vote
+EXACT_MATCH = 0.9
+
+# Groupements de période : valeur de GROUPBY_PERIODS → groupby canonique
+PERIOD_GROUPBYS = {'month': 'mois', 'week': 'semaine'}
+
+# Mots ignorés : mots vides et mots présents dans toutes les demandes ("tests", "combien")
+STOPWORDS = {
+    'le', 'la', 'les', 'l', 'de', 'des', 'du', 'd', 'un', 'une', 'et', 'ou', 'en', 'au', 'aux',
+    'par', 'pour', 'sur', 'dans', 'a', 'que', 'qui', 'ce', 'cette', 'ces', 'il', 'ils', 'leur',
+    'est', 'sont', 'ont', 'plus', 'chaque', 'quel', 'quels', 'quelle', 'quelles', 'montre', 'moi',
+    'affiche', 'donne', 'combien', 'nombre', 'graphique', 'graphe', 'test', 'tests', 'cas',
+    'the', 'of', 'to', 'in', 'by', 'per', 'each', 'how', 'many',
+}
+
+# Période demandée (texte sans accents), du plus long au plus court
+TIME_PERIODS = [
+    ('1_an', re.compile(r"\b(?:1|un|une|derniere|cette)\s+(?:an|annee)\b|\b12\s+(?:derniers\s+)?mois\b|\bannuel")),
+    ('6_mois', re.compile(r"\b(?:6|six)\s+(?:derniers\s+)?mois\b|\bsemestre\b")),
+    ('3_mois', re.compile(r"\b(?:3|trois)\s+(?:derniers\s+)?mois\b|\btrimestre\b")),
+    ('1_mois', re.compile(r"\b(?:1|un)\s+mois\b|\bce mois\b|\bmois[- ]ci\b|\bdernier mois\b|\b30\s+(?:derniers\s+)?jours\b")),
+]
+
+# États cités (texte sans accents) → valeur de test_state
+STATE_MENTIONS = [
+    ('KO JDD', re.compile(r"\bko\s*jdd\b")),
+    ('KO', re.compile(r"\bko\b(?!\s*jdd)|\bechecs?\b|\ben echec\b|\bechoues?\b|\bfailed\b")),
+    ('OK', re.compile(r"\bok\b|\breussis?\b|\bpassed\b")),
+    ('Blocked', re.compile(r"\bbloques?\b|\bblocked\b")),
+    ('In Progress', re.compile(r"\ben cours\b|\bin progress\b")),
+    ('Not Started', re.compile(r"\bnon demarres?\b|\bpas demarres?\b|\bnot started\b")),
+    ('N/A', re.compile(r"\bn/a\b|\bnon applicables?\b")),
+]
+
+# Type de graphique imposé par la requête (texte sans accents)
+CHART_TYPE_WORDS = [
+    ('doughnut', re.compile(r"\b(?:anneau|donut|doughnut)\b")),
+    ('pie', re.compile(r"\b(?:camembert|secteurs?|pie)\b")),
+    ('radar', re.compile(r"\bradar\b")),
+    ('line', re.compile(r"\b(?:courbe|lignes?|line)\b")),
+    ('bar', re.compile(r"\b(?:barres?|histogramme|batons|bar)\b")),
+]
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+class IntentError(ValueError):
+    """Exemples d'entraînement ou fichier de modèle invalides"""
+
+
+def intent_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'INTENT_CLASSIFIER', {})}
+
+
+def canonical_label(config):
+    """
+    Étiquette 'groupby|chart_type|dimension' d'une configuration de
+    graphique, ou None si elle sort du périmètre du classifieur
+    """
+    groupby = config.get('groupby')
+    if groupby in GROUPBY_COLUMNS:
+        groupby = GROUPBY_COLUMNS[groupby]
+    elif groupby in GROUPBY_PERIODS:
+        groupby = PERIOD_GROUPBYS[GROUPBY_PERIODS[groupby]]
+    elif groupby in GROUPBY_HISTORY:
+        groupby = 'historique'
+    else:
+        return None
+    chart_type = config.get('chart_type', 'bar')
+    if chart_type not in CHART_TYPES:
+        return None
+    dimension = GROUPBY_COLUMNS.get(config.get('dimension')) if groupby == 'historique' else None
+    return f"{groupby}|{chart_type}|{dimension or ''}"
+
+
+def intent_key(label):
+    """Intention d'une étiquette, sans le type de graphique : 'groupby|dimension'"""
+    groupby, _, dimension = label.split('|')
+    return f'{groupby}|{dimension}'
+
+
+def features(text):
+    """Traits d'une requête : mots entiers et n-grammes de caractères de chaque mot"""
+    counts = Counter()
+    # La période ("sur 6 mois") est extraite à part et ne dit rien de l'intention
+    folded = fold(text)
+    for _, pattern in TIME_PERIODS:
+        folded = pattern.sub(' ', folded)
+    for word in _WORD_RE.findall(folded):
+        if word in STOPWORDS:
+            continue
+        counts[f'w:{word}'] += 1
+        padded = f' {word} '
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                counts[padded[start:start + size]] += 1
+    return counts
+
+
+class IntentClassifier:
+    """
+    Plus proches voisins en TF-IDF (tf sous-linéaire, vecteurs normés) :
+    pour chaque trait, les exemples qui le contiennent et leur poids
+    (indptr/indices/weights, comme une matrice CSC)
+    """
+
+    def __init__(self, vocabulary, idf, indptr, indices, weights, labels):
+        self.vocabulary = {feature: position for position, feature in enumerate(vocabulary)}
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.labels = list(labels)
+
+    @classmethod
+    def train(cls, examples):
+        """Entraîne sur [(requête, étiquette)] ; lève IntentError si la liste est vide"""
+        examples = [(text, label) for text, label in examples if text and label]
+        if not examples:
+            raise IntentError("Aucun exemple d'entraînement")
+        documents = [features(text) for text, _ in examples]
+        frequencies = Counter(feature for document in documents for feature in document)
+        vocabulary = sorted(frequencies)
+        position = {feature: index for index, feature in enumerate(vocabulary)}
+        count = len(documents)
+        idf = np.array([math.log((1 + count) / (1 + frequencies[feature])) + 1 for feature in vocabulary])
+
+        postings = [[] for _ in vocabulary]
+        for row, document in enumerate(documents):
+            columns = np.array([position[feature] for feature in document], dtype=np.int64)
+            values = (1 + np.log(np.array(list(document.values()), dtype=float))) * idf[columns]
+            # Un exemple sans trait (mots vides seulement) n'est le voisin d'aucune requête
+            if len(values):
+                values /= np.linalg.norm(values)
+            for column, value in zip(columns, values):
+                postings[column].append((row, value))
+
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(entries) for entries in postings])
+        indices = np.array([row for entries in postings for row, _ in entries], dtype=np.int32)
+        weights = np.array([value for entries in postings for _, value in entries], dtype=float)
+        return cls(vocabulary, idf, indptr, indices, weights, [label for _, label in examples])
+
+    def vectorize(self, text):
+        """
+        Positions et poids des traits connus d'une requête, normés sur tous
+        ses traits : un trait inconnu compte avec l'idf maximal et fait baisser
+        la similarité d'une requête hors sujet
+        """
+        known, unknown = [], []
+        for feature, tf in features(text).items():
+            weight = 1 + math.log(tf)
+            if feature in self.vocabulary:
+                known.append((self.vocabulary[feature], weight))
+            else:
+                unknown.append(weight)
+        if not known:
+            return np.array([], dtype=np.int64), np.array([])
+        columns = np.array([column for column, _ in known])
+        values = np.array([weight for _, weight in known]) * self.idf[columns]
+        norm = math.sqrt(float(values @ values) + sum(weight * weight for weight in unknown) * self.idf.max() ** 2)
+        return columns, values / norm
+
+    def scores(self, text):
+        """Similarité cosinus de la requête avec chaque exemple"""
+        columns, values = self.vectorize(text)
+        if not len(columns):
+            return np.zeros(len(self.labels))
+        starts, ends = self.indptr[columns], self.indptr[columns + 1]
+        rows = np.concatenate([self.indices[start:end] for start, end in zip(starts, ends)])
+        contributions = np.concatenate([
+            self.weights[start:end] * value for start, end, value in zip(starts, ends, values)
+        ])
+        return np.bincount(rows, weights=contributions, minlength=len(self.labels))
+
+    def vote(self, scores):
+        """
+        (étiquette, confiance) élue par les NEIGHBORS exemples les plus
+        proches ; (None, 0.0) si aucun ne partage de trait avec la requête
+        """
+        neighbors = np.argsort(-scores)[:NEIGHBORS]
+        neighbors = neighbors[scores[neighbors] > 0]
+        if not len(neighbors):
+            return None, 0.0
+        # Exemple quasi identique : un groupe de voisins plus lointains ne l'emporte pas
+        if scores[neighbors[0]] >= EXACT_MATCH:
+            return self.labels[neighbors[0]], float(scores[neighbors[0]])
+        votes = Counter()
+        voters = {}
+        for row in neighbors:
+            intent = intent_key(self.labels[row])
+            votes[intent] += scores[row]
+            # Voisins par similarité décroissante : le premier porte le type de graphique
+            voters.setdefault(intent, []).append(row)
+        intent, weight = votes.most_common(1)[0]
+        rows = voters[intent]
+        return self.labels[rows[0]], float(weight / sum(votes.values()) * weight / len(rows))
+
+    def predict(self, text):
+        """(étiquette, confiance) d'une requête, voir vote()"""
+        return self.vote(self.scores(text))
+
+    def evaluate(self, texts, threshold):
+        """
+        Validation croisée « leave-one-out » sur les exemples d'entraînement,
+        par intention (groupby, dimension) : {'accuracy', 'coverage',
+        'precision'} ; couverture et précision au-dessus du seuil de confiance
+        """
+        correct = covered = covered_correct = 0
+        for row, text in enumerate(texts):
+            scores = self.scores(text)
+            scores[row] = 0.0
+            label, confidence = self.vote(scores)
+            hit = label is not None and intent_key(label) == intent_key(self.labels[row])
+            correct += hit
+            if confidence >= threshold:
+                covered += 1
+                covered_correct += hit
+        total = len(texts) or 1
+        return {
+            'accuracy': correct / total,
+            'coverage': covered / total,
+            'precision': covered_correct / covered if covered else 0.0,
+        }
+
+    def save(self, path):
+        vocabulary = [''] * len(self.vocabulary)
+        for feature, position in self.vocabulary.items():
+            vocabulary[position] = feature
+        with open(path, 'wb') as handle:
+            np.savez_compressed(
+                handle, vocabulary=np.array(vocabulary), idf=self.idf, indptr=self.indptr,
+                indices=self.indices, weights=self.weights, labels=np.array(self.labels),
+            )
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls(
+                    data['vocabulary'].tolist(), data['idf'], data['indptr'], data['indices'],
+                    data['weights'], data['labels'].tolist(),
+                )
+        except (OSError, KeyError, ValueError) as e:
+            raise IntentError(f"Modèle illisible ({path}): {e}")
+
+
+def load_examples(path=None):
+    """[(requête, étiquette)] du fichier d'exemples (liste de configurations avec 'query')"""
+    path = path or intent_settings()['EXAMPLES_PATH']
+    try:
+        with open(path, encoding='utf-8') as handle:
+            items = json.load(handle)
+    except (OSError, ValueError) as e:
+        raise IntentError(f"Exemples illisibles ({path}): {e}")
+    examples = []
+    for item in items:
+        label = canonical_label(item)
+        if not item.get('query') or label is None:
+            raise IntentError(f"Exemple invalide: {item}")
+        examples.append((item['query'], label))
+    return examples
+
+
+_classifier = None
+_classifier_source = None
+_classifier_lock = threading.Lock()
+
+
+def _model_source(config):
+    """Fichier du modèle entraîné et sa date de modification, sinon None"""
+    path = config['MODEL_PATH']
+    if path:
+        try:
+            return str(path), os.path.getmtime(path)
+        except OSError:
+            pass
+    return None
+
+
+def get_classifier():
+    """
+    Classifieur du processus : le modèle MODEL_PATH (relu s'il change), à
+    défaut un modèle entraîné sur le seul fichier d'exemples
+    """
+    global _classifier, _classifier_source
+    config = intent_settings()
+    source = _model_source(config)
+    with _classifier_lock:
+        if _classifier is None or _classifier_source != source:
+            if source:
+                _classifier = IntentClassifier.load(source[0])
+            else:
+                _classifier = IntentClassifier.train(load_examples(config['EXAMPLES_PATH']))
+            _classifier_source = source
+        return _classifier
+
+
+def time_period(text):
+    """Période demandée ('1_mois', '3_mois', '6_mois', '1_an'), 'tout' par défaut"""
+    folded = fold(text)
+    for period, pattern in TIME_PERIODS:
+        if pattern.search(folded):
+            return period
+    return 'tout'
+
+
+def state_filters(text):
+    """Filtre test_state des états cités ('les KO', 'tests bloqués'), vide sinon"""
+    folded = fold(text)
+    states = [state for state, pattern in STATE_MENTIONS if pattern.search(folded)]
+    return {'test_state': states} if states else {}
+
+
+def explicit_chart_type(text):
+    folded = fold(text)
+    for chart_type, pattern in CHART_TYPE_WORDS:
+        if pattern.search(folded):
+            return chart_type
+    return None
+
+
+def classify_chart_request(user_query):
+    """
+    Configuration de graphique (forme de parse_chart_analysis, sans titre) et
+    confiance, ou None si le classifieur est désactivé ou sous le seuil
+    """
+    config = intent_settings()
+    if not config['ENABLED']:
+        return None
+    try:
+        label, confidence = get_classifier().predict(user_query)
+    except IntentError as e:
+        # Modèle ou exemples illisibles : le LLM prend le relais
+        logger.warning("Classifieur indisponible: %s", e)
+        return None
+    if label is None or confidence < config['THRESHOLD']:
+        return None
+
+    groupby, chart_type, dimension = label.split('|')
+    filters = state_filters(user_query)
+    if groupby == 'historique':
+        # Les courbes d'évolution ne se filtrent que sur leur propre dimension
+        filters = filters if dimension == 'test_state' else {}
+    elif groupby == 'test_state' and len(filters.get('test_state', ())) > 1:
+        # "combien de tests OK, KO ou bloqués" : les états sont les barres, pas un filtre
+        filters = {}
+    chart_config = {
+        'chart_type': explicit_chart_type(user_query) or chart_type,
+        'data_source': 'demandes',
+        'groupby': groupby,
+        'time_period': time_period(user_query),
+        'metric': 'count',
+        'filters': filters,
+    }
+    if dimension:
+        chart_config['dimension'] = dimension
+    return chart_config, confidence
+
+
+aclassify_chart_request = sync_to_async(classify_chart_request)
+
+
+def log_chart_query(user_query, config, source, confidence=None):
+    """
+    Journalise une configuration analysée (données d'entraînement du
+    classifieur) ; une erreur d'écriture n'interrompt pas la requête
+    """
+    try:
+        ChartQueryLog.objects.create(query=user_query, config=config, source=source, confidence=confidence)
+    except Exception as e:
+        logger.warning("Journalisation de la requête impossible: %s", e)
+
+
+alog_chart_query = sync_to_async(log_chart_query)
@@ -0,0 +1,225 @@
+"""
+Client LLM partagé par le processus (repli Mistral de generate_chart)
+
+Le client est créé paresseusement au premier appel puis réutilisé par toutes
+les requêtes du worker : le pool de connexions HTTP (keep-alive) évite de
+repayer la poignée de main TLS à chaque requête non reconnue par mots-clés.
+Un httpx.AsyncClient reste lié à la boucle d'événements de sa première
+requête : les appels asynchrones utilisent un client par boucle (async_to_sync
+en crée une par appel sous WSGI, chaque worker uvicorn a la sienne).
+"""
+
+import asyncio
+import json
+import os
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from langchain_core.messages import AIMessage
+
+from .charts import GROUPBY_COLUMNS
+
+
+# Valeurs par défaut, surchargeables dans settings.py ou par variable d'environnement
+LLM_DEFAULTS = {
+    'LLM_BACKEND': 'mistral',
+    'MISTRAL_API_KEY': '',
+    'MISTRAL_MODEL': 'mistral-large-latest',
+    'MISTRAL_ENDPOINT': 'https://api.mistral.ai/v1',
+    'LLM_TIMEOUT': 30.0,
+    'LLM_CONNECT_TIMEOUT': 5.0,
+    'LLM_MAX_RETRIES': 2,
+    'LLM_MAX_CONNECTIONS': 20,
+    'LLM_MAX_KEEPALIVE': 10,
+    'LLM_KEEPALIVE_EXPIRY': 60.0,
+}
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def llm_setting(name):
+    """Lit un paramètre LLM : settings Django, puis environnement, puis défaut"""
+    default = LLM_DEFAULTS[name]
+    value = getattr(settings, name, None)
+    if value is None:
+        value = os.environ.get(name, default)
+    if isinstance(default, (int, float)) and not isinstance(value, type(default)):
+        value = type(default)(value)
+    return value
+
+
+def get_llm():
+    """
+    Retourne le client LLM du processus, créé au premier appel.
+    Sûr en multi-thread (verrouillage à double vérification).
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = build_llm()
+    return _llm
+
+
+def reset_llm():
+    """Ferme et oublie le client courant (changement de configuration, tests)"""
+    global _llm
+    with _llm_lock:
+        if _llm is not None and hasattr(_llm, 'close'):
+            _llm.close()
+        _llm = None
+
+
+def build_llm():
+    """Construit le backend configuré par LLM_BACKEND"""
+    backend = llm_setting('LLM_BACKEND')
+    if backend == 'mistral':
+        return build_mistral_llm()
+    if backend == 'stub':
+        return StubLLM()
+    # Chemin pointé vers une fabrique ou une classe, ex. 'monapp.llm.MonBackend'
+    return import_string(backend)()
+
+
+def build_mistral_llm():
+    """ChatMistralAI branché sur des clients httpx poolés (voir PooledMistralLLM)"""
+    from langchain_mistralai import ChatMistralAI
+
+    api_key = llm_setting('MISTRAL_API_KEY')
+    if not api_key:
+        raise ImproperlyConfigured(
+            "MISTRAL_API_KEY manquante : définir la variable d'environnement "
+            "(ou LLM_BACKEND='stub' pour travailler sans réseau)."
+        )
+    endpoint = llm_setting('MISTRAL_ENDPOINT')
+    timeout = httpx.Timeout(llm_setting('LLM_TIMEOUT'), connect=llm_setting('LLM_CONNECT_TIMEOUT'))
+    limits = httpx.Limits(
+        max_connections=llm_setting('LLM_MAX_CONNECTIONS'),
+        max_keepalive_connections=llm_setting('LLM_MAX_KEEPALIVE'),
+        keepalive_expiry=llm_setting('LLM_KEEPALIVE_EXPIRY'),
+    )
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Authorization': f'Bearer {api_key}',
+    }
+    # Les reprises du transport couvrent les échecs de connexion ;
+    # max_retries côté ChatMistralAI couvre les erreurs de l'API
+    retries = llm_setting('LLM_MAX_RETRIES')
+    client = httpx.Client(
+        base_url=endpoint, headers=headers, timeout=timeout,
+        transport=httpx.HTTPTransport(retries=retries, limits=limits),
+    )
+
+    def make_async_client():
+        return httpx.AsyncClient(
+            base_url=endpoint, headers=headers, timeout=timeout,
+            transport=httpx.AsyncHTTPTransport(retries=retries, limits=limits),
+        )
+
+    llm = ChatMistralAI(
+        model=llm_setting('MISTRAL_MODEL'),
+        mistral_api_key=api_key,
+        endpoint=endpoint,
+        client=client,
+        max_retries=retries,
+        timeout=int(llm_setting('LLM_TIMEOUT')),
+    )
+    return PooledMistralLLM(llm, make_async_client)
+
+
+def _aclose_on(loop, client):
+    """Ferme un httpx.AsyncClient sur sa boucle, sans attendre si elle tourne ailleurs"""
+    if loop.is_closed():
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    else:
+        loop.run_until_complete(client.aclose())
+
+
+class PooledMistralLLM:
+    """
+    ChatMistralAI à client synchrone partagé et client asynchrone par boucle
+    d'événements. Les appels synchrones (invoke, stream) passent par le
+    modèle de base ; ainvoke et astream par sa copie propre à la boucle
+    courante, oubliée avec la boucle.
+    """
+
+    def __init__(self, llm, make_async_client):
+        self.llm = llm
+        self.make_async_client = make_async_client
+        self._by_loop = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def for_running_loop(self):
+        """Copie du modèle dont le client asynchrone appartient à la boucle courante"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            llm = self._by_loop.get(loop)
+            if llm is None:
+                llm = self.llm.model_copy(update={'async_client': self.make_async_client()})
+                self._by_loop[loop] = llm
+            return llm
+
+    def invoke(self, *args, **kwargs):
+        return self.llm.invoke(*args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        return self.llm.stream(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        return await self.for_running_loop().ainvoke(*args, **kwargs)
+
+    def astream(self, *args, **kwargs):
+        return self.for_running_loop().astream(*args, **kwargs)
+
+    def close(self):
+        """Ferme le client synchrone et les clients asynchrones des boucles encore ouvertes"""
+        self.llm.client.close()
+        with self._lock:
+            loops = list(self._by_loop.items())
+            self._by_loop.clear()
+        for loop, llm in loops:
+            _aclose_on(loop, llm.async_client)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+class StubLLM:
+    """
+    Backend local sans réseau, pour les mesures de performance et le
+    développement hors ligne. Répond au prompt d'analyse de graphique avec
+    un JSON déduit de la requête utilisateur par simple recherche de mots-clés.
+    """
+
+    def invoke(self, prompt, **kwargs):
+        return AIMessage(content=json.dumps(self.analyze(prompt), ensure_ascii=False))
+
+    async def ainvoke(self, prompt, **kwargs):
+        return self.invoke(prompt, **kwargs)
+
+    def analyze(self, prompt):
+        marker = 'REQUÊTE UTILISATEUR: "'
+        query = prompt
+        if marker in prompt:
+            query = prompt.split(marker, 1)[1].split('"', 1)[0]
+        query = query.lower()
+
+        groupby = next((key for key in GROUPBY_COLUMNS if key in query), 'test_state')
+        chart_type = next((t for t in ('pie', 'doughnut', 'line', 'radar') if t in query), 'bar')
+        return {
+            'chart_type': chart_type,
+            'data_source': 'demandes',
+            'groupby': groupby,
+            'metric': 'count',
+            'title': '',
+            'description': '',
+            'filters': {},
+        }
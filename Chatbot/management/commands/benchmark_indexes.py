@@ -0,0 +1,155 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Chatbot.models import LEVEL_CODES, CasDeTest
+
+BENCH_TABLE = 'bench_casdetest'
+
+# Formes de requêtes émises par les graphiques (voir aggregations.count_by)
+QUERY_SHAPES = {
+    'prio': 'SELECT prio, COUNT(*) FROM {table} GROUP BY prio',
+    'criticality': 'SELECT criticality, COUNT(*) FROM {table} GROUP BY criticality',
+    'test_state': 'SELECT test_state, COUNT(*) FROM {table} GROUP BY test_state',
+    'projet': 'SELECT projet, COUNT(*) FROM {table} GROUP BY projet',
+    'profile': 'SELECT profile, COUNT(*) FROM {table} GROUP BY profile',
+    'test_perimeter': 'SELECT test_perimeter, COUNT(*) FROM {table} GROUP BY test_perimeter',
+    'prio × criticality': 'SELECT prio, criticality, COUNT(*) FROM {table} GROUP BY prio, criticality',
+    'projet × test_state': 'SELECT projet, test_state, COUNT(*) FROM {table} GROUP BY projet, test_state',
+    "projet = X, état": (
+        "SELECT test_state, COUNT(*) FROM {table} WHERE projet = 'Projet_1' GROUP BY test_state"
+    ),
+    # prio est stocké en smallint (voir fields.CodedChoiceField)
+    "prio = High, criticité": (
+        "SELECT criticality, COUNT(*) FROM {table} "
+        f"WHERE prio = {LEVEL_CODES['High']} GROUP BY criticality"
+    ),
+}
+
+
+def random_choice_sql(values):
+    """Expression SQL tirant une valeur au hasard dans `values` (textes ou entiers)"""
+    array = ', '.join(
+        str(value) if isinstance(value, int) else "'" + value.replace("'", "''") + "'"
+        for value in values
+    )
+    return f"(ARRAY[{array}])[1 + floor(random() * {len(values)})::int]"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare plans et temps des requêtes de graphiques sur une table synthétique "
+        "(PostgreSQL), sans puis avec les index de CasDeTest"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Nombre de lignes synthétiques')
+        parser.add_argument('--repeat', type=int, default=5, help='Exécutions par requête (médiane retenue)')
+        parser.add_argument('--keep', action='store_true', help='Conserver la table de benchmark')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Ce benchmark nécessite PostgreSQL.')
+
+        source_table = connection.ops.quote_name(CasDeTest._meta.db_table)
+        with connection.cursor() as cursor:
+            self.stdout.write(f"Création de {BENCH_TABLE} ({options['rows']} lignes)...")
+            cursor.execute(f'DROP TABLE IF EXISTS {BENCH_TABLE}')
+            cursor.execute(f'CREATE TABLE {BENCH_TABLE} (LIKE {source_table} INCLUDING DEFAULTS)')
+            cursor.execute(self.insert_sql(), [options['rows']])
+            cursor.execute(f'VACUUM ANALYZE {BENCH_TABLE}')
+
+            before = self.run_shapes(cursor, options['repeat'], options['verbosity'])
+
+            self.stdout.write("Création des index de CasDeTest sur la table de benchmark...")
+            for index in CasDeTest._meta.indexes:
+                columns = ', '.join(index.fields)
+                cursor.execute(f'CREATE INDEX bench_{index.name} ON {BENCH_TABLE} ({columns})')
+            cursor.execute(f'VACUUM ANALYZE {BENCH_TABLE}')
+
+            after = self.run_shapes(cursor, options['repeat'], options['verbosity'])
+
+            if not options['keep']:
+                cursor.execute(f'DROP TABLE {BENCH_TABLE}')
+
+        self.report(before, after)
+
+    def insert_sql(self):
+        fields = {field.name: field for field in CasDeTest._meta.get_fields()}
+        prio = random_choice_sql(list(fields['prio'].codes.values()))
+        criticality = random_choice_sql(list(fields['criticality'].codes.values()))
+        test_state = random_choice_sql(list(fields['test_state'].codes.values()))
+        return f"""
+            INSERT INTO {BENCH_TABLE} (
+                id, projet, marco_scenario, test_perimeter, pre_requisites, profile,
+                test_cases, prio, criticality, test_state, step_test, expected_result,
+                date_creation, date_update
+            )
+            SELECT
+                n,
+                'Projet_' || (1 + floor(random() * 20))::int,
+                'Scenario_' || n,
+                {random_choice_sql(['Frontend', 'Backend', 'API', 'Base de données', 'UI/UX'])},
+                repeat('p', 200),
+                {random_choice_sql(['Admin', 'Utilisateur', 'Testeur', 'Développeur', 'Chef de projet'])},
+                repeat('c', 1000),
+                {prio},
+                {criticality},
+                {test_state},
+                repeat('s', 1000),
+                repeat('e', 500),
+                -- Colonnes NOT NULL sans défaut en base (défaut côté Django) :
+                -- créations réparties sur l'année écoulée
+                now() - random() * interval '365 days',
+                now()
+            FROM generate_series(1, %s) AS n
+        """
+
+    def run_shapes(self, cursor, repeat, verbosity=1):
+        results = {}
+        for name, template in QUERY_SHAPES.items():
+            sql = template.format(table=BENCH_TABLE)
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql)
+            plan = cursor.fetchone()[0][0]['Plan']
+            if verbosity >= 2:
+                # Plan complet avec -v 2
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql)
+                self.stdout.write(f'--- {name}')
+                self.stdout.write('\n'.join(row[0] for row in cursor.fetchall()))
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (statistics.median(timings), scan_nodes(plan))
+        return results
+
+    def report(self, before, after):
+        self.stdout.write('')
+        header = f"{'Requête':<26} {'Avant (ms)':>11} {'Après (ms)':>11} {'Gain':>7}  Plan avant → après"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name in QUERY_SHAPES:
+            ms_before, plan_before = before[name]
+            ms_after, plan_after = after[name]
+            gain = ms_before / ms_after if ms_after else float('inf')
+            self.stdout.write(
+                f"{name:<26} {ms_before:>11.1f} {ms_after:>11.1f} {gain:>6.1f}x  "
+                f"{plan_before} → {plan_after}"
+            )
+
+
+def scan_nodes(plan):
+    """Types de parcours (Seq Scan, Index Only Scan...) présents dans un plan JSON"""
+    nodes = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if node['Node Type'].endswith('Scan') and node['Node Type'] not in nodes:
+            nodes.append(node['Node Type'])
+        stack.extend(node.get('Plans', []))
+    return ', '.join(nodes)
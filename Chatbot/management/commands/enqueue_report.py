@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Chatbot.reports import REPORT_FORMATS, ReportError, create_report_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Met en file un rapport (vue d'ensemble puis une section par projet) ; "
+        "à planifier, ex. chaque lundi : 0 6 * * 1 python manage.py enqueue_report"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--title', help='Titre du rapport')
+        parser.add_argument('--project', action='append', help='Projet à inclure (répétable ; défaut : tous)')
+        parser.add_argument('--format', choices=list(REPORT_FORMATS), default='pdf')
+
+    def handle(self, *args, **options):
+        try:
+            job = create_report_job(options['title'], options['project'], options['format'])
+        except ReportError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rapport {job.pk} en file : {job.tasks_total} tâche(s) (python manage.py report_worker).'
+        ))
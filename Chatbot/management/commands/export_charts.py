@@ -0,0 +1,79 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from Chatbot.batch import WidgetError, resolve_widget
+from Chatbot.charts import CHART_REGISTRY, dashboard_summary
+from Chatbot.filters import FilterError, filter_column, parse_filters
+from Chatbot.rendering import RENDER_FORMATS, RenderError, render_images, shutdown_executor
+from Chatbot.views import build_widget_payloads
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte des graphiques en images (PNG/SVG), dessinées en parallèle par le pool "
+        "de rendu ; ex. l'état des tests de chaque projet : --dimension test_state --each projet"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dimension', action='append',
+                            help='Graphique à exporter (répétable ; défaut : tous les graphiques du registre)')
+        parser.add_argument('--each', help='Une image par valeur de cette colonne (ex. projet)')
+        parser.add_argument('--filters', help='Filtres JSON appliqués à toutes les images')
+        parser.add_argument('--format', choices=list(RENDER_FORMATS), default='png')
+        parser.add_argument('--width', type=int, help='Largeur en pixels')
+        parser.add_argument('--height', type=int, help='Hauteur en pixels')
+        parser.add_argument('--output', default='exports', help='Dossier de destination')
+
+    def handle(self, *args, **options):
+        dimensions = options['dimension'] or [key for key in CHART_REGISTRY if key != 'matrice']
+        try:
+            filters = parse_filters(options['filters'])
+            each = filter_column(options['each']) if options['each'] else None
+        except FilterError as e:
+            raise CommandError(str(e))
+        if each and each in filters:
+            raise CommandError(f'{each} est déjà filtrée : incompatible avec --each.')
+
+        # Variantes : une par valeur de --each (valeurs lues dans le résumé du tableau de bord)
+        variants = [(None, filters)]
+        if each:
+            values = [row[each] for row in dashboard_summary(filters).rows([each], filters, order_by=each)]
+            variants = [(value, {**filters, each: [value]}) for value in values]
+
+        jobs = []
+        try:
+            for dimension in dimensions:
+                for value, variant_filters in variants:
+                    widget = resolve_widget({'dimension': dimension, 'filters': variant_filters})
+                    jobs.append((dimension, value, widget))
+        except WidgetError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        payloads = build_widget_payloads([widget for _, _, widget in jobs])
+        charts = [payload['chart_data'] for payload in payloads]
+        titles = [
+            f"{payload['title']} - {value}" if value is not None else payload['title']
+            for (_, value, _), payload in zip(jobs, payloads)
+        ]
+        self.stdout.write(f'Rendu de {len(jobs)} graphique(s)...')
+        try:
+            images = render_images(charts, options['format'], options['width'], options['height'], titles)
+        except RenderError as e:
+            raise CommandError(str(e))
+        finally:
+            shutdown_executor()
+
+        os.makedirs(options['output'], exist_ok=True)
+        for (dimension, value, _), image in zip(jobs, images):
+            name = dimension if value is None else f'{dimension}_{each}-{slugify(value) or "vide"}'
+            path = os.path.join(options['output'], f"{name}.{options['format']}")
+            with open(path, 'wb') as target:
+                target.write(image)
+            self.stdout.write(f'  {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(images)} image(s) exportée(s) en {time.perf_counter() - started:.1f}s.'
+        ))
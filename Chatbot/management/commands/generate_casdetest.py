@@ -0,0 +1,113 @@
+import multiprocessing
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from Chatbot.chart_cache import bump_data_version
+from Chatbot.counts import rebuild_counts
+from Chatbot.datagen import HISTORY_DAYS, WRITERS, init_worker, write_batch
+from Chatbot.models import CasDeTest
+from Chatbot.partitions import ensure_partitions, is_partitioned, partitioning_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère des cas de test synthétiques par lots (COPY sous PostgreSQL, "
+        "bulk_create sinon), avec graine reproductible et workers parallèles"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Nombre de lignes à générer')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Lignes par lot')
+        parser.add_argument('--seed', type=int, default=42, help='Graine des distributions aléatoires')
+        parser.add_argument('--workers', type=int, default=1, help='Processus d\'écriture parallèles')
+        parser.add_argument('--projects', type=int, default=20, help='Nombre de projets distincts')
+        parser.add_argument('--history-days', type=int, default=HISTORY_DAYS,
+                            help='Dates de création réparties sur ce nombre de jours passés')
+        parser.add_argument(
+            '--method', choices=['auto', *WRITERS], default='auto',
+            help="Mode d'insertion (auto : copy sous PostgreSQL, bulk sinon)",
+        )
+        parser.add_argument('--truncate', action='store_true', help='Vider CasDeTest avant la génération')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Alias de base de données')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        rows, batch_size, workers = options['rows'], options['batch_size'], options['workers']
+        if rows < 0 or batch_size < 1 or workers < 1 or options['history_days'] < 0:
+            raise CommandError('--rows, --batch-size, --workers et --history-days doivent être positifs.')
+
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('COPY nécessite PostgreSQL.')
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite ne supporte pas les écritures concurrentes : 1 worker.'))
+            workers = 1
+
+        if options['truncate']:
+            self.stdout.write('Vidage de CasDeTest...')
+            self.truncate(connection)
+
+        # Lot k : lignes [k * batch_size + 1, ...], graine (seed, k) ;
+        # dates de création relatives à une même date de fin pour tous les lots
+        until = datetime.now(timezone.utc)
+        if connection.vendor == 'postgresql' and is_partitioned(using):
+            # Partitions mensuelles de toute la période générée (sinon : partition par défaut)
+            ensure_partitions(
+                until - timedelta(days=options['history_days']),
+                until + timedelta(days=31 * partitioning_settings()['MONTHS_AHEAD']),
+                using=using,
+            )
+        tasks = [
+            (options['seed'], k, min(batch_size, rows - start), start + 1,
+             options['projects'], options['history_days'], until, method, using)
+            for k, start in enumerate(range(0, rows, batch_size))
+        ]
+        self.stdout.write(
+            f"Génération de {rows} lignes en {len(tasks)} lots ({method}, {workers} worker(s))..."
+        )
+
+        started = time.perf_counter()
+        written = 0
+        for count in self.run_tasks(tasks, workers):
+            written += count
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {written}/{rows} lignes ({written / elapsed:,.0f} lignes/s)')
+        elapsed = time.perf_counter() - started
+
+        # Insertions hors signaux : compteurs et cache recalculés une seule fois
+        self.stdout.write('Recalcul des compteurs agrégés...')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(CasDeTest._meta.db_table)}')
+        rebuild_counts(using)
+        bump_data_version(using)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} cas de test créés en {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} lignes/s).'
+        ))
+
+    def run_tasks(self, tasks, workers):
+        if workers == 1:
+            for task in tasks:
+                yield write_batch(task)
+            return
+
+        # Les processus fils ne doivent pas hériter d'une connexion ouverte
+        connections.close_all()
+        with multiprocessing.get_context().Pool(workers, initializer=init_worker) as pool:
+            yield from pool.imap_unordered(write_batch, tasks)
+
+    def truncate(self, connection):
+        table = connection.ops.quote_name(CasDeTest._meta.db_table)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {table} RESTART IDENTITY')
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table}')
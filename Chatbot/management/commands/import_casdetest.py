@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from Chatbot.importer import SUPPORTED_FORMATS, ImportFormatError, import_casdetest, write_rejects
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des cas de test depuis un fichier CSV ou XLSX, par blocs, "
+        "avec validation des colonnes à choix et upsert sur (projet, marco_scenario)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Fichier CSV ou XLSX')
+        parser.add_argument('--format', choices=SUPPORTED_FORMATS, help="Format (par défaut d'après l'extension)")
+        parser.add_argument('--chunksize', type=int, default=5000, help='Lignes par bloc')
+        parser.add_argument('--no-upsert', action='store_true', help='Toujours créer, sans rechercher les cas existants')
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto',
+                            help="Mode d'insertion (auto : copy sous PostgreSQL, bulk sinon)")
+        parser.add_argument('--rejects', help='Fichier CSV où écrire les lignes rejetées')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Alias de base de données')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  bloc {report['chunks']}: {report['rows']} lignes lues, "
+                f"{report['created']} créées, {report['updated']} mises à jour, "
+                f"{report['rejected']} rejetées ({report['rows'] / elapsed:,.0f} lignes/s)"
+            )
+
+        # Lignes rejetées écrites bloc par bloc : le rapport n'en garde que les premières
+        rejects_file = open(options['rejects'], 'w', newline='', encoding='utf-8') if options['rejects'] else None
+        if rejects_file:
+            write_rejects([], rejects_file)
+
+        def on_rejects(rows):
+            write_rejects(rows, rejects_file, header=False)
+
+        self.stdout.write(f"Import de {options['path']}...")
+        try:
+            report = import_casdetest(
+                options['path'],
+                file_format=options['format'],
+                chunksize=options['chunksize'],
+                upsert=not options['no_upsert'],
+                method=options['method'],
+                using=options['database'],
+                progress=progress,
+                on_rejects=on_rejects if rejects_file else None,
+            )
+        except (ImportFormatError, OSError) as e:
+            raise CommandError(str(e))
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        for reject in report['rejects'][:10]:
+            self.stdout.write(self.style.WARNING(f"  ligne {reject['line']}: {reject['errors']}"))
+        if report['rejected'] > 10:
+            self.stdout.write(self.style.WARNING(f"  ... {report['rejected'] - 10} autres lignes rejetées"))
+        if options['rejects'] and report['rejected']:
+            self.stdout.write(f"Lignes rejetées écrites dans {options['rejects']}")
+        if report['duplicates']:
+            self.stdout.write(self.style.WARNING(
+                f"  {report['duplicates']} ligne(s) en double dans un bloc ignorées (dernière occurrence conservée)"
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} cas de test créés, {report['updated']} mis à jour, "
+            f"{report['rejected']} rejetés en {time.perf_counter() - started:.1f}s."
+        ))
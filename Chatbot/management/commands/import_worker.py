@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Chatbot.importer import work_imports
+
+
+class Command(BaseCommand):
+    help = "Traite la file des imports volumineux (ImportJob) envoyés par l'API d'upload"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="S'arrêter quand la file est vide")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Secondes entre deux consultations de la file vide (défaut : POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker d'import démarré...")
+        processed = work_imports(once=options['once'], poll_interval=options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} import(s) traité(s).'))
@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from Chatbot.chart_cache import bump_data_version
+from Chatbot.partitions import (
+    ARCHIVE_MODES, PartitioningError, add_months, archive_partitions, convert_to_partitioned,
+    ensure_partitions, is_partitioned, month_start, partitioning_settings,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Partitionnement mensuel de CasDeTest (PostgreSQL) : conversion initiale, "
+        "création des partitions à venir, détachement ou suppression des anciennes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Convertir la table en table partitionnée (données comprises)')
+        parser.add_argument('--keep-legacy', action='store_true',
+                            help="Conserver l'ancienne table après conversion (Chatbot_casdetest_legacy)")
+        parser.add_argument('--ahead', type=int, default=None,
+                            help='Mois de partitions à créer à l\'avance (défaut : MONTHS_AHEAD)')
+        parser.add_argument('--retention', type=int, default=None,
+                            help='Mois conservés ; les partitions plus anciennes sont archivées '
+                                 '(défaut : RETENTION_MONTHS)')
+        parser.add_argument('--archive', choices=ARCHIVE_MODES, default=None,
+                            help="detach : partition détachée et conservée ; drop : supprimée (défaut : ARCHIVE)")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Alias de base de données')
+
+    def handle(self, *args, **options):
+        config = partitioning_settings()
+        if not config['ENABLED'] and not options['convert']:
+            raise CommandError('CASDETEST_PARTITIONING["ENABLED"] est désactivé.')
+        using = options['database']
+        ahead = config['MONTHS_AHEAD'] if options['ahead'] is None else options['ahead']
+        retention = config['RETENTION_MONTHS'] if options['retention'] is None else options['retention']
+        mode = options['archive'] or config['ARCHIVE']
+        if ahead < 0 or (retention is not None and retention < 1):
+            raise CommandError('--ahead doit être positif et --retention au moins 1.')
+
+        try:
+            if options['convert']:
+                self.stdout.write('Conversion de CasDeTest en table partitionnée...')
+                rows = convert_to_partitioned(ahead, keep_legacy=options['keep_legacy'], using=using)
+                self.stdout.write(self.style.SUCCESS(f'{rows} lignes copiées dans les partitions mensuelles.'))
+            elif not is_partitioned(using):
+                raise CommandError("CasDeTest n'est pas partitionnée : lancer d'abord --convert.")
+
+            current = month_start(date.today())
+            created = ensure_partitions(current, add_months(current, ahead), using=using)
+            for name in created:
+                self.stdout.write(f'  partition créée : {name}')
+
+            if retention is not None:
+                archived = archive_partitions(add_months(current, 1 - retention), mode=mode, using=using)
+                for name in archived:
+                    self.stdout.write(f"  partition {'supprimée' if mode == 'drop' else 'détachée'} : {name}")
+        except PartitioningError as error:
+            raise CommandError(str(error))
+
+        bump_data_version(using=using)
+        self.stdout.write(self.style.SUCCESS('Partitions à jour.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from Chatbot.chart_cache import bump_data_version
+from Chatbot.counts import rebuild_counts
+
+
+class Command(BaseCommand):
+    help = 'Recalcule la table agrégée CasDeTestCount à partir de CasDeTest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Alias de base de données')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Recalcul des compteurs agrégés...")
+        buckets = rebuild_counts(options['database'])
+        bump_data_version(options['database'])
+        self.stdout.write(self.style.SUCCESS(f'{buckets} combinaisons de dimensions enregistrées.'))
@@ -0,0 +1,60 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from Chatbot.datagen import init_worker
+from Chatbot.rendering import shutdown_executor
+from Chatbot.reports import work
+
+
+def run_worker(once, poll_interval, results=None):
+    init_worker()
+    try:
+        processed = work(once=once, poll_interval=poll_interval)
+    finally:
+        shutdown_executor()
+    if results is not None:
+        results.put(processed)
+    return processed
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite la file des rapports (ReportJob) : une tâche par projet, graphiques "
+        "dessinés en parallèle, fichier PDF/PowerPoint assemblé par le dernier worker"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Workers parallèles')
+        parser.add_argument('--once', action='store_true', help="S'arrêter quand la file est vide")
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Secondes entre deux consultations de la file vide (défaut : POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes < 1:
+            raise CommandError('--processes doit être positif.')
+        if processes > 1 and connections['default'].vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite ne supporte pas les écritures concurrentes : 1 worker.'))
+            processes = 1
+
+        self.stdout.write(f'{processes} worker(s) de rapports démarré(s)...')
+        if processes == 1:
+            processed = run_worker(options['once'], options['poll_interval'])
+        else:
+            # Les processus fils ne doivent pas hériter d'une connexion ouverte.
+            # Processus non démons (pas de Pool) : chacun lance son pool de rendu.
+            connections.close_all()
+            context = multiprocessing.get_context()
+            results = context.Queue()
+            workers = [
+                context.Process(target=run_worker, args=(options['once'], options['poll_interval'], results))
+                for _ in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            processed = sum(results.get() for worker in workers if worker.exitcode == 0)
+        self.stdout.write(self.style.SUCCESS(f'{processed} tâche(s) traitée(s).'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from Chatbot.chart_cache import bump_data_version
+from Chatbot.snapshots import record_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Enregistre les comptes courants de chaque dimension dans CasDeTestSnapshot, sous "
+        "la date du jour (à planifier une fois par jour, ex. cron : 55 23 * * * "
+        "python manage.py snapshot_counts ; un jour passé ne peut pas être rattrapé)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replace', action='store_true', help='Remplacer le jour s\'il est déjà enregistré')
+
+    def handle(self, *args, **options):
+        added = record_snapshot(replace=options['replace'])
+        if added is None:
+            self.stdout.write(self.style.WARNING('Jour déjà enregistré (--replace pour le remplacer).'))
+            return
+        # Les courbes d'évolution en cache doivent voir le nouveau point
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f'{added} comptes enregistrés.'))
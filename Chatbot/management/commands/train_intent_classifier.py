@@ -0,0 +1,74 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Chatbot.intents import IntentClassifier, IntentError, canonical_label, intent_settings, load_examples
+from Chatbot.models import ChartQueryLog
+from Chatbot.query_cache import normalize_query
+
+
+class Command(BaseCommand):
+    help = (
+        "Entraîne le classifieur local des demandes de graphique sur le fichier "
+        "d'exemples et les analyses du LLM journalisées, et l'enregistre"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Fichier du modèle (défaut : INTENT_CLASSIFIER['MODEL_PATH'])")
+        parser.add_argument('--examples', help="Fichier d'exemples (défaut : INTENT_CLASSIFIER['EXAMPLES_PATH'])")
+        parser.add_argument('--days', type=int, help='Journal des N derniers jours seulement')
+        parser.add_argument('--no-logs', action='store_true', help='Ignorer le journal des requêtes')
+        parser.add_argument('--dry-run', action='store_true', help="Évaluer sans enregistrer le modèle")
+
+    def handle(self, *args, **options):
+        config = intent_settings()
+        output = options['output'] or config['MODEL_PATH']
+        if not output and not options['dry_run']:
+            raise CommandError("Aucun fichier de modèle : INTENT_CLASSIFIER['MODEL_PATH'] ou --output.")
+
+        try:
+            examples = load_examples(options['examples'])
+        except IntentError as e:
+            raise CommandError(str(e))
+        logged = [] if options['no_logs'] else self.logged_examples(options['days'], examples)
+        self.stdout.write(f"{len(examples)} exemple(s), {len(logged)} requête(s) du journal")
+
+        started = time.perf_counter()
+        training = examples + logged
+        classifier = IntentClassifier.train(training)
+        self.stdout.write(f"Entraînement : {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        threshold = config['THRESHOLD']
+        scores = classifier.evaluate([text for text, _ in training], threshold)
+        self.stdout.write(
+            f"Validation leave-one-out : exactitude {scores['accuracy']:.0%} ; au seuil {threshold}, "
+            f"couverture {scores['coverage']:.0%}, précision {scores['precision']:.0%}"
+        )
+
+        if options['dry_run']:
+            return
+        # Écriture puis renommage : les processus en cours ne lisent jamais un fichier partiel
+        partial = f'{output}.tmp'
+        classifier.save(partial)
+        os.replace(partial, output)
+        self.stdout.write(self.style.SUCCESS(f"Modèle enregistré : {output}"))
+
+    def logged_examples(self, days, examples):
+        """
+        Analyses du LLM journalisées : la plus récente par requête normalisée,
+        sauf pour les requêtes déjà présentes dans le fichier d'exemples
+        """
+        queryset = ChartQueryLog.objects.filter(source='llm')
+        if days:
+            queryset = queryset.filter(date_creation__gte=timezone.now() - timedelta(days=days))
+        known = {normalize_query(text) for text, _ in examples}
+        latest = {}
+        for query, config in queryset.order_by('date_creation', 'pk').values_list('query', 'config').iterator():
+            key = normalize_query(query)
+            label = canonical_label(config) if isinstance(config, dict) else None
+            if key and key not in known and label:
+                latest[key] = (query, label)
+        return list(latest.values())
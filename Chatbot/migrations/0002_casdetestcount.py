@@ -0,0 +1,46 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:39
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+DIMENSION_FIELDS = ('projet', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state')
+
+
+def populate_counts(apps, schema_editor):
+    CasDeTest = apps.get_model('Chatbot', 'CasDeTest')
+    CasDeTestCount = apps.get_model('Chatbot', 'CasDeTestCount')
+    db_alias = schema_editor.connection.alias
+    rows = CasDeTest.objects.using(db_alias).order_by().values(*DIMENSION_FIELDS).annotate(n=Count('id'))
+    CasDeTestCount.objects.using(db_alias).bulk_create(
+        (CasDeTestCount(count=row.pop('n'), **row) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CasDeTestCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('projet', models.CharField(max_length=100)),
+                ('test_perimeter', models.CharField(max_length=100)),
+                ('profile', models.CharField(max_length=100)),
+                ('prio', models.CharField(max_length=10)),
+                ('criticality', models.CharField(max_length=10)),
+                ('test_state', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='casdetestcount',
+            constraint=models.UniqueConstraint(fields=('projet', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state'), name='casdetestcount_dimensions_unique'),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0002_casdetestcount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['prio', 'criticality'], name='casdetest_prio_crit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['projet', 'test_state'], name='casdetest_projet_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['profile', 'test_perimeter'], name='casdetest_profile_perim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['test_state'], name='casdetest_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['criticality'], name='casdetest_crit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['test_perimeter'], name='casdetest_perimeter_idx'),
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Encodage des colonnes prio / criticality / test_state en smallint
+
+import Chatbot.fields
+from django.db import migrations, models
+from django.db.models import Case, Count, When
+
+
+LEVEL_CODES = {'High': 1, 'Medium': 2, 'Low': 3}
+TEST_STATE_CODES = {
+    'Not Started': 1, 'In Progress': 2, 'Blocked': 3,
+    'KO': 4, 'KO JDD': 5, 'OK': 6, 'N/A': 7,
+}
+COLUMN_CODES = {
+    'prio': LEVEL_CODES,
+    'criticality': LEVEL_CODES,
+    'test_state': TEST_STATE_CODES,
+}
+DIMENSION_FIELDS = ('projet', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state')
+
+
+def encode_columns(apps, schema_editor):
+    CasDeTest = apps.get_model('Chatbot', 'CasDeTest')
+    db_alias = schema_editor.connection.alias
+    # Un seul UPDATE par colonne, traduit en CASE côté base
+    CasDeTest.objects.using(db_alias).update(**{
+        f'{column}_code': Case(
+            *(When(**{column: label}, then=code) for label, code in codes.items()),
+            output_field=models.SmallIntegerField(),
+        )
+        for column, codes in COLUMN_CODES.items()
+    })
+    for column in COLUMN_CODES:
+        unknown = list(
+            CasDeTest.objects.using(db_alias).filter(**{f'{column}_code__isnull': True})
+            .values_list(column, flat=True).distinct()[:10]
+        )
+        if unknown:
+            raise ValueError(f"Valeurs hors choix dans {column}: {unknown}")
+
+
+def decode_columns(apps, schema_editor):
+    CasDeTest = apps.get_model('Chatbot', 'CasDeTest')
+    CasDeTest.objects.using(schema_editor.connection.alias).update(**{
+        column: Case(
+            *(When(**{f'{column}_code': code}, then=models.Value(label)) for label, code in codes.items()),
+            output_field=models.CharField(),
+        )
+        for column, codes in COLUMN_CODES.items()
+    })
+
+
+def populate_counts(apps, schema_editor):
+    CasDeTest = apps.get_model('Chatbot', 'CasDeTest')
+    CasDeTestCount = apps.get_model('Chatbot', 'CasDeTestCount')
+    db_alias = schema_editor.connection.alias
+    CasDeTestCount.objects.using(db_alias).all().delete()
+    rows = CasDeTest.objects.using(db_alias).order_by().values(*DIMENSION_FIELDS).annotate(n=Count('*'))
+    CasDeTestCount.objects.using(db_alias).bulk_create(
+        (CasDeTestCount(count=row.pop('n'), **row) for row in rows),
+        batch_size=1000,
+    )
+
+
+def clear_counts(apps, schema_editor):
+    apps.get_model('Chatbot', 'CasDeTestCount').objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0003_casdetest_indexes'),
+    ]
+
+    operations = [
+        # CasDeTest : index dépendant des colonnes converties
+        migrations.RemoveIndex(model_name='casdetest', name='casdetest_prio_crit_idx'),
+        migrations.RemoveIndex(model_name='casdetest', name='casdetest_projet_state_idx'),
+        migrations.RemoveIndex(model_name='casdetest', name='casdetest_state_idx'),
+        migrations.RemoveIndex(model_name='casdetest', name='casdetest_crit_idx'),
+
+        # Colonnes codées temporaires, remplies depuis les libellés
+        migrations.AddField(model_name='casdetest', name='prio_code', field=models.SmallIntegerField(null=True)),
+        migrations.AddField(model_name='casdetest', name='criticality_code', field=models.SmallIntegerField(null=True)),
+        migrations.AddField(model_name='casdetest', name='test_state_code', field=models.SmallIntegerField(null=True)),
+        migrations.RunPython(encode_columns, decode_columns),
+
+        migrations.RemoveField(model_name='casdetest', name='prio'),
+        migrations.RemoveField(model_name='casdetest', name='criticality'),
+        migrations.RemoveField(model_name='casdetest', name='test_state'),
+        migrations.RenameField(model_name='casdetest', old_name='prio_code', new_name='prio'),
+        migrations.RenameField(model_name='casdetest', old_name='criticality_code', new_name='criticality'),
+        migrations.RenameField(model_name='casdetest', old_name='test_state_code', new_name='test_state'),
+        migrations.AlterField(
+            model_name='casdetest',
+            name='prio',
+            field=Chatbot.fields.CodedChoiceField(codes={'High': 1, 'Medium': 2, 'Low': 3}),
+        ),
+        migrations.AlterField(
+            model_name='casdetest',
+            name='criticality',
+            field=Chatbot.fields.CodedChoiceField(codes={'High': 1, 'Medium': 2, 'Low': 3}),
+        ),
+        migrations.AlterField(
+            model_name='casdetest',
+            name='test_state',
+            field=Chatbot.fields.CodedChoiceField(codes={'Not Started': 1, 'In Progress': 2, 'Blocked': 3, 'KO': 4, 'KO JDD': 5, 'OK': 6, 'N/A': 7}),
+        ),
+
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['prio', 'criticality'], name='casdetest_prio_crit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['projet', 'test_state'], name='casdetest_projet_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['test_state'], name='casdetest_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['criticality'], name='casdetest_crit_idx'),
+        ),
+
+        # CasDeTestCount : table dérivée, vidée puis recalculée
+        migrations.RunPython(clear_counts, migrations.RunPython.noop),
+        migrations.RemoveConstraint(model_name='casdetestcount', name='casdetestcount_dimensions_unique'),
+        migrations.AlterField(
+            model_name='casdetestcount',
+            name='prio',
+            field=Chatbot.fields.CodedChoiceField(codes={'High': 1, 'Medium': 2, 'Low': 3}),
+        ),
+        migrations.AlterField(
+            model_name='casdetestcount',
+            name='criticality',
+            field=Chatbot.fields.CodedChoiceField(codes={'High': 1, 'Medium': 2, 'Low': 3}),
+        ),
+        migrations.AlterField(
+            model_name='casdetestcount',
+            name='test_state',
+            field=Chatbot.fields.CodedChoiceField(codes={'Not Started': 1, 'In Progress': 2, 'Blocked': 3, 'KO': 4, 'KO JDD': 5, 'OK': 6, 'N/A': 7}),
+        ),
+        migrations.AddConstraint(
+            model_name='casdetestcount',
+            constraint=models.UniqueConstraint(
+                fields=('projet', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state'),
+                name='casdetestcount_dimensions_unique',
+            ),
+        ),
+        migrations.RunPython(populate_counts, clear_counts),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:09
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.utils.timezone
+
+
+def populate_day_counts(apps, schema_editor):
+    CasDeTest = apps.get_model('Chatbot', 'CasDeTest')
+    CasDeTestDailyCount = apps.get_model('Chatbot', 'CasDeTestDailyCount')
+    db_alias = schema_editor.connection.alias
+    rows = CasDeTest.objects.using(db_alias).order_by().values(day=TruncDate('date_creation')).annotate(n=Count('*'))
+    CasDeTestDailyCount.objects.using(db_alias).bulk_create(
+        (CasDeTestDailyCount(day=row['day'], count=row['n']) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0004_encode_choice_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CasDeTestDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='casdetest',
+            name='date_creation',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='casdetest',
+            name='date_update',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='casdetest',
+            index=models.Index(fields=['date_creation'], name='casdetest_date_creation_idx'),
+        ),
+        migrations.RunPython(populate_day_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0005_casdetest_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CasDeTestSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'day'], name='casdetestsnapshot_dim_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='casdetestsnapshot',
+            constraint=models.UniqueConstraint(fields=('day', 'dimension', 'value'), name='casdetestsnapshot_unique'),
+        ),
+    ]
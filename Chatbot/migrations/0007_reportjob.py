@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0006_casdetestsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('file_format', models.CharField(default='pdf', max_length=10)),
+                ('projects', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('assembling', 'Assemblage'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('tasks_total', models.PositiveIntegerField(default=0)),
+                ('tasks_done', models.PositiveIntegerField(default=0)),
+                ('report', models.FileField(blank=True, upload_to='reports/')),
+                ('error', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReportTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('projet', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('assembling', 'Assemblage'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('images', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='Chatbot.reportjob')),
+            ],
+            options={
+                'ordering': ['job', 'position'],
+                'indexes': [models.Index(fields=['status', 'id'], name='reporttask_status_idx')],
+            },
+        ),
+    ]
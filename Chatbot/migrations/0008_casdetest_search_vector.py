@@ -0,0 +1,70 @@
+# Recherche plein texte : colonne tsvector tenue à jour par un trigger et index GIN (PostgreSQL)
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Poids : scénario (A) > cas de test (B) > étapes et résultat attendu (C) > prérequis (D).
+# Une mise à jour qui ne touche pas au texte (état, priorité...) garde le vecteur existant.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION casdetest_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.search_vector IS NOT NULL
+        AND NEW.marco_scenario IS NOT DISTINCT FROM OLD.marco_scenario
+        AND NEW.test_cases IS NOT DISTINCT FROM OLD.test_cases
+        AND NEW.step_test IS NOT DISTINCT FROM OLD.step_test
+        AND NEW.expected_result IS NOT DISTINCT FROM OLD.expected_result
+        AND NEW.pre_requisites IS NOT DISTINCT FROM OLD.pre_requisites THEN
+        NEW.search_vector := OLD.search_vector;
+    ELSE
+        NEW.search_vector :=
+            setweight(to_tsvector('french', coalesce(NEW.marco_scenario, '')), 'A')
+            || setweight(to_tsvector('french', coalesce(NEW.test_cases, '')), 'B')
+            || setweight(to_tsvector('french', coalesce(NEW.step_test, '')), 'C')
+            || setweight(to_tsvector('french', coalesce(NEW.expected_result, '')), 'C')
+            || setweight(to_tsvector('french', coalesce(NEW.pre_requisites, '')), 'D');
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER casdetest_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION casdetest_search_vector_update();
+
+UPDATE {table} SET search_vector = NULL;
+
+CREATE INDEX casdetest_search_idx ON {table} USING gin (search_vector);
+"""
+
+DROP_TRIGGER = """
+DROP INDEX IF EXISTS casdetest_search_idx;
+DROP TRIGGER IF EXISTS casdetest_search_vector_trigger ON {table};
+DROP FUNCTION IF EXISTS casdetest_search_vector_update();
+"""
+
+
+def _run(sql):
+    def operation(apps, schema_editor):
+        # Trigger et index GIN : PostgreSQL uniquement (repli par sous-chaîne ailleurs)
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        table = apps.get_model('Chatbot', 'CasDeTest')._meta.db_table
+        schema_editor.execute(sql.format(table=schema_editor.quote_name(table)), params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0007_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casdetest',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(_run(CREATE_TRIGGER), _run(DROP_TRIGGER)),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0008_casdetest_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChartQueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.TextField()),
+                ('config', models.JSONField()),
+                ('source', models.CharField(choices=[('llm', 'LLM'), ('classifier', 'Classifieur local')], max_length=20)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'date_creation'], name='chartquerylog_source_idx')],
+            },
+        ),
+    ]
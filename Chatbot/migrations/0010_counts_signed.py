@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0009_chartquerylog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='casdetestcount',
+            name='count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='casdetestdailycount',
+            name='count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='casdetestsnapshot',
+            name='count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0010_counts_signed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.FileField(upload_to='imports/')),
+                ('file_format', models.CharField(max_length=10)),
+                ('upsert', models.BooleanField(default=True)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('requested_by', models.CharField(blank=True, max_length=150)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('report', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
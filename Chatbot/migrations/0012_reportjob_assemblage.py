@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Chatbot', '0011_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='assemblages',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='date_assemblage',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,151 @@
-from django.db import models
+import os
+import threading
+from collections import Counter
+
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .fields import CodedChoiceField
+
+# Colonnes catégorielles sur lesquelles portent tous les tableaux de bord
+DIMENSION_FIELDS = ('projet', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state')
+
+# Grands champs texte (plusieurs Ko par ligne), inutiles aux listes et agrégats
+TEXT_FIELDS = ('pre_requisites', 'test_cases', 'step_test', 'expected_result')
+
+# Colonnes des listes (admin, scripts) : identification et dimensions
+SLIM_FIELDS = ('id', 'marco_scenario', *DIMENSION_FIELDS, 'date_creation')
+
+# Codes en base des colonnes à choix fixes (ne jamais renuméroter)
+LEVEL_CODES = {"High": 1, "Medium": 2, "Low": 3}
+TEST_STATE_CODES = {
+    "Not Started": 1, "In Progress": 2, "Blocked": 3,
+    "KO": 4, "KO JDD": 5, "OK": 6, "N/A": 7,
+}
+
+# Envoyé après une écriture en masse (update, bulk_create, bulk_update, delete)
+# avec `deltas` : Counter {clé de dimensions: variation}, ou None si inconnue,
+# et `day_deltas` : Counter {jour de création: variation}, ou None si inconnue ;
+# `using` : alias de la base écrite
+casdetest_bulk_changed = Signal()
+
+# Vrai pendant une suppression en masse : les post_delete ligne à ligne
+# n'ont alors pas à maintenir les compteurs, le QuerySet s'en charge
+bulk_write_state = threading.local()
+
+
+def dimension_key(values):
+    """Clé de compteur (tuple ordonné selon DIMENSION_FIELDS) d'un dict ou d'une instance"""
+    if isinstance(values, dict):
+        return tuple(values[field] for field in DIMENSION_FIELDS)
+    return tuple(getattr(values, field) for field in DIMENSION_FIELDS)
+
+
+def creation_day(value):
+    """Jour (fuseau courant) d'une date de création, clé de CasDeTestDailyCount"""
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+class CasDeTestQuerySet(models.QuerySet):
+    def slim(self, *fields):
+        """Instances limitées aux colonnes de liste (SLIM_FIELDS), plus `fields`"""
+        return self.only(*SLIM_FIELDS, *fields)
+
+    def without_text(self):
+        """Instances complètes sauf les grands champs texte (chargés à la demande)"""
+        return self.defer(*TEXT_FIELDS, 'search_vector')
+
+    def dimension_counts(self):
+        """Comptes par combinaison de dimensions, en une requête GROUP BY"""
+        rows = self.order_by().values(*DIMENSION_FIELDS).annotate(n=Count('*'))
+        return Counter({dimension_key(row): row['n'] for row in rows})
+
+    def day_counts(self):
+        """Comptes par jour de création, en une requête GROUP BY"""
+        rows = self.order_by().values(day=TruncDate('date_creation')).annotate(n=Count('*'))
+        return Counter({row['day']: row['n'] for row in rows})
+
+    def update(self, **kwargs):
+        # auto_now n'est pas appliqué par QuerySet.update
+        kwargs.setdefault('date_update', timezone.now())
+        # Jours de création modifiés : compteurs journaliers à reconstruire
+        day_deltas = None if 'date_creation' in kwargs else Counter()
+        if not any(field in kwargs for field in DIMENSION_FIELDS):
+            rows = super().update(**kwargs)
+            if rows:
+                casdetest_bulk_changed.send(
+                    sender=self.model, operation='update', deltas=Counter(), day_deltas=day_deltas, using=self.db,
+                )
+            return rows
+
+        # Une dimension change : comptes avant la mise à jour, dans la même
+        # transaction ; les comptes après s'en déduisent (valeurs constantes)
+        changed = {name: kwargs[name] for name in DIMENSION_FIELDS if name in kwargs}
+        computed = any(hasattr(value, 'resolve_expression') for value in changed.values())
+        if not computed:
+            changed = {name: self.model._meta.get_field(name).to_python(value) for name, value in changed.items()}
+        with transaction.atomic(using=self.db):
+            before = Counter() if computed else self.dimension_counts()
+            rows = super().update(**kwargs)
+            if rows:
+                if computed:
+                    # Valeur calculée (F, Case...) : compteurs reconstruits
+                    deltas = day_deltas = None
+                else:
+                    deltas = Counter()
+                    for key, n in before.items():
+                        values = dict(zip(DIMENSION_FIELDS, key), **changed)
+                        deltas[key] -= n
+                        deltas[dimension_key(values)] += n
+                casdetest_bulk_changed.send(
+                    sender=self.model, operation='update', deltas=deltas, day_deltas=day_deltas, using=self.db,
+                )
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # Lignes réellement insérées inconnues : reconstruction complète
+                deltas = day_deltas = None
+            else:
+                deltas = Counter(dimension_key(obj) for obj in objs)
+                day_deltas = Counter(creation_day(obj.date_creation) for obj in objs)
+            casdetest_bulk_changed.send(
+                sender=self.model, operation='bulk_create', deltas=deltas, day_deltas=day_deltas, using=self.db,
+            )
+        return objs
+
+    def delete(self):
+        deltas = Counter()
+        deltas.subtract(self.dimension_counts())
+        day_deltas = Counter()
+        day_deltas.subtract(self.day_counts())
+        bulk_write_state.active = True
+        try:
+            # Les récepteurs de post_delete empêchent la suppression directe :
+            # Django charge les instances, réduites ici à leur clé primaire
+            result = super(CasDeTestQuerySet, self.only('pk')).delete()
+        finally:
+            bulk_write_state.active = False
+        if result[0]:
+            casdetest_bulk_changed.send(
+                sender=self.model, operation='delete', deltas=deltas, day_deltas=day_deltas, using=self.db,
+            )
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class CasDeTest(models.Model):
     projet = models.CharField(max_length=100)
 
@@ -7,18 +154,208 @@ class CasDeTest(models.Model):
     pre_requisites = models.TextField(blank=True, null=True)
     profile = models.CharField(max_length=100)
     test_cases = models.TextField()
-    prio = models.CharField(max_length=10, choices=[
-        ("High", "High"), ("Medium", "Medium"), ("Low", "Low")
-    ])
-    criticality = models.CharField(max_length=10, choices=[
-        ("High", "High"), ("Medium", "Medium"), ("Low", "Low")
-    ])
-    test_state = models.CharField(max_length=20, choices=[
-        ("Not Started", "Not Started"), ("In Progress", "In Progress"), ("Blocked", "Blocked"),
-        ("KO", "KO"), ("KO JDD", "KO JDD"), ("OK", "OK"), ("N/A", "N/A")
-    ])
+    # Stockés en smallint, manipulés par libellé (voir fields.CodedChoiceField)
+    prio = CodedChoiceField(codes=LEVEL_CODES)
+    criticality = CodedChoiceField(codes=LEVEL_CODES)
+    test_state = CodedChoiceField(codes=TEST_STATE_CODES)
     step_test = models.TextField()
     expected_result = models.TextField()
+    # Horodatage par défaut, mais modifiable (imports, historique de charge)
+    date_creation = models.DateTimeField(default=timezone.now)
+    date_update = models.DateTimeField(auto_now=True)
+    # Recherche plein texte (PostgreSQL) : calculé par un trigger, indexé en GIN
+    # (migration 0008, voir search.py) ; reste vide sur les autres bases
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = CasDeTestQuerySet.as_manager()
+
+    class Meta:
+        # Index alignés sur les requêtes des graphiques : chaque GROUP BY
+        # (seul ou croisé) trouve un index dont il est le préfixe, ce qui
+        # permet à PostgreSQL des parcours d'index seul pour COUNT(*)
+        indexes = [
+            models.Index(fields=['prio', 'criticality'], name='casdetest_prio_crit_idx'),
+            models.Index(fields=['projet', 'test_state'], name='casdetest_projet_state_idx'),
+            models.Index(fields=['profile', 'test_perimeter'], name='casdetest_profile_perim_idx'),
+            models.Index(fields=['test_state'], name='casdetest_state_idx'),
+            models.Index(fields=['criticality'], name='casdetest_crit_idx'),
+            models.Index(fields=['test_perimeter'], name='casdetest_perimeter_idx'),
+            # Fenêtres de dates (1 mois, 6 mois...) et séries temporelles filtrées
+            models.Index(fields=['date_creation'], name='casdetest_date_creation_idx'),
+        ]
 
     def __str__(self):
         return f"{self.projet} - {self.marco_scenario} ({self.test_state})"
+
+
+class CasDeTestCount(models.Model):
+    """
+    Nombre de cas de test par combinaison de dimensions, maintenu
+    incrémentalement à chaque écriture sur CasDeTest (voir signals.py).
+    Les graphiques agrègent cette petite table au lieu de parcourir CasDeTest.
+    """
+    projet = models.CharField(max_length=100)
+    test_perimeter = models.CharField(max_length=100)
+    profile = models.CharField(max_length=100)
+    prio = CodedChoiceField(codes=LEVEL_CODES)
+    criticality = CodedChoiceField(codes=LEVEL_CODES)
+    test_state = CodedChoiceField(codes=TEST_STATE_CODES)
+    # Sans CHECK (count >= 0) : une variation appliquée à un compteur périmé ne
+    # doit pas faire échouer l'écriture ; les comptes ≤ 0 sont supprimés (counts.py)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=list(DIMENSION_FIELDS), name='casdetestcount_dimensions_unique'),
+        ]
+
+    def __str__(self):
+        return f"{' / '.join(dimension_key(self))}: {self.count}"
+
+
+class CasDeTestDailyCount(models.Model):
+    """
+    Nombre de cas de test créés par jour, maintenu avec CasDeTestCount
+    (voir signals.py). Les séries mensuelles et hebdomadaires sans filtre
+    agrègent quelques centaines de jours au lieu de parcourir l'historique.
+    """
+    day = models.DateField(unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.count}"
+
+
+class CasDeTestSnapshot(models.Model):
+    """
+    Photographie quotidienne des comptes par dimension (une ligne par jour,
+    dimension et valeur), ajoutée par la commande snapshot_counts. CasDeTest
+    ne conserve que l'état courant : les courbes d'évolution ("KO sur 6 mois")
+    lisent cette table, jamais réécrite une fois le jour enregistré.
+    """
+    day = models.DateField()
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'dimension', 'value'], name='casdetestsnapshot_unique'),
+        ]
+        indexes = [
+            # Séries d'une dimension sur une période
+            models.Index(fields=['dimension', 'day'], name='casdetestsnapshot_dim_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}={self.value}: {self.count}"
+
+
+REPORT_STATUSES = [
+    ('pending', 'En attente'),
+    ('running', 'En cours'),
+    ('assembling', 'Assemblage'),
+    ('done', 'Terminé'),
+    ('failed', 'Échec'),
+]
+
+
+class ReportJob(models.Model):
+    """
+    Rapport demandé (API ou commande planifiée), découpé en une tâche par
+    projet et traité par les workers de la file locale (voir reports.py)
+    """
+    title = models.CharField(max_length=200)
+    file_format = models.CharField(max_length=10, default='pdf')
+    projects = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=REPORT_STATUSES, default='pending')
+    tasks_total = models.PositiveIntegerField(default=0)
+    tasks_done = models.PositiveIntegerField(default=0)
+    report = models.FileField(upload_to='reports/', blank=True)
+    error = models.TextField(blank=True)
+    date_creation = models.DateTimeField(default=timezone.now)
+    # Début du dernier assemblage et nombre d'essais (reprise après STALE_AFTER)
+    date_assemblage = models.DateTimeField(null=True, blank=True)
+    assemblages = models.PositiveIntegerField(default=0)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.get_status_display()})"
+
+
+class ReportTask(models.Model):
+    """Une section d'un rapport : les graphiques d'un projet ('' : vue d'ensemble)"""
+    job = models.ForeignKey(ReportJob, on_delete=models.CASCADE, related_name='tasks')
+    position = models.PositiveIntegerField()
+    projet = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=REPORT_STATUSES, default='pending')
+    worker = models.CharField(max_length=100, blank=True)
+    images = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['job', 'position']
+        indexes = [
+            # Recherche de la prochaine tâche à traiter
+            models.Index(fields=['status', 'id'], name='reporttask_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id}/{self.position} {self.projet or 'Vue globale'} ({self.status})"
+
+
+IMPORT_STATUSES = [
+    ('pending', 'En attente'),
+    ('running', 'En cours'),
+    ('done', 'Terminé'),
+    ('failed', 'Échec'),
+]
+
+
+class ImportJob(models.Model):
+    """
+    Fichier d'import trop volumineux pour être traité dans la requête,
+    mis en file et chargé par la commande import_worker (voir importer.py)
+    """
+    source = models.FileField(upload_to='imports/')
+    file_format = models.CharField(max_length=10)
+    upsert = models.BooleanField(default=True)
+    status = models.CharField(max_length=20, choices=IMPORT_STATUSES, default='pending')
+    requested_by = models.CharField(max_length=150, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    report = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    date_creation = models.DateTimeField(default=timezone.now)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{os.path.basename(self.source.name)} ({self.get_status_display()})"
+
+
+CHART_QUERY_SOURCES = [
+    ('llm', 'LLM'),
+    ('classifier', 'Classifieur local'),
+]
+
+
+class ChartQueryLog(models.Model):
+    """
+    Requête du chatbot et configuration de graphique obtenue : données
+    d'entraînement du classifieur local (voir intents.py)
+    """
+    query = models.TextField()
+    config = models.JSONField()
+    source = models.CharField(max_length=20, choices=CHART_QUERY_SOURCES)
+    confidence = models.FloatField(null=True, blank=True)
+    date_creation = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Réentraînement sur les analyses du LLM
+            models.Index(fields=['source', 'date_creation'], name='chartquerylog_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.query[:50]} ({self.get_source_display()})"
@@ -0,0 +1,289 @@
+"""
+Partitionnement mensuel de CasDeTest par date_creation (PostgreSQL)
+
+La table est convertie une fois en table partitionnée (PARTITION BY RANGE
+sur date_creation), avec une partition par mois et une partition par défaut
+pour les dates hors des mois créés. Les requêtes filtrées sur date_creation
+(fenêtres de generate_chart_data, séries filtrées) ne lisent alors que les
+partitions concernées : PostgreSQL écarte les autres au moment du plan.
+
+La clé primaire devient (id, date_creation), une contrainte du partitionnement
+déclaratif ; id reste alimenté par la même séquence et Django l'utilise
+toujours comme clé primaire.
+
+Réglages (settings.CASDETEST_PARTITIONING) :
+    ENABLED           maintenance autorisée (commande partition_casdetest)
+    MONTHS_AHEAD      partitions créées à l'avance, en mois
+    RETENTION_MONTHS  mois conservés ; None pour ne jamais détacher
+    ARCHIVE           'detach' (la partition devient une table d'archive)
+                      ou 'drop' (supprimée)
+"""
+
+import re
+from collections import Counter
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import CasDeTest, casdetest_bulk_changed
+
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'MONTHS_AHEAD': 3,
+    'RETENTION_MONTHS': None,
+    'ARCHIVE': 'detach',
+}
+
+ARCHIVE_MODES = ('detach', 'drop')
+
+
+class PartitioningError(Exception):
+    """Opération de partitionnement impossible (base, état de la table)"""
+
+
+def partitioning_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'CASDETEST_PARTITIONING', {})}
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _table():
+    return CasDeTest._meta.db_table
+
+
+def partition_name(month):
+    """'Chatbot_casdetest_p2025_01' pour janvier 2025"""
+    return f'{_table()}_p{month.year:04d}_{month.month:02d}'
+
+
+def archive_name(month):
+    """Nom d'une partition détachée : 'Chatbot_casdetest_archive_2025_01'"""
+    return f'{_table()}_archive_{month.year:04d}_{month.month:02d}'
+
+
+def default_partition_name():
+    return f'{_table()}_default'
+
+
+def _connection(using):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('Le partitionnement nécessite PostgreSQL.')
+    return connection
+
+
+def month_datetime(month):
+    """Début du mois en UTC"""
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def _bound(month):
+    # Bornes explicites en UTC : indépendantes du fuseau de la session
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS):
+    connection = _connection(using)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace',
+            [_table()],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(using=DEFAULT_DB_ALIAS):
+    """{premier jour du mois: nom de la partition} des partitions mensuelles attachées"""
+    connection = _connection(using)
+    pattern = re.compile(re.escape(_table()) + r'_p(\d{4})_(\d{2})$')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits i '
+            'JOIN pg_class parent ON parent.oid = i.inhparent '
+            'JOIN pg_class child ON child.oid = i.inhrelid '
+            'WHERE parent.relname = %s AND parent.relnamespace = current_schema()::regnamespace',
+            [_table()],
+        )
+        names = [name for name, in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _create_partition(cursor, quote, month):
+    """Crée la partition d'un mois ; les lignes du mois déjà dans la partition par défaut y sont déplacées"""
+    table, default = quote(_table()), quote(default_partition_name())
+    name = quote(partition_name(month))
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM {default} WHERE date_creation >= {lower} AND date_creation < {upper})'
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper})')
+        return
+    # Une partition ne peut pas être créée tant que la partition par défaut
+    # contient des lignes de sa plage : détacher, déplacer, rattacher
+    cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+    cursor.execute(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper})')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {default} WHERE date_creation >= {lower} AND date_creation < {upper} '
+        f'RETURNING *) INSERT INTO {name} SELECT * FROM moved'
+    )
+    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT')
+
+
+def ensure_partitions(first_month, last_month, using=DEFAULT_DB_ALIAS):
+    """Crée les partitions mensuelles manquantes de `first_month` à `last_month` inclus ; retourne leurs noms"""
+    connection = _connection(using)
+    if not is_partitioned(using):
+        raise PartitioningError(f'{_table()} n\'est pas partitionnée (voir partition_casdetest --convert).')
+    existing = monthly_partitions(using)
+    created = []
+    month = month_start(first_month)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        while month <= month_start(last_month):
+            if month not in existing:
+                _create_partition(cursor, connection.ops.quote_name, month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(months_ahead=3, keep_legacy=False, using=DEFAULT_DB_ALIAS):
+    """
+    Convertit CasDeTest en table partitionnée par mois, données comprises
+    (une transaction, table verrouillée pendant la copie). Les index et les
+    triggers sont recréés à l'identique sur la table partitionnée. Retourne
+    le nombre de lignes copiées.
+    """
+    connection = _connection(using)
+    if is_partitioned(using):
+        raise PartitioningError(f'{_table()} est déjà partitionnée.')
+    quote = connection.ops.quote_name
+    table = quote(_table())
+    staging = quote(f'{_table()}_partitioned')
+    legacy = quote(f'{_table()}_legacy')
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN(date_creation), MAX(date_creation), MAX(id), COUNT(*) FROM {table}')
+        oldest, newest, max_id, rows = cursor.fetchone()
+
+        cursor.execute(
+            f'CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (date_creation)'
+        )
+        cursor.execute(f'CREATE TABLE {quote(default_partition_name())} PARTITION OF {staging} DEFAULT')
+        today = month_start(date.today())
+        month = month_start(oldest) if oldest else today
+        last = add_months(max(today, month_start(newest) if newest else today), months_ahead)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {quote(partition_name(month))} PARTITION OF {staging} '
+                f'FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})'
+            )
+            month = add_months(month, 1)
+        cursor.execute(f'INSERT INTO {staging} SELECT * FROM {table}')
+
+        # Index et clé primaire : mêmes noms sur la nouvelle table (migrations futures)
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes '
+            'WHERE schemaname = current_schema() AND tablename = %s',
+            [_table()],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table]
+        )
+        primary_key = cursor.fetchone()
+        if primary_key:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {quote(primary_key[0])}')
+        index_definitions = []
+        for name, definition in indexes:
+            if primary_key and name == primary_key[0]:
+                continue
+            cursor.execute(f'DROP INDEX {quote(name)}')
+            index_definitions.append(definition)
+
+        # Triggers (vecteur de recherche plein texte...) : non copiés par LIKE, recréés à l'identique
+        cursor.execute(
+            'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal',
+            [table],
+        )
+        trigger_definitions = [definition for definition, in cursor.fetchall()]
+
+        # Séquence d'un ancien serial : rattachée à la nouvelle table avant suppression de l'ancienne
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [staging]
+        )
+        identity = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        cursor.execute(f'ALTER TABLE {staging} RENAME TO {table}')
+        for definition in index_definitions + trigger_definitions:
+            cursor.execute(definition)
+        cursor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {quote(primary_key[0] if primary_key else _table() + "_pkey")} '
+            f'PRIMARY KEY (id, date_creation)'
+        )
+        if identity:
+            cursor.execute(f'ALTER TABLE {table} ALTER COLUMN id RESTART WITH %s', [(max_id or 0) + 1])
+        elif sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        if not keep_legacy:
+            cursor.execute(f'DROP TABLE {legacy}')
+        cursor.execute(f'ANALYZE {table}')
+    return rows
+
+
+def archive_partitions(before_month, mode='detach', using=DEFAULT_DB_ALIAS):
+    """
+    Détache (ou supprime) les partitions mensuelles antérieures à
+    `before_month` ; une partition détachée est renommée en table
+    d'archive (archive_name). Les compteurs agrégés et le cache des graphiques sont mis
+    à jour comme pour une suppression. Retourne les noms traités.
+    """
+    if mode not in ARCHIVE_MODES:
+        raise PartitioningError(f"Mode d'archivage inconnu: {mode}")
+    connection = _connection(using)
+    quote = connection.ops.quote_name
+    before_month = month_start(before_month)
+    archived = []
+    for month, name in sorted(monthly_partitions(using).items()):
+        if month >= before_month:
+            continue
+        with transaction.atomic(using=using):
+            rows = CasDeTest.objects.using(using).filter(
+                date_creation__gte=month_datetime(month),
+                date_creation__lt=month_datetime(add_months(month, 1)),
+            )
+            deltas, day_deltas = Counter(), Counter()
+            deltas.subtract(rows.dimension_counts())
+            day_deltas.subtract(rows.day_counts())
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {quote(_table())} DETACH PARTITION {quote(name)}')
+                if mode == 'drop':
+                    cursor.execute(f'DROP TABLE {quote(name)}')
+                else:
+                    # Le nom de partition reste libre si le mois est recréé
+                    cursor.execute(f'ALTER TABLE {quote(name)} RENAME TO {quote(archive_name(month))}')
+            casdetest_bulk_changed.send(
+                sender=CasDeTest, operation='archive', deltas=deltas, day_deltas=day_deltas, using=using,
+            )
+        archived.append(name)
+    return archived
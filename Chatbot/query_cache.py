@@ -0,0 +1,235 @@
+"""
+Cache sémantique des configurations de graphique produites par analyze_chart_request
+
+Les utilisateurs reformulent souvent les mêmes demandes ("répartition par projet",
+"cas par profil") : la clé du cache est la requête normalisée (accents retirés,
+mots vides supprimés, jetons triés), avec en repli optionnel une recherche par
+similarité d'embeddings. Une intention déjà analysée ne repasse jamais par le LLM.
+"""
+
+import copy
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+# Négations : conservées dans la clé, "tests qui ne sont pas OK" ≠ "tests OK"
+NEGATIONS = frozenset('ne n pas sans non hors sauf not no without except'.split())
+
+STOPWORDS = frozenset("""
+    a au aux avec ce ces cet cette d dans de des du en et est il ils je j l la le les leur
+    leurs lui ma me mes moi mon nos notre nous on ou par pour qu que qui s sa se ses
+    son sont sur ta te tes toi ton tu un une vos votre vous y
+    affiche afficher donne donner montre montrer voir veux voudrais peux stp svp merci
+    the of by per for show me
+""".split()) - NEGATIONS
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Paramètres par défaut, surchargeables par settings.CHART_CONFIG_CACHE
+CACHE_DEFAULTS = {
+    'BACKEND': 'memory',          # 'memory' ou 'django'
+    'DJANGO_CACHE': 'default',    # alias de CACHES si BACKEND = 'django'
+    'MAX_ENTRIES': 1000,
+    'TTL': 24 * 3600,             # secondes
+    'EMBEDDER': None,             # chemin d'une fabrique d'objet exposant embed_query()
+    'SIMILARITY_THRESHOLD': 0.92,
+}
+
+
+def normalize_query(text):
+    """
+    Forme canonique d'une requête : minuscules, accents repliés,
+    mots vides retirés (sauf les négations), jetons dédoublonnés et triés
+    """
+    folded = unicodedata.normalize('NFKD', text.lower())
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    tokens = {token for token in _TOKEN_RE.findall(folded) if token not in STOPWORDS}
+    return ' '.join(sorted(tokens))
+
+
+class ChartConfigCache:
+    """
+    Cache LRU avec TTL des configurations de graphique, indexé par requête
+    normalisée. Stockage en mémoire du processus ou dans un cache Django
+    (partagé entre workers si le backend l'est).
+    """
+
+    def __init__(self, backend='memory', django_cache='default', max_entries=1000,
+                 ttl=24 * 3600, embedder=None, similarity_threshold=0.92):
+        self.backend = backend
+        self.django_cache = caches[django_cache] if backend == 'django' else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'llm_calls': 0,
+            'llm_seconds': 0.0,
+        }
+
+    # Stockage
+
+    def _storage_key(self, key):
+        # La génération permet de vider nos entrées sans toucher au reste du cache Django
+        generation = self.django_cache.get_or_set('chart_config:generation', 0, timeout=None)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return f'chart_config:{generation}:{digest}'
+
+    def _load(self, key):
+        if self.django_cache is not None:
+            return self.django_cache.get(self._storage_key(key))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, config = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._vectors.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return config
+
+    def _store(self, key, config):
+        if self.django_cache is not None:
+            self.django_cache.set(self._storage_key(key), config, timeout=self.ttl)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, config)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._vectors.pop(evicted, None)
+
+    # Similarité
+
+    def _embed(self, key):
+        vector = np.asarray(self.embedder.embed_query(key), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, key):
+        """Clé connue la plus proche au-dessus du seuil de similarité, ou None"""
+        if self.embedder is None:
+            return None, None
+        vector = self._embed(key)
+        with self._lock:
+            if not self._vectors:
+                return None, vector
+            keys = list(self._vectors)
+            matrix = np.vstack(list(self._vectors.values()))
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return keys[best], vector
+        return None, vector
+
+    def _remember_vector(self, key, vector):
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    # API publique
+
+    def get(self, user_query):
+        """Configuration en cache pour cette requête, ou None"""
+        key = normalize_query(user_query)
+        config = self._load(key)
+        if config is not None:
+            self._count('hits')
+            return copy.deepcopy(config)
+
+        try:
+            nearest, _ = self._nearest(key)
+        except Exception:
+            nearest = None
+        if nearest is not None:
+            config = self._load(nearest)
+            if config is not None:
+                self._count('semantic_hits')
+                return copy.deepcopy(config)
+
+        self._count('misses')
+        return None
+
+    def set(self, user_query, config, llm_seconds=None):
+        """Mémorise la configuration analysée (et la durée de l'appel LLM évité ensuite)"""
+        key = normalize_query(user_query)
+        self._store(key, copy.deepcopy(config))
+        if self.embedder is not None:
+            try:
+                self._remember_vector(key, self._embed(key))
+            except Exception:
+                pass
+        if llm_seconds is not None:
+            with self._lock:
+                self._stats['llm_calls'] += 1
+                self._stats['llm_seconds'] += llm_seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+        if self.django_cache is not None:
+            self.django_cache.get_or_set('chart_config:generation', 0, timeout=None)
+            self.django_cache.incr('chart_config:generation')
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Compteurs de succès/échecs et estimation du temps LLM économisé"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['semantic_hits'] + stats['misses']
+        avg_llm = stats['llm_seconds'] / stats['llm_calls'] if stats['llm_calls'] else 0.0
+        stats['hit_rate'] = (stats['hits'] + stats['semantic_hits']) / lookups if lookups else 0.0
+        stats['avg_llm_seconds'] = avg_llm
+        stats['saved_llm_seconds'] = (stats['hits'] + stats['semantic_hits']) * avg_llm
+        stats['backend'] = self.backend
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_config_cache():
+    """Cache du processus, configuré par settings.CHART_CONFIG_CACHE"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                options = {**CACHE_DEFAULTS, **getattr(settings, 'CHART_CONFIG_CACHE', {})}
+                embedder = options['EMBEDDER']
+                if isinstance(embedder, str):
+                    embedder = import_string(embedder)()
+                _cache = ChartConfigCache(
+                    backend=options['BACKEND'],
+                    django_cache=options['DJANGO_CACHE'],
+                    max_entries=options['MAX_ENTRIES'],
+                    ttl=options['TTL'],
+                    embedder=embedder,
+                    similarity_threshold=options['SIMILARITY_THRESHOLD'],
+                )
+    return _cache
@@ -0,0 +1,314 @@
+"""
+Rendu serveur des graphiques en images (PNG, SVG) avec matplotlib
+
+Les payloads produits pour le navigateur (Chart.js : bar, line, pie,
+doughnut, radar, polarArea ; Plotly : heatmap) sont redessinés avec le
+backend Agg dans un pool de processus dédiés, démarrés et préchauffés
+(matplotlib importé, polices chargées) au premier rendu : le dessin
+n'occupe pas les workers web et les exports en masse s'exécutent en
+parallèle. Chaque image est mise en cache sous l'empreinte de son contenu
+(payload, format, taille) : un graphique inchangé n'est jamais redessiné.
+
+Un pool dont un processus est mort (mémoire, crash natif) est inutilisable :
+il est écarté et recréé, et le lot relancé une fois. Au-delà de TIMEOUT
+(pour tout le lot), les rendus encore en attente sont annulés.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+RENDER_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+DEFAULT_SETTINGS = {
+    'WORKERS': 2,
+    'TIMEOUT': 30,
+    'WIDTH': 800,
+    'HEIGHT': 500,
+    'DPI': 100,
+    'CACHE_TTL': 7 * 24 * 3600,
+}
+
+# Taille maximale acceptée pour une image, en pixels
+MAX_SIZE = 4000
+
+FALLBACK_COLORS = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22', '#34495e']
+
+
+class RenderError(ValueError):
+    """Graphique, format ou taille non supportés, ou rendu en échec"""
+
+
+def render_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'CHART_RENDER', {})}
+
+
+# --- Dessin (exécuté dans les processus du pool) ---
+
+_CSS_COLOR = re.compile(r'rgba?\(\s*([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)\s*(?:,\s*([\d.]+)\s*)?\)')
+
+
+def _color(value, position=0):
+    """Couleur CSS ('#e74c3c', 'rgba(255, 215, 0, 0.8)') → couleur matplotlib"""
+    if isinstance(value, (list, tuple)):
+        value = value[position % len(value)] if value else None
+    if isinstance(value, str):
+        match = _CSS_COLOR.fullmatch(value.strip())
+        if match:
+            red, green, blue, alpha = match.groups()
+            return float(red) / 255, float(green) / 255, float(blue) / 255, float(alpha or 1)
+        if value.startswith('#'):
+            return value
+    return FALLBACK_COLORS[position % len(FALLBACK_COLORS)]
+
+
+def _text(value):
+    """Titre Chart.js/Plotly : chaîne ou {'text': ...}"""
+    if isinstance(value, dict):
+        value = value.get('text')
+    return value or ''
+
+
+def _draw_bar(ax, labels, datasets):
+    width = 0.8 / max(len(datasets), 1)
+    for index, dataset in enumerate(datasets):
+        values = dataset.get('data', [])
+        positions = [x + (index - (len(datasets) - 1) / 2) * width for x in range(len(values))]
+        colors = [_color(dataset.get('backgroundColor'), position) for position in range(len(values))]
+        bars = ax.bar(positions, values, width=width, color=colors, label=dataset.get('label'))
+        ax.bar_label(bars, fontsize=8)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=30 if len(labels) > 6 else 0, ha='right' if len(labels) > 6 else 'center')
+    if len(datasets) > 1:
+        ax.legend()
+
+
+def _draw_line(ax, labels, datasets):
+    for index, dataset in enumerate(datasets):
+        color = _color(dataset.get('borderColor') or dataset.get('backgroundColor'), index)
+        ax.plot(range(len(labels)), dataset.get('data', []), marker='o', markersize=3, color=color,
+                label=dataset.get('label'))
+    step = max(1, len(labels) // 12)
+    ax.set_xticks(range(0, len(labels), step))
+    ax.set_xticklabels(labels[::step], rotation=30, ha='right')
+    ax.grid(alpha=0.3)
+    if len(datasets) > 1:
+        ax.legend()
+
+
+def _draw_pie(ax, labels, datasets, hole=0.0):
+    dataset = datasets[0] if datasets else {}
+    values = dataset.get('data', [])
+    if not any(values):
+        ax.text(0.5, 0.5, 'Aucune donnée', ha='center', va='center', transform=ax.transAxes)
+        ax.axis('off')
+        return
+    colors = [_color(dataset.get('backgroundColor'), position) for position in range(len(values))]
+    ax.pie(values, labels=labels, colors=colors, autopct='%1.0f%%', startangle=90,
+           wedgeprops={'width': 1 - hole} if hole else None)
+    ax.axis('equal')
+
+
+def _draw_radar(figure, labels, datasets):
+    import numpy as np
+
+    ax = figure.add_subplot(projection='polar')
+    angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+    for index, dataset in enumerate(datasets):
+        values = list(dataset.get('data', []))
+        color = _color(dataset.get('borderColor') or dataset.get('backgroundColor'), index)
+        ax.plot(angles + angles[:1], values + values[:1], color=color, label=dataset.get('label'))
+        ax.fill(angles + angles[:1], values + values[:1], color=color, alpha=0.2)
+    ax.set_xticks(angles)
+    ax.set_xticklabels(labels)
+    return ax
+
+
+def _draw_heatmap(ax, chart_data):
+    data = chart_data.get('data', {})
+    layout = chart_data.get('layout', {})
+    matrix = data.get('z', [])
+    image = ax.imshow(matrix, cmap='Blues', aspect='auto')
+    columns = data.get('x', [])
+    ax.set_xticks(range(len(columns)))
+    ax.set_xticklabels(columns, rotation=30 if len(columns) > 5 else 0, ha='right' if len(columns) > 5 else 'center')
+    ax.set_yticks(range(len(data.get('y', []))))
+    ax.set_yticklabels(data.get('y', []))
+    ax.set_xlabel(_text(layout.get('xaxis', {}).get('title')))
+    ax.set_ylabel(_text(layout.get('yaxis', {}).get('title')))
+    peak = max((max(row) for row in matrix if row), default=0)
+    for y, row in enumerate(matrix):
+        for x, value in enumerate(row):
+            ax.text(x, y, value, ha='center', va='center', color='white' if value > peak / 2 else '#2c3e50')
+    ax.figure.colorbar(image, ax=ax, label=_text(data.get('colorbar', {}).get('title')) or None)
+    return _text(layout.get('title'))
+
+
+def draw_chart(chart_data, fmt='png', width=800, height=500, dpi=100, title=None):
+    """
+    Dessine un payload de graphique et retourne l'image (bytes). Utilise
+    l'API objet de matplotlib (Figure, sans pyplot) : aucun état global.
+    """
+    from matplotlib.figure import Figure
+
+    chart_type = chart_data.get('type')
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    if chart_type == 'heatmap':
+        layout_title = _draw_heatmap(figure.add_subplot(), chart_data)
+        title = title or layout_title
+    else:
+        data = chart_data.get('data', {})
+        labels = [str(label) for label in data.get('labels', [])]
+        datasets = data.get('datasets', [])
+        if chart_type == 'radar':
+            _draw_radar(figure, labels, datasets)
+        elif chart_type in ('pie', 'doughnut', 'polarArea'):
+            _draw_pie(figure.add_subplot(), labels, datasets, hole=0.4 if chart_type == 'doughnut' else 0.0)
+        elif chart_type == 'line':
+            _draw_line(figure.add_subplot(), labels, datasets)
+        elif chart_type == 'bar':
+            _draw_bar(figure.add_subplot(), labels, datasets)
+        else:
+            raise RenderError(f"Type de graphique non supporté: {chart_type}")
+        title = title or _text(chart_data.get('options', {}).get('plugins', {}).get('title'))
+    if title:
+        figure.suptitle(title)
+    figure.tight_layout()
+    output = io.BytesIO()
+    figure.savefig(output, format=fmt, dpi=dpi)
+    return output.getvalue()
+
+
+def _warm_worker():
+    """Initialisation d'un processus du pool : imports et polices chargés une fois"""
+    import matplotlib
+    matplotlib.use('Agg')
+    draw_chart({'type': 'bar', 'data': {'labels': ['-'], 'datasets': [{'data': [1]}]}}, width=100, height=100)
+
+
+def _ready():
+    return True
+
+
+# --- Pool et cache (processus web) ---
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool de rendu du processus, créé et préchauffé au premier appel"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = render_settings()['WORKERS']
+            # 'spawn' : les processus de rendu n'héritent ni des connexions
+            # ni des threads du serveur web (comportement identique sous Windows)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_warm_worker,
+            )
+            # Une tâche par processus : tous démarrent (et se préchauffent) maintenant
+            for _ in range(workers):
+                _executor.submit(_ready)
+    return _executor
+
+
+def discard_executor(executor):
+    """Écarte un pool cassé : le prochain get_executor() en crée un nouveau"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _cache():
+    return caches[getattr(settings, 'CHART_RESULT_CACHE_ALIAS', 'default')]
+
+
+def _render_options(fmt, width, height):
+    config = render_settings()
+    if fmt not in RENDER_FORMATS:
+        raise RenderError(f"Format non supporté: {fmt} (attendu: {', '.join(RENDER_FORMATS)})")
+    try:
+        width, height = int(width or config['WIDTH']), int(height or config['HEIGHT'])
+    except (TypeError, ValueError):
+        raise RenderError(f"Taille invalide: largeur {width}, hauteur {height}")
+    if not (0 < width <= MAX_SIZE and 0 < height <= MAX_SIZE):
+        raise RenderError(f"Taille invalide: {width}x{height} (maximum {MAX_SIZE} pixels)")
+    return {'fmt': fmt, 'width': width, 'height': height, 'dpi': config['DPI']}
+
+
+def image_digest(chart_data, options, title=None):
+    """Empreinte du contenu d'une image : payload, titre, format et taille"""
+    payload = json.dumps([chart_data, title, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _render_missing(executor, keys, charts, titles, options):
+    """
+    Dessine dans le pool les images absentes du cache. Lève RenderError
+    (délai dépassé) ou BrokenProcessPool (processus de rendu mort).
+    """
+    found = _cache().get_many(keys)
+    futures = {}
+    for key, chart_data, title in zip(keys, charts, titles):
+        if key not in found and key not in futures:
+            futures[key] = executor.submit(draw_chart, chart_data, title=title, **options)
+    timeout = render_settings()['TIMEOUT']
+    _, pending = wait(futures.values(), timeout=timeout)
+    if pending:
+        # Les rendus pas encore démarrés ne doivent pas occuper le pool
+        for future in pending:
+            future.cancel()
+        raise RenderError(f"Rendu interrompu après {timeout}s")
+    return found, {key: future.result() for key, future in futures.items()}
+
+
+def render_images(charts, fmt='png', width=None, height=None, titles=None):
+    """
+    Images (bytes) d'une liste de payloads, dans l'ordre. Les images absentes
+    du cache sont dessinées en parallèle dans le pool. Lève RenderError.
+    """
+    options = _render_options(fmt, width, height)
+    titles = titles or [None] * len(charts)
+    keys = [f'render:{image_digest(chart_data, options, title)}' for chart_data, title in zip(charts, titles)]
+    for _ in range(2):
+        executor = get_executor()
+        try:
+            images, rendered = _render_missing(executor, keys, charts, titles, options)
+            break
+        except BrokenProcessPool:
+            discard_executor(executor)
+    else:
+        raise RenderError("Processus de rendu interrompus")
+    if rendered:
+        _cache().set_many(rendered, timeout=render_settings()['CACHE_TTL'])
+        images.update(rendered)
+    return [images[key] for key in keys]
+
+
+def render_image(chart_data, fmt='png', width=None, height=None, title=None):
+    """Image (bytes) d'un payload de graphique, voir render_images"""
+    return render_images([chart_data], fmt, width, height, [title])[0]
+
@@ -0,0 +1,341 @@
+"""
+Rapports PDF/PowerPoint générés par une file de tâches locale
+
+Un rapport (ReportJob) est découpé en tâches (ReportTask) : une vue
+d'ensemble puis une par projet. La file est la base de données elle-même,
+sans broker externe : les workers (commande report_worker, un ou plusieurs
+processus) réservent les tâches en attente par une mise à jour
+conditionnelle, construisent les graphiques avec les fonctions des vues,
+les dessinent en parallèle dans le pool de rendu (rendering.py) et
+déposent les images dans MEDIA_ROOT. Le worker qui termine la dernière
+tâche assemble le fichier du rapport ; un assemblage abandonné (worker
+arrêté) est repris après STALE_AFTER secondes, une fois, puis le rapport
+passe en échec.
+"""
+
+import io
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .batch import resolve_widget
+from .charts import dashboard_summary
+from .models import ReportJob, ReportTask
+from .rendering import render_images
+
+
+REPORT_FORMATS = {
+    'pdf': 'application/pdf',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
+
+DEFAULT_SETTINGS = {
+    'POLL_INTERVAL': 2,
+    'STALE_AFTER': 600,
+    'IMAGE_WIDTH': 1000,
+    'IMAGE_HEIGHT': 650,
+}
+
+OVERVIEW_TITLE = "Vue d'ensemble"
+
+# Essais d'assemblage d'un rapport, reprise après un worker arrêté comprise
+MAX_ASSEMBLAGES = 2
+
+# Graphiques de la vue d'ensemble et de chaque projet (widgets de batch.resolve_widget)
+OVERVIEW_CHARTS = [
+    {'dimension': 'matrice', 'rows': 'prio', 'cols': 'criticality'},
+    {'dimension': 'etat'},
+    {'dimension': 'projet'},
+    {'dimension': 'profil'},
+]
+PROJECT_CHARTS = [
+    {'dimension': 'matrice', 'rows': 'prio', 'cols': 'criticality'},
+    {'dimension': 'etat'},
+    {'dimension': 'profil'},
+]
+
+
+class ReportError(ValueError):
+    """Demande de rapport invalide (format, projets)"""
+
+
+def report_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'REPORT_JOBS', {})}
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def create_report_job(title=None, projects=None, file_format='pdf'):
+    """
+    Met en file un rapport : une tâche de vue d'ensemble puis une par projet
+    (tous les projets par défaut). Retourne le ReportJob.
+    """
+    if file_format not in REPORT_FORMATS:
+        raise ReportError(f"Format non supporté: {file_format} (attendu: {', '.join(REPORT_FORMATS)})")
+    if file_format == 'pptx':
+        try:
+            import pptx  # noqa: F401
+        except ImportError:
+            raise ReportError("Les rapports PowerPoint nécessitent le paquet python-pptx.")
+
+    known = [row['projet'] for row in dashboard_summary().rows(['projet'], order_by='projet')]
+    if projects is None:
+        projects = known
+    unknown = sorted(set(projects) - set(known))
+    if unknown:
+        raise ReportError(f"Projets inconnus: {', '.join(unknown)}")
+
+    job = ReportJob.objects.create(
+        title=title or f"Rapport des cas de test du {timezone.localdate():%d/%m/%Y}",
+        file_format=file_format,
+        projects=list(projects),
+        tasks_total=len(projects) + 1,
+    )
+    ReportTask.objects.bulk_create(
+        ReportTask(job=job, position=position, projet=projet)
+        for position, projet in enumerate(['', *projects])
+    )
+    return job
+
+
+def claim_task(worker):
+    """
+    Réserve la prochaine tâche à traiter (en attente, ou abandonnée par un
+    worker arrêté depuis plus de STALE_AFTER secondes). La mise à jour est
+    conditionnelle : deux workers ne peuvent pas réserver la même tâche.
+    """
+    stale = timezone.now() - timedelta(seconds=report_settings()['STALE_AFTER'])
+    while True:
+        candidates = ReportTask.objects.filter(job__status__in=('pending', 'running'))
+        task = (
+            candidates.filter(status='pending').order_by('id').first()
+            or candidates.filter(status='running', date_debut__lt=stale).order_by('id').first()
+        )
+        if task is None:
+            return None
+        claimed = ReportTask.objects.filter(
+            pk=task.pk, status=task.status, date_debut=task.date_debut,
+        ).update(status='running', worker=worker, date_debut=timezone.now())
+        if claimed:
+            ReportJob.objects.filter(pk=task.job_id, status='pending').update(status='running')
+            task.refresh_from_db()
+            return task
+
+
+def _task_widgets(task):
+    charts = PROJECT_CHARTS if task.projet else OVERVIEW_CHARTS
+    filters = {'projet': task.projet} if task.projet else None
+    return [resolve_widget(dict(item, filters=filters)) for item in charts]
+
+
+def run_task(task):
+    """Construit, dessine et enregistre les graphiques d'une tâche ; retourne les chemins des images"""
+    # Import local : les vues importent ce module pour l'API des rapports
+    from .views import build_widget_payloads
+
+    config = report_settings()
+    payloads = build_widget_payloads(_task_widgets(task))
+    images = render_images(
+        [payload['chart_data'] for payload in payloads], 'png',
+        config['IMAGE_WIDTH'], config['IMAGE_HEIGHT'],
+        titles=[payload['title'] for payload in payloads],
+    )
+    paths = []
+    for index, image in enumerate(images):
+        name = f'reports/{task.job_id}/{task.position:03d}_{index}.png'
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        paths.append(default_storage.save(name, ContentFile(image)))
+    return paths
+
+
+def _owned(task):
+    """La tâche, si le worker qui l'a réservée la détient encore"""
+    return ReportTask.objects.filter(pk=task.pk, status='running', worker=task.worker)
+
+
+def complete_task(task, images):
+    """
+    Marque une tâche terminée ; la dernière déclenche l'assemblage du rapport.
+    Sans effet (retourne False) si la tâche a été reprise par un autre worker
+    après STALE_AFTER : elle n'est alors comptée qu'une fois.
+    """
+    with transaction.atomic():
+        if not _owned(task).update(status='done', images=images):
+            return False
+        ReportJob.objects.filter(pk=task.job_id).update(tasks_done=F('tasks_done') + 1)
+    pending = ReportTask.objects.filter(job_id=task.job_id).exclude(status='done').exists()
+    # Une seule transition running → assembling réussit, même à plusieurs workers
+    started = not pending and ReportJob.objects.filter(pk=task.job_id, status='running').update(
+        status='assembling', date_assemblage=timezone.now(), assemblages=1,
+    )
+    if started:
+        assemble_report(ReportJob.objects.get(pk=task.job_id))
+    return True
+
+
+def claim_assembly():
+    """
+    Réserve l'assemblage d'un rapport abandonné (en cours depuis plus de
+    STALE_AFTER secondes : worker arrêté pendant assemble_report). Après
+    MAX_ASSEMBLAGES essais, le rapport passe en échec. Retourne le ReportJob
+    à assembler, None s'il n'y en a pas.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=report_settings()['STALE_AFTER'])
+    for job in ReportJob.objects.filter(status='assembling', date_assemblage__lt=stale).order_by('id'):
+        # Conditionnelle, comme claim_task : un seul worker reprend l'assemblage
+        abandoned = ReportJob.objects.filter(pk=job.pk, status='assembling', date_assemblage=job.date_assemblage)
+        if job.assemblages >= MAX_ASSEMBLAGES:
+            abandoned.update(status='failed', error="Assemblage interrompu", date_fin=now)
+        elif abandoned.update(date_assemblage=now, assemblages=F('assemblages') + 1):
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def fail_task(task, error):
+    """Marque la tâche et son rapport en échec, sauf si la tâche a été reprise par un autre worker"""
+    with transaction.atomic():
+        if not _owned(task).update(status='failed', error=error):
+            return False
+        ReportJob.objects.filter(pk=task.job_id).update(status='failed', error=error, date_fin=timezone.now())
+    return True
+
+
+def _sections(job):
+    """[(titre de section, [chemins d'images])] dans l'ordre des tâches"""
+    return [
+        (task.projet or OVERVIEW_TITLE, task.images)
+        for task in job.tasks.order_by('position')
+    ]
+
+
+def _build_pdf(job):
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+    from matplotlib.image import imread
+
+    output = io.BytesIO()
+    with PdfPages(output) as pdf:
+        cover = Figure(figsize=(11.69, 8.27))
+        cover.text(0.5, 0.55, job.title, ha='center', va='center', fontsize=24)
+        cover.text(0.5, 0.45, f'{len(job.projects)} projet(s)', ha='center', va='center', fontsize=14)
+        pdf.savefig(cover)
+        # Une page A4 paysage par section, graphiques en grille 2 × 2
+        for heading, images in _sections(job):
+            page = Figure(figsize=(11.69, 8.27))
+            page.suptitle(heading, fontsize=16)
+            for index, path in enumerate(images[:4]):
+                ax = page.add_subplot(2, 2, index + 1)
+                with default_storage.open(path) as handle:
+                    ax.imshow(imread(handle, format='png'))
+                ax.axis('off')
+            page.tight_layout()
+            pdf.savefig(page)
+        info = pdf.infodict()
+        info['Title'] = job.title
+    return output.getvalue()
+
+
+def _build_pptx(job):
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+
+    presentation = Presentation()
+    presentation.slide_width, presentation.slide_height = Inches(13.333), Inches(7.5)
+    blank = presentation.slide_layouts[6]
+
+    cover = presentation.slides.add_slide(blank)
+    title = cover.shapes.add_textbox(Inches(1), Inches(3), Inches(11.3), Inches(1.5)).text_frame
+    title.text = job.title
+    title.paragraphs[0].runs[0].font.size = Pt(36)
+
+    # Une diapositive par graphique, titrée par sa section
+    for heading, images in _sections(job):
+        for path in images:
+            slide = presentation.slides.add_slide(blank)
+            slide.shapes.add_textbox(Inches(0.5), Inches(0.2), Inches(12), Inches(0.6)).text_frame.text = heading
+            with default_storage.open(path) as handle:
+                slide.shapes.add_picture(io.BytesIO(handle.read()), Inches(1.2), Inches(0.9), height=Inches(6.4))
+
+    output = io.BytesIO()
+    presentation.save(output)
+    return output.getvalue()
+
+
+REPORT_BUILDERS = {
+    'pdf': _build_pdf,
+    'pptx': _build_pptx,
+}
+
+
+def assemble_report(job):
+    """Assemble le fichier du rapport à partir des images des tâches"""
+    try:
+        content = REPORT_BUILDERS[job.file_format](job)
+        name = f'rapport_{job.pk}_{slugify(job.title)[:50]}.{job.file_format}'
+        job.report.save(name, ContentFile(content), save=False)
+    except Exception as e:
+        ReportJob.objects.filter(pk=job.pk).update(status='failed', error=f"Assemblage: {e}", date_fin=timezone.now())
+        return
+    ReportJob.objects.filter(pk=job.pk).update(status='done', report=job.report.name, date_fin=timezone.now())
+
+
+def work(worker=None, once=False, poll_interval=None, stop=None):
+    """
+    Boucle d'un worker : traite les tâches jusqu'à épuisement de la file
+    (`once`) ou indéfiniment, en interrogeant la file toutes les
+    `poll_interval` secondes. Retourne le nombre de tâches traitées.
+    """
+    worker = worker or worker_name()
+    poll_interval = poll_interval or report_settings()['POLL_INTERVAL']
+    processed = 0
+    while not (stop and stop()):
+        task = claim_task(worker)
+        if task is None:
+            job = claim_assembly()
+            if job is not None:
+                assemble_report(job)
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        try:
+            images = run_task(task)
+        except Exception as e:
+            fail_task(task, f"{task.projet or OVERVIEW_TITLE}: {e}")
+        else:
+            complete_task(task, images)
+        processed += 1
+    return processed
+
+
+def job_progress(job):
+    """État d'un rapport pour l'API (progression, erreur, fichier)"""
+    return {
+        'id': job.pk,
+        'title': job.title,
+        'format': job.file_format,
+        'status': job.status,
+        'progress': {
+            'done': job.tasks_done,
+            'total': job.tasks_total,
+            'percent': round(100 * job.tasks_done / job.tasks_total) if job.tasks_total else 0,
+        },
+        'error': job.error or None,
+        'created': job.date_creation.isoformat(),
+        'finished': job.date_fin.isoformat() if job.date_fin else None,
+    }
@@ -0,0 +1,152 @@
+"""
+Recherche plein texte dans le contenu des cas de test
+
+Sous PostgreSQL, la colonne search_vector (tsvector, configuration
+'french') est tenue à jour par un trigger à chaque écriture (save, update,
+bulk_create, COPY) et indexée en GIN (migration 0008) : une recherche ne lit
+que l'index et les lignes trouvées, classées par pertinence (SearchRank).
+Le scénario pèse plus que le cas de test, lui-même plus que les étapes et le
+résultat attendu. Sur les autres bases (développement), repli sur une
+recherche par sous-chaîne de chaque mot.
+"""
+
+import re
+
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Substr
+
+from .filters import apply_filters
+from .models import TEXT_FIELDS, CasDeTest
+
+
+# Configuration de recherche PostgreSQL (racinisation, mots vides)
+SEARCH_CONFIG = 'french'
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Champs renvoyés pour chaque résultat
+RESULT_FIELDS = ('id', 'projet', 'marco_scenario', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state')
+
+# Longueur de l'extrait renvoyé par le repli hors PostgreSQL
+EXCERPT_LENGTH = 160
+
+# Demandes de recherche dans le chatbot : "tests qui parlent de connexion",
+# "cherche les cas sur le paiement", "cas contenant timeout"
+SEARCH_PATTERNS = [
+    re.compile(
+        r"\b(?:tests?|cas)\b.*?\b(?:parlent|parle|traitent|traite|mentionnent|mentionne|concernent|concerne)"
+        r"\s+(?:(?:de la|de l'|de|du|des|d'|la|le|les|l')\s*)?(?P<terms>.+)"
+    ),
+    re.compile(
+        r"\b(?:re)?cherche[rz]?\s+(?:(?:les|des)\s+)?(?:(?:tests?|cas)(?:\s+de\s+tests?)?\s+)?"
+        r"(?:(?:sur|avec|pour|contenant|concernant)\s+)?(?:(?:le|la|les|l')\s*)?(?P<terms>.+)"
+    ),
+    re.compile(r"\b(?:contenant|contiennent|contient|mentionnant)\s+(?P<terms>.+)"),
+]
+
+# Mots d'une demande de graphique : "cherche la répartition par état" n'est pas une recherche
+CHART_WORDS = re.compile(
+    r"\b(?:graphiques?|graphe|diagramme|histogramme|camembert|répartition|repartition|distribution|"
+    r"matrice|évolution|evolution|courbe|tendance)\b"
+)
+
+
+class SearchError(ValueError):
+    """Recherche vide ou pagination invalide"""
+
+
+def uses_full_text(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def match_search(user_query):
+    """Termes recherchés si la requête du chatbot est une recherche, sinon None"""
+    text = user_query.lower().strip()
+    if CHART_WORDS.search(text):
+        return None
+    for pattern in SEARCH_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            terms = match.group('terms').strip(' \t"\'«»?!.')
+            if terms:
+                return terms
+    return None
+
+
+def search_query(text):
+    """SearchQuery à la syntaxe des moteurs web : "expression exacte", -exclu, or"""
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def full_text_filter(queryset, text):
+    """Restreint un queryset aux cas de test correspondant à `text` (index GIN)"""
+    return queryset.filter(search_vector=search_query(text))
+
+
+def _substring_filter(queryset, text):
+    condition = Q()
+    for word in text.split():
+        word_condition = Q()
+        for field in ('marco_scenario', *TEXT_FIELDS):
+            word_condition |= Q(**{f'{field}__icontains': word})
+        condition &= word_condition
+    return queryset.filter(condition)
+
+
+def search_queryset(text, filters=None):
+    """
+    Cas de test correspondant à `text`, les plus pertinents d'abord, avec
+    les annotations 'rank' et 'excerpt'. Lève SearchError.
+    """
+    text = (text or '').strip()
+    if not text:
+        raise SearchError('Recherche vide')
+    queryset = apply_filters(CasDeTest.objects.all(), filters)
+    if uses_full_text(queryset.db):
+        query = search_query(text)
+        return full_text_filter(queryset, text).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            excerpt=SearchHeadline(
+                'test_cases', query, config=SEARCH_CONFIG, start_sel='«', stop_sel='»', max_words=25,
+            ),
+        ).order_by('-rank', '-pk')
+    return _substring_filter(queryset, text).annotate(
+        rank=Value(None, output_field=FloatField()),
+        excerpt=Substr('test_cases', 1, EXCERPT_LENGTH),
+    ).order_by('-pk')
+
+
+def search_casdetest(text, filters=None, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Page de résultats d'une recherche : {'query', 'total', 'page', 'pages',
+    'results'} ; chaque résultat porte ses colonnes de liste, son score et
+    un extrait du cas de test. Lève SearchError.
+    """
+    try:
+        page, page_size = int(page or 1), int(page_size or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise SearchError(f'Pagination invalide: page {page}, taille {page_size}')
+    if page < 1 or not 0 < page_size <= MAX_PAGE_SIZE:
+        raise SearchError(f'Pagination invalide (page ≥ 1, taille de 1 à {MAX_PAGE_SIZE})')
+
+    queryset = search_queryset(text, filters).values(*RESULT_FIELDS, 'rank', 'excerpt')
+    paginator = Paginator(queryset, page_size)
+    try:
+        results = list(paginator.page(page)) if paginator.count else []
+    except EmptyPage:
+        results = []
+    return {
+        'query': text.strip(),
+        'total': paginator.count,
+        'page': page,
+        'pages': paginator.num_pages if paginator.count else 0,
+        'results': results,
+    }
+
+
+asearch_casdetest = sync_to_async(search_casdetest)
@@ -0,0 +1,70 @@
+"""
+Réactions aux écritures sur CasDeTest : compteurs agrégés et cache des graphiques
+"""
+
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .chart_cache import bump_data_version
+from .counts import apply_count_deltas, apply_day_deltas, rebuild_counts, rebuild_day_counts
+from .models import (
+    DIMENSION_FIELDS, CasDeTest, bulk_write_state, casdetest_bulk_changed, creation_day, dimension_key,
+)
+
+
+@receiver(pre_save, sender=CasDeTest)
+def remember_previous_bucket(sender, instance, raw=False, using=None, **kwargs):
+    """Mémorise la combinaison de dimensions et le jour de création en base avant une mise à jour"""
+    instance._previous_bucket = instance._previous_day = None
+    if raw or instance.pk is None:
+        return
+    previous = sender._base_manager.using(using).filter(pk=instance.pk).values(*DIMENSION_FIELDS, 'date_creation').first()
+    if previous is not None:
+        instance._previous_bucket = dimension_key(previous)
+        instance._previous_day = creation_day(previous['date_creation'])
+
+
+@receiver(post_save, sender=CasDeTest)
+def update_counts_on_save(sender, instance, created, raw=False, using=None, **kwargs):
+    new_bucket = dimension_key(instance)
+    old_bucket = getattr(instance, '_previous_bucket', None)
+    deltas = Counter()
+    if old_bucket != new_bucket:
+        deltas[new_bucket] += 1
+        if old_bucket is not None:
+            deltas[old_bucket] -= 1
+    apply_count_deltas(deltas, using)
+
+    new_day = creation_day(instance.date_creation)
+    old_day = getattr(instance, '_previous_day', None)
+    if old_day != new_day:
+        day_deltas = Counter({new_day: 1})
+        if old_day is not None:
+            day_deltas[old_day] -= 1
+        apply_day_deltas(day_deltas, using)
+    bump_data_version(using)
+
+
+@receiver(post_delete, sender=CasDeTest)
+def update_counts_on_delete(sender, instance, using=None, **kwargs):
+    # Suppression en masse : le QuerySet envoie des variations groupées
+    if getattr(bulk_write_state, 'active', False):
+        return
+    apply_count_deltas(Counter({dimension_key(instance): -1}), using)
+    apply_day_deltas(Counter({creation_day(instance.date_creation): -1}), using)
+    bump_data_version(using)
+
+
+@receiver(casdetest_bulk_changed, sender=CasDeTest)
+def update_counts_on_bulk_change(sender, deltas=None, day_deltas=None, using=None, **kwargs):
+    if deltas is None:
+        rebuild_counts(using)
+    else:
+        apply_count_deltas(deltas, using)
+        if day_deltas is None:
+            rebuild_day_counts(using)
+        else:
+            apply_day_deltas(day_deltas, using)
+    bump_data_version(using)
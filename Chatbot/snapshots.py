@@ -0,0 +1,96 @@
+"""
+Historique des comptes par dimension (CasDeTestSnapshot)
+
+record_snapshot() photographie les comptes courants de chaque dimension
+sous la date du jour (les comptes passés ne sont pas conservés : un jour
+manqué reste un trou dans la série),
+avec le même GROUP BY que les graphiques de répartition (une requête
+GROUPING SETS, voir aggregations.summarize). snapshot_series() relit ces
+photographies pour les courbes d'évolution : quelques centaines de lignes
+par dimension, quelle que soit la taille de CasDeTest.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .aggregations import summarize
+from .models import DIMENSION_FIELDS, CasDeTestSnapshot
+
+
+# Dimensions photographiées
+SNAPSHOT_FIELDS = DIMENSION_FIELDS
+
+# Granularités des séries : un point par jour, ou la dernière photographie
+# de chaque semaine / mois (les comptes sont des stocks, pas des flux)
+SNAPSHOT_GRANULARITIES = ('day', 'week', 'month')
+
+
+def record_snapshot(replace=False):
+    """
+    Enregistre les comptes courants de chaque dimension à la date du jour.
+    Un jour déjà enregistré n'est pas réécrit, sauf avec `replace`. Retourne
+    le nombre de lignes ajoutées, None si le jour était déjà enregistré.
+    """
+    day = timezone.localdate()
+    summary = summarize([(field,) for field in SNAPSHOT_FIELDS])
+    rows = [
+        CasDeTestSnapshot(day=day, dimension=field, value=row[field], count=row['count'])
+        for field in SNAPSHOT_FIELDS
+        for row in summary.rows([field])
+        if row['count']
+    ]
+    with transaction.atomic():
+        existing = CasDeTestSnapshot.objects.filter(day=day)
+        if existing.exists():
+            if not replace:
+                return None
+            existing.delete()
+        CasDeTestSnapshot.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _period_key(day, granularity):
+    if granularity == 'week':
+        return day.isocalendar()[:2]
+    if granularity == 'month':
+        return day.year, day.month
+    return day
+
+
+def snapshot_series(dimension, values=None, start=None, end=None, granularity='day'):
+    """
+    Évolution des comptes d'une dimension : (jours, {valeur: [comptes]}).
+
+    Un point par jour photographié entre `start` et `end` (dates incluses),
+    ou par semaine / mois ('week', 'month') avec la dernière photographie de
+    la période. Une valeur absente d'une photographie compte 0. `values`
+    restreint les séries renvoyées (ex. ['KO']).
+    """
+    if dimension not in SNAPSHOT_FIELDS:
+        raise ValueError(f"Dimension sans historique: {dimension}")
+    if granularity not in SNAPSHOT_GRANULARITIES:
+        raise ValueError(f"Granularité non supportée: {granularity}")
+
+    rows = CasDeTestSnapshot.objects.filter(dimension=dimension)
+    if start:
+        rows = rows.filter(day__gte=start.date() if hasattr(start, 'date') else start)
+    if end:
+        rows = rows.filter(day__lte=end.date() if hasattr(end, 'date') else end)
+
+    # Dernier jour photographié de chaque période (une valeur absente ce jour-là compte 0)
+    last_days = {}
+    for day in rows.order_by('day').values_list('day', flat=True).distinct():
+        last_days[_period_key(day, granularity)] = day
+    days = sorted(last_days.values())
+
+    rows = rows.filter(day__in=days)
+    if values:
+        rows = rows.filter(value__in=values)
+    counts = {(day, value): count for day, value, count in rows.values_list('day', 'value', 'count')}
+    names = list(values) if values else sorted({value for _, value in counts})
+    series = {name: [counts.get((day, name), 0) for day in days] for name in names}
+    return days, series
+
+
+asnapshot_series = sync_to_async(snapshot_series)
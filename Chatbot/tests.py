@@ -1,3 +1,691 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import tempfile
+from datetime import date, timedelta
+from unittest import skipIf
 
-# Create your tests here.
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Permission, User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncRequestFactory, Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .aggregations import CountSummary, acrosstab, count_by, crosstab, crosstab_matrix, summarize
+from .batch import WidgetError, resolve_widget, widget_summaries
+from .chart_cache import get_data_version
+from .entities import ValueIndex
+from .filters import FilterError, apply_filters, parse_filters
+from .importer import MAX_REPORTED_REJECTS, import_casdetest, work_imports
+from .intents import IntentClassifier, classify_chart_request, intent_key, load_examples
+from .llm import build_mistral_llm
+from .models import (
+    DIMENSION_FIELDS, CasDeTest, CasDeTestCount, CasDeTestDailyCount, CasDeTestSnapshot, ReportJob, ReportTask,
+)
+from .partitions import PartitioningError, add_months, archive_name, is_partitioned, month_start, partition_name
+from .query_cache import normalize_query
+from .rendering import RenderError, get_executor, render_image, shutdown_executor
+from .search import SearchError, match_search, search_casdetest
+from .reports import MAX_ASSEMBLAGES, claim_assembly, claim_task, complete_task, work
+from .snapshots import record_snapshot, snapshot_series
+from .views import export_casdetest
+
+
+def make_case(**values):
+    """Cas de test non enregistré, complété par des valeurs par défaut"""
+    fields = {
+        'projet': 'Projet_1', 'marco_scenario': 'Scénario', 'test_perimeter': 'API',
+        'profile': 'Admin', 'test_cases': 'Cas', 'prio': 'High', 'criticality': 'Low',
+        'test_state': 'OK', 'step_test': 'Étapes', 'expected_result': 'Résultat',
+    }
+    fields.update(values)
+    return CasDeTest(**fields)
+
+
+class NormalizeQueryTests(SimpleTestCase):
+
+    def test_reformulations_share_a_key(self):
+        self.assertEqual(
+            normalize_query("Répartition des cas par projet"),
+            normalize_query("cas : répartition par PROJET"),
+        )
+
+    def test_negation_is_kept(self):
+        self.assertNotEqual(normalize_query("tests qui ne sont pas OK"), normalize_query("tests OK"))
+        self.assertNotEqual(normalize_query("tests sans KO"), normalize_query("tests KO"))
+
+
+class DataVersionTests(TestCase):
+
+    def test_version_changes_at_commit(self):
+        before = get_data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_case().save()
+            # Pas avant le commit : un lecteur concurrent verrait encore les anciennes données
+            self.assertEqual(get_data_version(), before)
+        self.assertNotEqual(get_data_version(), before)
+
+    def test_bulk_writes_change_version(self):
+        for write in (
+            lambda: CasDeTest.objects.bulk_create([make_case(), make_case()]),
+            lambda: CasDeTest.objects.update(test_state='KO'),
+            lambda: CasDeTest.objects.all().delete(),
+        ):
+            before = get_data_version()
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertNotEqual(get_data_version(), before)
+
+
+class ImportTests(TestCase):
+    HEADER = 'projet;scenario;perimetre;profil;cas_de_test;priorite;criticite;etat;etapes;resultat_attendu\n'
+
+    def run_import(self, lines):
+        source = io.BytesIO((self.HEADER + ''.join(lines)).encode())
+        return import_casdetest(source, file_format='csv', method='bulk')
+
+    def test_upsert_updates_matching_rows(self):
+        self.run_import(['P;S1;API;Admin;c;high;Low;OK;s;e\n'])
+        report = self.run_import(['P;S1;API;Admin;c;high;Low;KO;s;e\n', 'P;S2;API;Admin;c;Low;Low;OK;s;e\n'])
+        self.assertEqual((report['created'], report['updated']), (1, 1))
+        case = CasDeTest.objects.get(marco_scenario='S1')
+        self.assertEqual(case.test_state, 'KO')
+        self.assertEqual(CasDeTest.objects.count(), 2)
+
+    def test_duplicates_are_counted(self):
+        report = self.run_import(['P;S1;API;Admin;c;high;Low;OK;s;e\n', 'P;S1;API;Admin;c;high;Low;KO;s;e\n'])
+        self.assertEqual((report['created'], report['duplicates']), (1, 1))
+        self.assertEqual(CasDeTest.objects.get().test_state, 'KO')
+
+    def test_reported_rejects_are_bounded(self):
+        total = MAX_REPORTED_REJECTS + 20
+        report = self.run_import([f'P;S{n};API;Admin;c;urgent;Low;OK;s;e\n' for n in range(total)])
+        self.assertEqual(report['rejected'], total)
+        self.assertEqual(len(report['rejects']), MAX_REPORTED_REJECTS)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportEndpointTests(TestCase):
+    CONTENT = ImportTests.HEADER + 'P;S1;API;Admin;c;high;Low;OK;s;e\n'
+
+    def setUp(self):
+        self.user = User.objects.create_user('importeur', password='x')
+        self.user.user_permissions.add(*Permission.objects.filter(
+            codename__in=('add_casdetest', 'change_casdetest'),
+        ))
+
+    def post(self):
+        upload = SimpleUploadedFile('cas.csv', self.CONTENT.encode(), content_type='text/csv')
+        return self.client.post(reverse('import_casdetest'), {'file': upload})
+
+    def test_requires_permission(self):
+        self.assertEqual(self.post().status_code, 403)
+        User.objects.create_user('lecteur', password='x')
+        self.client.login(username='lecteur', password='x')
+        self.assertEqual(self.post().status_code, 403)
+        self.assertFalse(CasDeTest.objects.exists())
+
+    def test_requires_csrf_token(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.login(username='importeur', password='x')
+        self.assertEqual(self.post().status_code, 403)
+
+    def test_small_file_is_imported_in_request(self):
+        self.client.login(username='importeur', password='x')
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+
+    @override_settings(CASDETEST_IMPORT={'SYNC_MAX_BYTES': 10})
+    def test_large_file_is_queued(self):
+        self.client.login(username='importeur', password='x')
+        response = self.post()
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(CasDeTest.objects.exists())
+
+        self.assertEqual(work_imports(once=True), 1)
+        status = self.client.get(reverse('import_status', args=[response.json()['import']['id']])).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['report']['created'], 1)
+        self.assertEqual(CasDeTest.objects.count(), 1)
+
+class ReportTaskTests(TestCase):
+
+    def test_reclaimed_task_is_counted_once(self):
+        job = ReportJob.objects.create(title='Rapport', tasks_total=2)
+        ReportTask.objects.bulk_create([ReportTask(job=job, position=0), ReportTask(job=job, position=1)])
+        stale = claim_task('worker-a')
+        # Worker A jugé arrêté : sa tâche est reprise par B
+        ReportTask.objects.filter(pk=stale.pk).update(status='pending')
+        reclaimed = claim_task('worker-b')
+        self.assertEqual(reclaimed.pk, stale.pk)
+
+        self.assertTrue(complete_task(reclaimed, ['b.png']))
+        self.assertFalse(complete_task(stale, ['a.png']))
+        job.refresh_from_db()
+        self.assertEqual(job.tasks_done, 1)
+        self.assertEqual(ReportTask.objects.get(pk=stale.pk).images, ['b.png'])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_abandoned_assembly_is_retried_then_failed(self):
+        started = timezone.now() - timedelta(hours=1)
+        job = ReportJob.objects.create(
+            title='Rapport', status='assembling', date_assemblage=started, assemblages=1,
+        )
+        ReportTask.objects.create(job=job, position=0, status='done')
+        # Assemblage récent : le worker qui l'a commencé est peut-être encore là
+        ReportJob.objects.filter(pk=job.pk).update(date_assemblage=timezone.now())
+        self.assertIsNone(claim_assembly())
+
+        ReportJob.objects.filter(pk=job.pk).update(date_assemblage=started)
+        work('worker-b', once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.assemblages), ('done', 2))
+        self.assertTrue(job.report.name.endswith('.pdf'))
+
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='assembling', date_assemblage=started, assemblages=MAX_ASSEMBLAGES,
+        )
+        self.assertIsNone(claim_assembly())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+
+class IntentClassifierTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.examples = load_examples()
+        cls.classifier = IntentClassifier.train(cls.examples)
+
+    def test_training_examples_classify_as_themselves(self):
+        for text, label in self.examples:
+            with self.subTest(text=text):
+                predicted, confidence = self.classifier.predict(text)
+                self.assertEqual(intent_key(predicted or '||'), intent_key(label))
+                self.assertGreaterEqual(confidence, 0.9)
+
+    @override_settings(INTENT_CLASSIFIER={'MODEL_PATH': None})
+    def test_classify_chart_request(self):
+        config, confidence = classify_chart_request("Évolution des KO sur 6 mois")
+        self.assertGreaterEqual(confidence, 0.9)
+        self.assertEqual(config['groupby'], 'historique')
+        self.assertEqual(config['dimension'], 'test_state')
+        self.assertEqual(config['time_period'], '6_mois')
+        self.assertEqual(config['chart_type'], 'line')
+        self.assertEqual(config['filters'], {'test_state': ['KO']})
+
+        # La période citée ne change pas l'intention
+        config, _ = classify_chart_request("répartition par projet sur un an")
+        self.assertEqual((config['groupby'], config['time_period'], config['filters']), ('projet', '1_an', {}))
+
+    @override_settings(INTENT_CLASSIFIER={'MODEL_PATH': None})
+    def test_unrelated_request_goes_to_llm(self):
+        self.assertIsNone(classify_chart_request("bonjour, quelle heure est-il ?"))
+
+    @override_settings(INTENT_CLASSIFIER={'ENABLED': False})
+    def test_disabled(self):
+        self.assertIsNone(classify_chart_request("répartition par projet"))
+
+
+class FilterTests(TestCase):
+
+    def test_aliases_and_labels_are_normalized(self):
+        self.assertEqual(
+            parse_filters({'Priorité': ['medium', 'high'], 'état': {'ne': 'ok'}, 'projet': ''}),
+            {'prio': ['High', 'Medium'], 'test_state': {'not_in': ['OK']}},
+        )
+
+    def test_normalized_form_is_stable(self):
+        self.assertEqual(
+            parse_filters('{"or": [{"prio": "High"}, {"criticality": "high"}]}'),
+            parse_filters({'or': [{'criticality': 'High'}, {'prio': ['high']}]}),
+        )
+        # Une branche vide rend le OU toujours vrai
+        self.assertEqual(parse_filters({'or': [{'prio': 'High'}, {}]}), {})
+
+    def test_invalid_filters(self):
+        for spec in ({'couleur': 'rouge'}, {'prio': 'urgent'}, {'prio': {'gt': 'High'}},
+                     {'prio': 'High', 'priorité': 'Low'}, {'or': []}, '[1]', 'pas du json'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(FilterError):
+                    parse_filters(spec)
+
+    def test_compiled_filters_match_both_tables(self):
+        CasDeTest.objects.bulk_create([
+            make_case(projet='A', prio='High', test_state='OK'),
+            make_case(projet='A', prio='Low', test_state='KO'),
+            make_case(projet='B', prio='High', test_state='KO'),
+            make_case(projet='B', prio='Medium', test_state='Blocked', criticality='High'),
+        ])
+        cases = [
+            ({'projet': 'A'}, 2),
+            ({'test_state': {'not_in': ['OK']}, 'prio': ['High', 'Low']}, 2),
+            ({'or': [{'prio': 'High'}, {'criticality': 'High'}]}, 3),
+            ({'not': {'projet': 'A'}, 'test_state': 'KO'}, 1),
+        ]
+        for spec, expected in cases:
+            with self.subTest(spec=spec):
+                filters = parse_filters(spec)
+                self.assertEqual(apply_filters(CasDeTest.objects.all(), filters).count(), expected)
+                stored = apply_filters(CasDeTestCount.objects.all(), filters).values_list('count', flat=True)
+                self.assertEqual(sum(stored), expected)
+
+
+class CountConsistencyTests(TestCase):
+
+    def assertCountsMatch(self):
+        stored = {
+            tuple(row[name] for name in DIMENSION_FIELDS): row['count']
+            for row in CasDeTestCount.objects.values(*DIMENSION_FIELDS, 'count')
+        }
+        self.assertEqual(stored, dict(CasDeTest.objects.dimension_counts()))
+        days = dict(CasDeTestDailyCount.objects.values_list('day', 'count'))
+        self.assertEqual(days, dict(CasDeTest.objects.day_counts()))
+
+    def setUp(self):
+        past = timezone.now() - timedelta(days=40)
+        CasDeTest.objects.bulk_create([
+            make_case(projet=f'P{n % 3}', test_state=('OK', 'KO', 'Blocked')[n % 3],
+                      date_creation=past if n % 2 else timezone.now())
+            for n in range(12)
+        ])
+
+    def test_bulk_create(self):
+        self.assertCountsMatch()
+
+    def test_update(self):
+        CasDeTest.objects.filter(projet='P0').update(test_state='KO')
+        self.assertCountsMatch()
+        CasDeTest.objects.filter(test_state='KO').update(step_test='Nouvelles étapes')
+        self.assertCountsMatch()
+        CasDeTest.objects.filter(projet='P1').update(date_creation=timezone.now() - timedelta(days=3))
+        self.assertCountsMatch()
+        # Le filtre porte sur la colonne modifiée
+        CasDeTest.objects.filter(test_state='KO').update(test_state='OK', prio='Low')
+        self.assertCountsMatch()
+        # Valeur calculée : compteurs reconstruits
+        CasDeTest.objects.filter(projet='P2').update(profile=F('projet'))
+        self.assertCountsMatch()
+
+    def test_save(self):
+        case = CasDeTest.objects.filter(projet='P2').first()
+        case.prio = 'Low'
+        case.save()
+        make_case(projet='P9').save()
+        self.assertCountsMatch()
+
+    def test_delete(self):
+        CasDeTest.objects.filter(test_state='OK').delete()
+        self.assertCountsMatch()
+        CasDeTest.objects.first().delete()
+        self.assertCountsMatch()
+        CasDeTest.objects.all().delete()
+        self.assertCountsMatch()
+        self.assertFalse(CasDeTestCount.objects.exists())
+
+    def test_stale_counter_does_not_block_writes(self):
+        # Compteur en retard sur la table (écriture hors signaux, par exemple)
+        CasDeTestCount.objects.filter(projet='P0').update(count=1)
+        CasDeTestDailyCount.objects.update(count=1)
+        CasDeTest.objects.filter(projet='P0').delete()
+        self.assertFalse(CasDeTestCount.objects.filter(projet='P0').exists())
+        self.assertFalse(CasDeTestDailyCount.objects.filter(count__lte=0).exists())
+
+
+@override_settings(MISTRAL_API_KEY='test')
+class MistralClientTests(SimpleTestCase):
+
+    def test_async_client_per_event_loop(self):
+        llm = build_mistral_llm()
+
+        async def clients():
+            # Même boucle : même client
+            first, second = llm.for_running_loop(), llm.for_running_loop()
+            self.assertIs(first, second)
+            await asyncio.sleep(0)
+            return first.async_client
+
+        # async_to_sync : une boucle par appel, donc un client par appel
+        first, second = async_to_sync(clients)(), async_to_sync(clients)()
+        self.assertIsNot(first, second)
+        self.assertIs(llm.llm.client, llm.client)
+        llm.close()
+        self.assertTrue(llm.llm.client.is_closed)
+
+    @override_settings(MISTRAL_API_KEY='')
+    def test_missing_api_key(self):
+        with self.assertRaises(ImproperlyConfigured):
+            build_mistral_llm()
+
+
+@override_settings(CHART_RENDER={'WORKERS': 1, 'TIMEOUT': 60})
+class RenderingTests(SimpleTestCase):
+    CHART = {'type': 'bar', 'data': {'labels': ['KO', 'OK'], 'datasets': [{'data': [3, 5]}]}}
+
+    def tearDown(self):
+        shutdown_executor()
+
+    def test_dead_worker_pool_is_replaced(self):
+        executor = get_executor()
+        for process in list(executor._processes.values()):
+            process.kill()
+        image = render_image(self.CHART, title='pool recréé')
+        self.assertTrue(image.startswith(b'\x89PNG'))
+        self.assertIsNot(get_executor(), executor)
+
+    def test_timeout(self):
+        with override_settings(CHART_RENDER={'WORKERS': 1, 'TIMEOUT': 0}):
+            with self.assertRaises(RenderError):
+                render_image(self.CHART, title='trop tard')
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CasDeTest.objects.bulk_create([
+            make_case(marco_scenario=f'S{n}', test_state='KO' if n % 2 else 'OK') for n in range(250)
+        ])
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get(reverse('export_casdetest'), {
+            'columns': 'id,marco_scenario,test_state', 'filters': '{"test_state": "KO"}', 'chunk_size': 100,
+        })
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,marco_scenario,test_state')
+        self.assertEqual(len(lines), 126)
+        self.assertTrue(all(line.endswith(',KO') for line in lines[1:]))
+
+    def test_invalid_parameters(self):
+        for params in ({'format': 'xml'}, {'columns': 'id,mot_de_passe'}, {'columns': 'id,id'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('export_casdetest'), params).status_code, 400)
+
+    def test_asgi_export_is_an_async_stream(self):
+        request = AsyncRequestFactory().get(reverse('export_casdetest'), {
+            'format': 'jsonl', 'columns': 'marco_scenario', 'chunk_size': 100,
+        })
+        response = export_casdetest(request)
+        # Un flux synchrone serait lu en entier par Django avant l'envoi
+        self.assertTrue(response.is_async)
+
+        async def consume():
+            return [chunk async for chunk in response.__aiter__()]
+
+        chunks = async_to_sync(consume)()
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+        self.assertEqual([row['marco_scenario'] for row in rows], [f'S{n}' for n in range(250)])
+
+
+class ValueIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = ValueIndex([
+            ('projet', 'Projet_1'), ('projet', 'Projet_10'), ('profile', 'Testeur'),
+            ('profile', 'Utilisateur'), ('profile', 'Développeur'), ('test_perimeter', 'API'),
+        ])
+
+    def test_exact_mentions(self):
+        self.assertEqual(self.index.resolve('tests du projet 1 en KO'),
+                         ({'projet': ['Projet_1']}, 'tests du   en KO'))
+        self.assertEqual(self.index.resolve('tests API du Projet_10')[0],
+                         {'test_perimeter': ['API'], 'projet': ['Projet_10']})
+
+    def test_fuzzy_mentions(self):
+        self.assertEqual(self.index.resolve('tests du profil developeur')[0],
+                         {'profile': ['Développeur']})
+        # Nombres différents : jamais de correspondance approchée
+        self.assertEqual(self.index.resolve('tests du projet 100')[0], {})
+
+    def test_grouping_axis_is_not_a_filter(self):
+        for text in ('nombre de tests par testeur', 'tests selon testeur', 'tests by testeur'):
+            self.assertEqual(self.index.resolve(text), ({}, text))
+
+    def test_generic_plurals(self):
+        text = 'répartition par profil des utilisateurs'
+        self.assertEqual(self.index.resolve(text), ({}, text))
+        self.assertEqual(self.index.resolve('tests des développeurs')[0], {})
+
+
+class SnapshotTests(TestCase):
+
+    def test_record_snapshot_counts_today(self):
+        CasDeTest.objects.bulk_create([make_case(test_state='KO'), make_case(), make_case()])
+        self.assertEqual(record_snapshot(), len(DIMENSION_FIELDS) + 1)
+        today = CasDeTestSnapshot.objects.filter(day=timezone.localdate(), dimension='test_state')
+        self.assertEqual(dict(today.values_list('value', 'count')), {'KO': 1, 'OK': 2})
+
+        # Un jour enregistré n'est réécrit qu'avec replace
+        CasDeTest.objects.filter(test_state='KO').update(test_state='OK')
+        self.assertIsNone(record_snapshot())
+        record_snapshot(replace=True)
+        self.assertEqual(dict(today.values_list('value', 'count')), {'OK': 3})
+
+    def test_series(self):
+        CasDeTestSnapshot.objects.bulk_create([
+            CasDeTestSnapshot(day=date(2026, 1, 30), dimension='test_state', value='KO', count=4),
+            CasDeTestSnapshot(day=date(2026, 1, 30), dimension='test_state', value='OK', count=1),
+            CasDeTestSnapshot(day=date(2026, 1, 31), dimension='test_state', value='OK', count=5),
+            CasDeTestSnapshot(day=date(2026, 2, 2), dimension='test_state', value='KO', count=2),
+            CasDeTestSnapshot(day=date(2026, 2, 2), dimension='projet', value='Projet_1', count=9),
+        ])
+        days, series = snapshot_series('test_state')
+        self.assertEqual(days, [date(2026, 1, 30), date(2026, 1, 31), date(2026, 2, 2)])
+        # Valeur absente d'une photographie : 0
+        self.assertEqual(series, {'KO': [4, 0, 2], 'OK': [1, 5, 0]})
+
+        # Dernière photographie de chaque mois
+        days, series = snapshot_series('test_state', values=['KO'], granularity='month')
+        self.assertEqual(days, [date(2026, 1, 31), date(2026, 2, 2)])
+        self.assertEqual(series, {'KO': [0, 2]})
+
+        days, series = snapshot_series('test_state', start=date(2026, 1, 31), end=date(2026, 1, 31))
+        self.assertEqual((days, series), ([date(2026, 1, 31)], {'OK': [5]}))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            snapshot_series('step_test')
+        with self.assertRaises(ValueError):
+            snapshot_series('test_state', granularity='year')
+
+
+class PartitionHelperTests(SimpleTestCase):
+
+    def test_add_months(self):
+        self.assertEqual(add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(add_months(date(2026, 3, 1), -27), date(2023, 12, 1))
+        self.assertEqual(add_months(date(2026, 3, 1), 0), date(2026, 3, 1))
+        self.assertEqual(month_start(date(2026, 2, 28)), date(2026, 2, 1))
+
+    def test_names(self):
+        self.assertEqual(partition_name(date(2025, 1, 1)), 'Chatbot_casdetest_p2025_01')
+        self.assertEqual(archive_name(date(2025, 12, 1)), 'Chatbot_casdetest_archive_2025_12')
+
+
+class PartitioningBackendTests(TestCase):
+
+    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL sait partitionner')
+    def test_requires_postgresql(self):
+        with self.assertRaises(PartitioningError):
+            is_partitioned()
+
+
+class SummaryTests(TestCase):
+
+    def setUp(self):
+        CasDeTest.objects.bulk_create([
+            make_case(projet='A', prio='High', criticality='High', test_state='KO'),
+            make_case(projet='A', prio='High', criticality='Low', test_state='OK'),
+            make_case(projet='A', prio='Low', criticality='Low', test_state='OK', profile='Testeur'),
+            make_case(projet='B', prio='Medium', criticality='High', test_state='Blocked'),
+            make_case(projet='B', prio='High', criticality='High', test_state='KO', test_perimeter='UI'),
+        ])
+
+    def assertSameRows(self, first, second):
+        def key(row):
+            return sorted(row.items())
+        self.assertEqual(sorted(first, key=key), sorted(second, key=key))
+
+    def test_summary_matches_pandas_fallback(self):
+        summary = summarize()
+        finest = pd.DataFrame.from_records(count_by(DIMENSION_FIELDS), columns=[*DIMENSION_FIELDS, 'count'])
+        fallback = CountSummary.from_frame(finest, summary.grouping_sets)
+        self.assertEqual(summary.total, fallback.total)
+        self.assertEqual(summary.total, 5)
+        for fields in summary.grouping_sets:
+            with self.subTest(fields=fields):
+                self.assertSameRows(summary.rows(fields), fallback.rows(fields))
+                if fields:
+                    self.assertSameRows(summary.rows(fields), count_by(fields))
+
+    def test_filtered_summary(self):
+        filters = parse_filters({'test_state': ['KO', 'Blocked']})
+        summary = summarize([('prio',), ('projet', 'criticality')], filters=filters)
+        self.assertSameRows(summary.rows(('prio',), filters), count_by(('prio',), filters=filters))
+        # Un regroupement plus fin sert une dimension seule et une appartenance en plus
+        sliced = parse_filters({'test_state': ['KO', 'Blocked'], 'projet': 'B'})
+        self.assertEqual(summary.counts('criticality', sliced), {'High': 2})
+        self.assertFalse(summary.covers(('prio',), parse_filters({'test_state': {'not_in': ['OK']}})))
+
+    def test_queryset_source(self):
+        queryset = CasDeTest.objects.filter(projet='A')
+        summary = summarize([('prio', 'test_state')], queryset=queryset)
+        self.assertSameRows(summary.rows(('prio', 'test_state')), count_by(('prio', 'test_state'), queryset))
+        with self.assertRaises(ValueError):
+            summarize([('step_test',)])
+
+
+class BatchPlanningTests(TestCase):
+
+    def test_resolve_widget(self):
+        self.assertEqual(
+            resolve_widget({'dimension': 'priorité', 'chart_type': 'pie', 'filters': {'projet': 'A'}}),
+            {'key': 'priorite', 'fields': ('prio',), 'chart_type': 'pie', 'filters': {'projet': ['A']}},
+        )
+        self.assertEqual(resolve_widget({'dimension': 'état'})['fields'], ('test_state',))
+        self.assertEqual(
+            resolve_widget({'dimension': 'matrice', 'rows': 'profil', 'cols': 'état'})['fields'],
+            ('profile', 'test_state'),
+        )
+        for item in ({'dimension': 'couleur'}, {'dimension': 'projet', 'chart_type': 'scatter'},
+                     {'dimension': 'projet', 'filters': {'prio': 'urgent'}},
+                     {'dimension': 'matrice', 'rows': 'step_test'}, ['projet']):
+            with self.subTest(item=item):
+                with self.assertRaises(WidgetError):
+                    resolve_widget(item)
+
+    def test_uncovered_widgets_share_one_query_per_filter(self):
+        CasDeTest.objects.bulk_create([
+            make_case(projet='A', prio='High', test_state='KO'),
+            make_case(projet='A', prio='Low', test_state='OK'),
+            make_case(projet='B', prio='High', test_state='Blocked', criticality='High'),
+        ])
+        not_ok = {'test_state': {'not_in': ['OK']}}
+        widgets = [resolve_widget(item) for item in (
+            {'dimension': 'projet'},
+            {'dimension': 'etat', 'filters': {'projet': 'A'}},
+            {'dimension': 'priorité', 'filters': not_ok},
+            {'dimension': 'criticité', 'filters': not_ok},
+            {'dimension': 'matrice', 'filters': not_ok},
+        )]
+        summaries = widget_summaries(widgets)
+        # Résumé du tableau de bord pour les widgets couverts, un seul résumé pour le filtre NOT IN
+        self.assertIs(summaries[0], summaries[1])
+        self.assertIsNot(summaries[2], summaries[0])
+        self.assertTrue(summaries[2] is summaries[3] is summaries[4])
+        self.assertEqual(summaries[1].counts('test_state', widgets[1]['filters']), {'KO': 1, 'OK': 1})
+        self.assertEqual(summaries[2].counts('prio', widgets[2]['filters']), {'High': 2})
+        self.assertEqual(summaries[3].counts('criticality', widgets[3]['filters']), {'Low': 1, 'High': 1})
+
+
+class CrosstabTests(TestCase):
+
+    def setUp(self):
+        CasDeTest.objects.bulk_create([
+            make_case(projet='B', prio='High', criticality='Low'),
+            make_case(projet='B', prio='High', criticality='Low'),
+            make_case(projet='A', prio='Low', criticality='High'),
+            make_case(projet='A', prio='High', criticality='Medium'),
+        ])
+
+    def test_matrix_follows_choice_order(self):
+        rows, cols, matrix = crosstab('prio', 'criticality')
+        self.assertEqual((rows, cols), (['High', 'Medium', 'Low'], ['High', 'Medium', 'Low']))
+        self.assertEqual(matrix.tolist(), [[0, 1, 2], [0, 0, 0], [1, 0, 0]])
+        # Colonne libre : valeurs observées triées
+        rows, cols, matrix = crosstab('projet', 'prio')
+        self.assertEqual(rows, ['A', 'B'])
+        self.assertEqual(matrix.tolist(), [[1, 0, 1], [2, 0, 0]])
+
+    def test_sources_agree(self):
+        expected = crosstab('prio', 'criticality')[2].tolist()
+        queryset = CasDeTest.objects.all()
+        self.assertEqual(crosstab('prio', 'criticality', queryset)[2].tolist(), expected)
+        self.assertEqual(async_to_sync(acrosstab)('prio', 'criticality')[2].tolist(), expected)
+        self.assertEqual(summarize().crosstab('prio', 'criticality')[2].tolist(), expected)
+        filtered = crosstab('prio', 'criticality', filters=parse_filters({'projet': 'A'}))[2]
+        self.assertEqual(filtered.tolist(), [[0, 1, 0], [0, 0, 0], [1, 0, 0]])
+
+    def test_requested_labels(self):
+        rows = [{'prio': 'High', 'criticality': 'Low', 'count': 2}, {'prio': 'Low', 'criticality': 'Low', 'count': 1}]
+        # Couples hors des modalités demandées ignorés
+        labels_rows, labels_cols, matrix = crosstab_matrix('prio', 'criticality', rows, ['High'], ['Low', 'High'])
+        self.assertEqual((labels_rows, labels_cols, matrix.tolist()), (['High'], ['Low', 'High'], [[2, 0]]))
+        with self.assertRaises(ValueError):
+            crosstab('prio', 'step_test')
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        CasDeTest.objects.bulk_create([
+            make_case(marco_scenario='Connexion', test_cases='Connexion avec un mot de passe expiré'),
+            make_case(marco_scenario='Paiement', test_cases='Paiement refusé après la connexion', projet='B'),
+            make_case(marco_scenario='Export', test_cases='Export CSV du tableau'),
+        ])
+
+    def test_match_search(self):
+        self.assertEqual(match_search('Montre les tests qui parlent de connexion ?'), 'connexion')
+        self.assertEqual(match_search('cherche les cas sur le paiement'), 'paiement')
+        self.assertEqual(match_search('cas contenant "mot de passe"'), 'mot de passe')
+        self.assertIsNone(match_search('cherche la répartition par état'))
+        self.assertIsNone(match_search('nombre de tests KO'))
+
+    @skipIf(connection.vendor == 'postgresql', 'repli hors PostgreSQL')
+    def test_substring_fallback(self):
+        page = search_casdetest('CONNEXION')
+        self.assertEqual(page['total'], 2)
+        # Sans score : les plus récents d'abord, extrait du cas de test
+        self.assertEqual([row['marco_scenario'] for row in page['results']], ['Paiement', 'Connexion'])
+        self.assertIsNone(page['results'][0]['rank'])
+        self.assertEqual(page['results'][0]['excerpt'], 'Paiement refusé après la connexion')
+        # Chaque mot doit apparaître, dans l'un des champs texte
+        self.assertEqual(search_casdetest('connexion expiré')['total'], 1)
+        self.assertEqual(search_casdetest('connexion', filters=parse_filters({'projet': 'B'}))['total'], 1)
+
+    @skipIf(connection.vendor != 'postgresql', 'recherche plein texte PostgreSQL')
+    def test_full_text(self):
+        page = search_casdetest('connexion -paiement')
+        self.assertEqual(page['total'], 1)
+        self.assertGreater(page['results'][0]['rank'], 0)
+        self.assertIn('«Connexion»', page['results'][0]['excerpt'])
+
+    def test_pagination(self):
+        page = search_casdetest('connexion', page=2, page_size=1)
+        self.assertEqual((page['total'], page['pages'], len(page['results'])), (2, 2, 1))
+        self.assertEqual(search_casdetest('connexion', page=5)['results'], [])
+        self.assertEqual(search_casdetest('introuvable')['pages'], 0)
+        for text, page, page_size in (('', 1, 20), ('connexion', -1, 20), ('connexion', 1, 500), ('connexion', 'x', 20)):
+            with self.subTest(text=text, page=page, page_size=page_size):
+                with self.assertRaises(SearchError):
+                    search_casdetest(text, page=page, page_size=page_size)
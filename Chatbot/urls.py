@@ -4,6 +4,19 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('analyze/', views.analyze_command, name='analyze_command'),
+    path('analyze/async/', views.analyze_command_async, name='analyze_command_async'),
      path('generate-chart/', views.generate_chart, name='generate_chart'),
+    path('generate-charts/', views.generate_charts_batch, name='generate_charts_batch'),
+    path('render-chart/', views.render_chart, name='render_chart'),
+    path('generate-chart/stream/', views.generate_chart_stream, name='generate_chart_stream'),
+    path('generate-chart/async/', views.generate_chart_async, name='generate_chart_async'),
+    path('reports/', views.reports, name='reports'),
+    path('reports/<int:job_id>/', views.report_status, name='report_status'),
+    path('reports/<int:job_id>/download/', views.report_download, name='report_download'),
+    path('search/', views.search_casdetest_content, name='search_casdetest'),
+    path('export/', views.export_casdetest, name='export_casdetest'),
+    path('import/', views.import_casdetest_file, name='import_casdetest'),
+    path('import/<int:job_id>/', views.import_status, name='import_status'),
+    path('cache-stats/', views.chart_cache_stats, name='chart_cache_stats'),
     # ...autres vues...
 ]
\ No newline at end of file
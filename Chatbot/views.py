@@ -1,10 +1,14 @@
 # Standard Python
-import logging, re, uuid, json, io, base64
+import logging, os, re, uuid, json, io, base64, time
 from datetime import datetime, date, timedelta
 
 # Django
-from django.http import HttpResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import permission_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import models
 from django.db.models import (
@@ -13,6 +17,7 @@ from django.db.models import (
 )
 from django.db.models.functions import TruncMonth, TruncYear, TruncWeek
 from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
 
 # Externes
 import pandas as pd
@@ -23,14 +28,40 @@ from django.db.models.functions import Concat
 
 # Langchain / IA
 from langchain.prompts import PromptTemplate
-from langchain_mistralai import ChatMistralAI
 from langchain_openai import OpenAI  # optionnel si besoin d'OpenAI
 
 # Modèles Django personnalisés
-from .models import CasDeTest
+from .models import CasDeTest, ImportJob, ReportJob
+from .aggregations import (
+    CROSSTAB_FIELDS, acount_by, acount_by_period, acrosstab, count_by, count_by_period, crosstab,
+)
+from .batch import MAX_BATCH_SIZE, WidgetError, resolve_widget, widget_summaries
+from .chart_cache import acached_chart, cached_chart, cached_charts
+from .charts import (
+    CATEGORY_PALETTE, CHART_REGISTRY, GROUPBY_COLUMNS, GROUPBY_HISTORY, GROUPBY_PERIODS, HISTORY_GRANULARITIES,
+    LEVEL_COLORS, STATE_COLORS, adashboard_summary, agenerate_dimension_chart, chart_from_rows, dashboard_summary,
+    generate_dimension_chart, match_chart,
+)
+from .entities import aentity_filters, entity_filters
+from .exports import (
+    EXPORT_FORMATS, ExportError, astream_export, check_format, parse_chunk_size, parse_columns, stream_export,
+)
+from .filters import FilterError, apply_filters, describe_filters, parse_filters
+from .importer import ImportFormatError, import_casdetest, import_job_status, import_settings, queue_import
+from .intents import aclassify_chart_request, alog_chart_query, classify_chart_request, log_chart_query
+from .llm import get_llm
+from .query_cache import get_chart_config_cache
+from .rendering import RENDER_FORMATS, RenderError, render_image
+from .reports import REPORT_FORMATS, ReportError, create_report_job, job_progress
+from .search import SearchError, asearch_casdetest, match_search, search_casdetest
+from .snapshots import asnapshot_series, snapshot_series
 
 logger = logging.getLogger(__name__)
 
+# Résultats de recherche affichés dans le chatbot (la suite via l'API search/)
+CHAT_SEARCH_RESULTS = 10
+
+
 def index(request):
     return render(request, 'chatbot.html')
 
@@ -48,117 +79,651 @@ def generate_chart(request):
         if not user_query:
             return JsonResponse({'error': 'Requête vide'})
         
+        filters, error = _request_filters(request.POST)
+        if error:
+            return JsonResponse({'error': error})
+
         try:
-            # Vérifier si la requête concerne la matrice de priorité/criticité
-            if any(term in user_query.lower() for term in ['matrice', 'priorité/criticité', 'priorite/criticite', 'matrice priorité', 'matrice criticité']):
-                chart_data = generate_priority_criticality_matrix()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Matrice Priorité/Criticité',
-                    'description': 'Répartition des cas de test par niveau de priorité et de criticité',
-                    'is_heatmap': True  # Indique au frontend qu'il s'agit d'une heatmap
-                })
+            # Recherche dans le contenu des cas de test ("tests qui parlent de connexion")
+            search_terms = match_search(user_query)
+            if search_terms:
+                return JsonResponse(_search_payload(search_terms, filters))
+            filters, routed_query = _with_entity_filters(user_query, filters)
+
+            # Routage par mots-clés (un seul passage sur la requête)
+            chart_key = match_chart(routed_query)
+
+            # Vérifier si la requête concerne une matrice (priorité/criticité par défaut)
+            if chart_key == 'matrice':
+                # Dimensions de la matrice choisies à l'exécution
+                row_field, col_field, error = _matrix_dimensions(request.POST)
+                if error:
+                    return JsonResponse({'error': error})
+                chart_data = cached_chart(
+                    f'{row_field}×{col_field}', filters, 'heatmap',
+                    lambda: generate_crosstab_heatmap(row_field, col_field, filters)
+                )
+                return JsonResponse(_matrix_payload(chart_data, row_field, col_field, filters))
             
-            # Détection directe des requêtes courantes (fonctions simplifiées)
-            elif any(term in user_query.lower() for term in ['priorité', 'priority', 'prio']):
-                chart_data = generate_priority_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par Priorité',
-                    'description': 'Nombre de cas de test par niveau de priorité',
-                    'is_heatmap': False
-                })
-            elif any(term in user_query.lower() for term in ['projet', 'project']):
-                chart_data = generate_project_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par Projet',
-                    'description': 'Nombre de cas de test par projet',
-                    'is_heatmap': False
-                })
-            elif any(term in user_query.lower() for term in ['statut', 'status', 'état']):
-                chart_data = generate_status_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par Statut',
-                    'description': 'Nombre de cas de test par statut',
-                    'is_heatmap': False
-                })
-            elif any(term in user_query.lower() for term in ['périmètre', 'perimeter']):
-                chart_data = generate_test_perimeter_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par Périmètre de Test',
-                    'description': 'Nombre de cas de test par périmètre de test',
-                    'is_heatmap': False
-                })
-            elif any(term in user_query.lower() for term in ['état', 'state']):
-                chart_data = generate_test_states_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par État des Tests',
-                    'description': 'Nombre de cas de test par état des tests',
-                    'is_heatmap': False
-                })
-            elif any(term in user_query.lower() for term in ['profil', 'profile']):
-                chart_data = generate_profile_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par Profil',
-                    'description': 'Nombre de cas de test par profil',
-                    'is_heatmap': False
-                })
-            elif any(term in user_query.lower() for term in ['criticité', 'criticality']):
-                chart_data = generate_criticality_chart()
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': 'Répartition par Criticité',
-                    'description': 'Nombre de cas de test par niveau de criticité',
-                    'is_heatmap': False
-                })
+            # Détection directe des requêtes courantes (registre des dimensions)
+            elif chart_key:
+                chart_data = generate_dimension_chart(chart_key, filters=filters)
+                return JsonResponse(_dimension_payload(chart_key, chart_data, filters))
             else:
-                # Utiliser l'IA Mistral comme fallback
-                llm = ChatMistralAI(
-                    model="mistral-large-latest",
-                    mistral_api_key="3Q57TEIWwcxOE8fSK4CuYvRPJnOKfP9w"
-                )
-                
-                chart_config = analyze_chart_request(llm, user_query)
-                
-                if chart_config.get('error'):
-                    return JsonResponse({'error': chart_config['error']})
+                # Demandes courantes : classifieur local, sans appel au LLM
+                chart_config = _classified_config(user_query, routed_query)
+                if chart_config is None:
+                    # Utiliser l'IA Mistral comme fallback (client partagé du processus)
+                    # Les intentions déjà analysées sont servies par le cache sémantique
+                    config_cache = get_chart_config_cache()
+                    chart_config = config_cache.get(user_query)
+                if chart_config is None:
+                    llm = get_llm()
+                    started = time.perf_counter()
+                    chart_config = analyze_chart_request(llm, user_query)
+                    
+                    if chart_config.get('error'):
+                        return JsonResponse({'error': chart_config['error']})
+                    config_cache.set(user_query, chart_config, llm_seconds=time.perf_counter() - started)
+                    log_chart_query(user_query, chart_config, 'llm')
                 
+                chart_config = _with_request_filters(chart_config, filters)
                 chart_data = generate_chart_data(chart_config)
-                
-                return JsonResponse({
-                    'success': True,
-                    'chart_data': chart_data,
-                    'title': chart_config.get('title', 'Graphique ALTEN'),
-                    'description': chart_config.get('description', ''),
-                    'query_analysis': chart_config,
-                    'is_heatmap': False
-                })
+                return JsonResponse(_analysis_payload(chart_config, chart_data))
             
         except Exception as e:
             return JsonResponse({'error': f'Erreur lors de la génération: {str(e)}'})
     
     return JsonResponse({'error': 'Méthode non autorisée'})
 
+
+async def generate_chart_async(request):
+    """
+    Version asynchrone de generate_chart (déploiement ASGI, ex. uvicorn) :
+    l'appel au LLM (ainvoke) et les agrégats (ORM asynchrone) ne bloquent
+    pas le worker, qui continue de servir les autres requêtes pendant
+    l'attente de Mistral.
+    """
+    if request.method == 'POST':
+        user_query = request.POST.get('text', '').strip()
+
+        if not user_query:
+            return JsonResponse({'error': 'Requête vide'})
+
+        filters, error = _request_filters(request.POST)
+        if error:
+            return JsonResponse({'error': error})
+
+        try:
+            search_terms = match_search(user_query)
+            if search_terms:
+                return JsonResponse(await _asearch_payload(search_terms, filters))
+            filters, routed_query = await _awith_entity_filters(user_query, filters)
+
+            chart_key = match_chart(routed_query)
+
+            if chart_key == 'matrice':
+                row_field, col_field, error = _matrix_dimensions(request.POST)
+                if error:
+                    return JsonResponse({'error': error})
+                chart_data = await acached_chart(
+                    f'{row_field}×{col_field}', filters, 'heatmap',
+                    lambda: agenerate_crosstab_heatmap(row_field, col_field, filters)
+                )
+                return JsonResponse(_matrix_payload(chart_data, row_field, col_field, filters))
+
+            elif chart_key:
+                chart_data = await agenerate_dimension_chart(chart_key, filters=filters)
+                return JsonResponse(_dimension_payload(chart_key, chart_data, filters))
+            else:
+                chart_config = await _aclassified_config(user_query, routed_query)
+                if chart_config is None:
+                    # Le cache des analyses peut reposer sur un backend synchrone (base, fichier)
+                    config_cache = get_chart_config_cache()
+                    chart_config = await sync_to_async(config_cache.get)(user_query)
+                if chart_config is None:
+                    llm = get_llm()
+                    started = time.perf_counter()
+                    chart_config = await aanalyze_chart_request(llm, user_query)
+
+                    if chart_config.get('error'):
+                        return JsonResponse({'error': chart_config['error']})
+                    await sync_to_async(config_cache.set)(
+                        user_query, chart_config, llm_seconds=time.perf_counter() - started
+                    )
+                    await alog_chart_query(user_query, chart_config, 'llm')
+
+                chart_config = _with_request_filters(chart_config, filters)
+                chart_data = await agenerate_chart_data(chart_config)
+                return JsonResponse(_analysis_payload(chart_config, chart_data))
+
+        except Exception as e:
+            return JsonResponse({'error': f'Erreur lors de la génération: {str(e)}'})
+
+    return JsonResponse({'error': 'Méthode non autorisée'})
+
+# csrf_exempt ne gère pas les vues asynchrones avant Django 5.0
+generate_chart_async.csrf_exempt = True
+
+
+@csrf_exempt
+def generate_charts_batch(request):
+    """
+    Génère tous les graphiques d'un tableau de bord en une requête HTTP.
+
+    Corps JSON : {"charts": [{"dimension": "priorite", "chart_type": "bar",
+    "filters": {"projet": ["Projet_1"]}}, {"dimension": "matrice",
+    "rows": "prio", "cols": "criticality"}, ...]}. Les graphiques absents
+    du cache sont découpés dans le résumé du tableau de bord, ou calculés
+    ensemble : une requête GROUPING SETS par jeu de filtres. La réponse
+    contient un résultat par widget, dans l'ordre.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Méthode non autorisée'}, status=405)
+    try:
+        items = json.loads(request.body).get('charts')
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'Liste "charts" attendue'}, status=400)
+    if len(items) > MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'{MAX_BATCH_SIZE} graphiques au maximum par lot'}, status=400)
+
+    results = [None] * len(items)
+    widgets = []
+    for position, item in enumerate(items):
+        try:
+            widgets.append((position, resolve_widget(item)))
+        except WidgetError as e:
+            results[position] = {'error': str(e)}
+
+    try:
+        charts = build_widget_charts([widget for _, widget in widgets])
+    except Exception as e:
+        logger.error(f"Erreur génération des graphiques en lot: {str(e)}", exc_info=True)
+        return JsonResponse({'error': f'Erreur lors de la génération: {str(e)}'}, status=500)
+
+    for (position, widget), chart_data in zip(widgets, charts):
+        results[position] = _widget_payload(widget, chart_data)
+    for item, result in zip(items, results):
+        if isinstance(item, dict) and 'id' in item:
+            result['id'] = item['id']
+    return JsonResponse({'success': True, 'charts': results})
+
+
+def build_widget_charts(widgets):
+    """
+    Graphiques d'une liste de widgets résolus (batch.resolve_widget), dans
+    l'ordre : lecture groupée du cache, puis les absents découpés dans le
+    résumé du tableau de bord ou calculés ensemble (voir widget_summaries)
+    """
+    # Mêmes clés de cache que generate_chart (dimension, filtres, type)
+    entries = [(_widget_cache_dimension(widget), widget['filters'], widget['chart_type']) for widget in widgets]
+
+    def build(missing):
+        summaries = widget_summaries([widgets[position] for position in missing])
+        return {position: _widget_chart(widgets[position], summary)
+                for position, summary in zip(missing, summaries)}
+
+    return cached_charts(entries, build)
+
+
+def build_widget_payloads(widgets):
+    """Réponses complètes (graphique, titre, description) d'une liste de widgets résolus"""
+    return [_widget_payload(widget, chart_data) for widget, chart_data in zip(widgets, build_widget_charts(widgets))]
+
+
+@csrf_exempt
+def render_chart(request):
+    """
+    Image PNG ou SVG d'un graphique, dessinée côté serveur (pool matplotlib,
+    voir rendering.py) pour les rapports et exports.
+
+    Paramètres (GET, ou corps JSON en POST) : ceux d'un widget de
+    generate_charts_batch ("dimension", "chart_type", "filters", "rows",
+    "cols") plus "format" (png, svg), "width" et "height" en pixels.
+    """
+    if request.method == 'POST':
+        try:
+            item = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    else:
+        item = request.GET.dict()
+    if not isinstance(item, dict):
+        return JsonResponse({'error': 'Objet JSON attendu'}, status=400)
+    fmt = str(item.get('format', 'png')).lower()
+
+    try:
+        widget = resolve_widget(item)
+        payload, = build_widget_payloads([widget])
+        image = render_image(payload['chart_data'], fmt, item.get('width'), item.get('height'), title=payload['title'])
+    except (WidgetError, RenderError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Erreur rendu du graphique: {str(e)}", exc_info=True)
+        return JsonResponse({'error': f'Erreur lors du rendu: {str(e)}'}, status=500)
+
+    response = HttpResponse(image, content_type=RENDER_FORMATS[fmt])
+    response['Content-Disposition'] = f'inline; filename="{_widget_cache_dimension(widget)}.{fmt}"'
+    return response
+
+
+def _widget_cache_dimension(widget):
+    if widget['key'] == 'matrice':
+        return '×'.join(widget['fields'])
+    return widget['key']
+
+
+def _widget_chart(widget, summary):
+    filters = widget['filters']
+    if widget['key'] == 'matrice':
+        row_field, col_field = widget['fields']
+        return crosstab_heatmap(row_field, col_field, *summary.crosstab(row_field, col_field, filters))
+    spec = dict(CHART_REGISTRY[widget['key']], chart_type=widget['chart_type'])
+    return chart_from_rows(spec, summary.rows(widget['fields'], filters, order_by=spec['order_by']))
+
+
+def _widget_payload(widget, chart_data):
+    if widget['key'] == 'matrice':
+        return _matrix_payload(chart_data, *widget['fields'], filters=widget['filters'])
+    return _dimension_payload(widget['key'], chart_data, filters=widget['filters'])
+
+
+def generate_chart_stream(request):
+    """
+    Variante server-sent events de generate_chart (GET ?text=...).
+    Étapes émises au fil de l'eau : intent (route détectée, de quoi afficher
+    un squelette), progress (réception de la réponse du LLM), config,
+    data (libellés et total), chart (même contenu que generate_chart),
+    puis done. Les erreurs arrivent dans un événement error.
+    """
+    user_query = request.GET.get('text', '').strip()
+    if isinstance(request, ASGIRequest):
+        events = _achart_events(user_query, request.GET)
+    else:
+        events = _chart_events(user_query, request.GET)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par nginx
+    return response
+
+
+def sse_event(event, data):
+    """Message server-sent events (une ligne data JSON)"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f'event: {event}\ndata: {payload}\n\n'
+
+
+# Intervalle minimal entre deux événements progress pendant la réponse du LLM
+SSE_PROGRESS_INTERVAL = 0.25
+
+
+def _chart_events(user_query, params):
+    if not user_query:
+        yield sse_event('error', {'error': 'Requête vide'})
+        return
+    filters, error = _request_filters(params)
+    if error:
+        yield sse_event('error', {'error': error})
+        return
+    try:
+        search_terms = match_search(user_query)
+        if search_terms:
+            yield sse_event('search', _search_payload(search_terms, filters))
+            yield sse_event('done', {})
+            return
+        filters, routed_query = _with_entity_filters(user_query, filters)
+        chart_key = match_chart(routed_query)
+        if chart_key == 'matrice':
+            row_field, col_field, error = _matrix_dimensions(params)
+            if error:
+                yield sse_event('error', {'error': error})
+                return
+            yield sse_event('intent', _matrix_intent(row_field, col_field))
+            yield sse_event('config', {'rows': row_field, 'cols': col_field, 'filters': filters})
+            chart_data = cached_chart(
+                f'{row_field}×{col_field}', filters, 'heatmap',
+                lambda: generate_crosstab_heatmap(row_field, col_field, filters)
+            )
+            payload = _matrix_payload(chart_data, row_field, col_field, filters)
+        elif chart_key:
+            yield sse_event('intent', _dimension_intent(chart_key))
+            yield sse_event('config', _dimension_config(chart_key, filters))
+            payload = _dimension_payload(chart_key, generate_dimension_chart(chart_key, filters=filters), filters)
+        else:
+            yield sse_event('intent', _analysis_intent())
+            chart_config = _classified_config(user_query, routed_query)
+            if chart_config is None:
+                config_cache = get_chart_config_cache()
+                chart_config = config_cache.get(user_query)
+            if chart_config is None:
+                started = time.perf_counter()
+                chart_config = yield from _stream_chart_analysis(get_llm(), user_query)
+                if chart_config.get('error'):
+                    yield sse_event('error', {'error': chart_config['error']})
+                    return
+                config_cache.set(user_query, chart_config, llm_seconds=time.perf_counter() - started)
+                log_chart_query(user_query, chart_config, 'llm')
+            chart_config = _with_request_filters(chart_config, filters)
+            yield sse_event('config', chart_config)
+            payload = _analysis_payload(chart_config, generate_chart_data(chart_config))
+
+        yield sse_event('data', _data_summary(payload['chart_data']))
+        yield sse_event('chart', payload)
+    except Exception as e:
+        yield sse_event('error', {'error': f'Erreur lors de la génération: {str(e)}'})
+    yield sse_event('done', {})
+
+
+async def _achart_events(user_query, params):
+    """Variante asynchrone de _chart_events (serveur ASGI)"""
+    if not user_query:
+        yield sse_event('error', {'error': 'Requête vide'})
+        return
+    filters, error = _request_filters(params)
+    if error:
+        yield sse_event('error', {'error': error})
+        return
+    try:
+        search_terms = match_search(user_query)
+        if search_terms:
+            yield sse_event('search', await _asearch_payload(search_terms, filters))
+            yield sse_event('done', {})
+            return
+        filters, routed_query = await _awith_entity_filters(user_query, filters)
+        chart_key = match_chart(routed_query)
+        if chart_key == 'matrice':
+            row_field, col_field, error = _matrix_dimensions(params)
+            if error:
+                yield sse_event('error', {'error': error})
+                return
+            yield sse_event('intent', _matrix_intent(row_field, col_field))
+            yield sse_event('config', {'rows': row_field, 'cols': col_field, 'filters': filters})
+            chart_data = await acached_chart(
+                f'{row_field}×{col_field}', filters, 'heatmap',
+                lambda: agenerate_crosstab_heatmap(row_field, col_field, filters)
+            )
+            payload = _matrix_payload(chart_data, row_field, col_field, filters)
+        elif chart_key:
+            yield sse_event('intent', _dimension_intent(chart_key))
+            yield sse_event('config', _dimension_config(chart_key, filters))
+            chart_data = await agenerate_dimension_chart(chart_key, filters=filters)
+            payload = _dimension_payload(chart_key, chart_data, filters)
+        else:
+            yield sse_event('intent', _analysis_intent())
+            chart_config = await _aclassified_config(user_query, routed_query)
+            if chart_config is None:
+                config_cache = get_chart_config_cache()
+                chart_config = await sync_to_async(config_cache.get)(user_query)
+            if chart_config is None:
+                started = time.perf_counter()
+                async for event, value in _astream_chart_analysis(get_llm(), user_query):
+                    if event == 'config':
+                        chart_config = value
+                    else:
+                        yield sse_event(event, value)
+                if chart_config.get('error'):
+                    yield sse_event('error', {'error': chart_config['error']})
+                    return
+                await sync_to_async(config_cache.set)(
+                    user_query, chart_config, llm_seconds=time.perf_counter() - started
+                )
+                await alog_chart_query(user_query, chart_config, 'llm')
+            chart_config = _with_request_filters(chart_config, filters)
+            yield sse_event('config', chart_config)
+            payload = _analysis_payload(chart_config, await agenerate_chart_data(chart_config))
+
+        yield sse_event('data', _data_summary(payload['chart_data']))
+        yield sse_event('chart', payload)
+    except Exception as e:
+        yield sse_event('error', {'error': f'Erreur lors de la génération: {str(e)}'})
+    yield sse_event('done', {})
+
+
+def _stream_chart_analysis(llm, user_query):
+    """
+    Analyse de la requête par le LLM en mode flux : émet des événements
+    progress pendant la réception, retourne la configuration (yield from)
+    """
+    prompt = chart_analysis_prompt(user_query)
+    try:
+        if not hasattr(llm, 'stream'):
+            return parse_chart_analysis(llm.invoke(prompt).content)
+        parts = []
+        last = time.perf_counter()
+        for chunk in llm.stream(prompt):
+            parts.append(chunk.content)
+            if time.perf_counter() - last >= SSE_PROGRESS_INTERVAL:
+                last = time.perf_counter()
+                yield sse_event('progress', {'stage': 'llm', 'chars': sum(map(len, parts))})
+        return parse_chart_analysis(''.join(parts))
+    except json.JSONDecodeError as e:
+        return {'error': f'Erreur de parsing JSON: {str(e)}'}
+    except FilterError as e:
+        return {'error': f'Filtre invalide: {str(e)}'}
+    except Exception as e:
+        return {'error': f'Erreur lors de l\'analyse de la requête: {str(e)}'}
+
+
+async def _astream_chart_analysis(llm, user_query):
+    """Variante asynchrone : produit des couples (événement, données), la configuration en dernier"""
+    prompt = chart_analysis_prompt(user_query)
+    try:
+        if not hasattr(llm, 'astream'):
+            response = await llm.ainvoke(prompt)
+            yield 'config', parse_chart_analysis(response.content)
+            return
+        parts = []
+        last = time.perf_counter()
+        async for chunk in llm.astream(prompt):
+            parts.append(chunk.content)
+            if time.perf_counter() - last >= SSE_PROGRESS_INTERVAL:
+                last = time.perf_counter()
+                yield 'progress', {'stage': 'llm', 'chars': sum(map(len, parts))}
+        yield 'config', parse_chart_analysis(''.join(parts))
+    except json.JSONDecodeError as e:
+        yield 'config', {'error': f'Erreur de parsing JSON: {str(e)}'}
+    except FilterError as e:
+        yield 'config', {'error': f'Filtre invalide: {str(e)}'}
+    except Exception as e:
+        yield 'config', {'error': f'Erreur lors de l\'analyse de la requête: {str(e)}'}
+
+
+def _matrix_intent(row_field, col_field):
+    skeleton = _matrix_payload(None, row_field, col_field)
+    return {'route': 'matrice', 'chart_type': 'heatmap', 'is_heatmap': True, 'title': skeleton['title']}
+
+
+def _dimension_intent(chart_key):
+    spec = CHART_REGISTRY[chart_key]
+    return {'route': chart_key, 'chart_type': spec['chart_type'], 'is_heatmap': False, 'title': spec['title']}
+
+
+def _dimension_config(chart_key, filters=None):
+    spec = CHART_REGISTRY[chart_key]
+    return {'chart': chart_key, 'groupby': spec['column'], 'chart_type': spec['chart_type'], 'filters': filters or {}}
+
+
+def _analysis_intent():
+    # Type inconnu avant la réponse du LLM : squelette en barres
+    return {'route': 'llm', 'chart_type': 'bar', 'is_heatmap': False, 'title': 'Analyse de la demande...'}
+
+
+def _data_summary(chart_data):
+    """Libellés et total d'un graphique, envoyés avant le payload complet"""
+    data = chart_data.get('data', {})
+    if chart_data.get('type') == 'heatmap':
+        return {'labels': data.get('y', []), 'columns': data.get('x', []),
+                'total': sum(map(sum, data.get('z', [])))}
+    values = data.get('datasets', [{}])[0].get('data', [])
+    return {'labels': data.get('labels', []), 'total': sum(values)}
+
+
+def _matrix_dimensions(params):
+    """Dimensions (lignes, colonnes, erreur) demandées pour une matrice"""
+    row_field = params.get('rows', 'prio')
+    col_field = params.get('cols', 'criticality')
+    if row_field not in CROSSTAB_FIELDS or col_field not in CROSSTAB_FIELDS:
+        return row_field, col_field, f'Dimensions non supportées: {row_field} × {col_field}'
+    return row_field, col_field, None
+
+
+def _request_filters(params):
+    """Filtres (normalisés, erreur) passés en paramètre JSON 'filters'"""
+    try:
+        return parse_filters(params.get('filters')), None
+    except FilterError as e:
+        return {}, f'Filtre invalide: {e}'
+
+
+def _with_entity_filters(user_query, filters):
+    """
+    Filtres de la requête complétés par les valeurs citées dans le texte
+    ("projet 1" → projet = Projet_1), et texte sans ces mentions : "état du
+    projet 3" est routé vers le graphique des états, pas celui des projets
+    """
+    return _merge_entity_filters(*entity_filters(user_query), filters)
+
+
+async def _awith_entity_filters(user_query, filters):
+    return _merge_entity_filters(*await aentity_filters(user_query), filters)
+
+
+def _merge_entity_filters(mentioned, routed_query, filters):
+    # Les filtres passés explicitement l'emportent sur les valeurs citées
+    if not mentioned:
+        return filters, routed_query
+    return parse_filters({**mentioned, **filters}), routed_query
+
+
+def _classified_config(user_query, routed_query):
+    """
+    Configuration prédite par le classifieur local (sur la requête sans les
+    valeurs citées, déjà en filtres), None sous le seuil de confiance
+    """
+    prediction = classify_chart_request(routed_query)
+    if prediction is None:
+        return None
+    chart_config, confidence = prediction
+    log_chart_query(user_query, chart_config, 'classifier', confidence)
+    return complete_chart_config(chart_config)
+
+
+async def _aclassified_config(user_query, routed_query):
+    prediction = await aclassify_chart_request(routed_query)
+    if prediction is None:
+        return None
+    chart_config, confidence = prediction
+    await alog_chart_query(user_query, chart_config, 'classifier', confidence)
+    return complete_chart_config(chart_config)
+
+
+def _with_request_filters(chart_config, filters):
+    """Configuration analysée complétée par les filtres de la requête (prioritaires)"""
+    if not filters:
+        return chart_config
+    return dict(chart_config, filters=parse_filters({**(chart_config.get('filters') or {}), **filters}))
+
+
+def _filtered_description(description, filters):
+    if not filters:
+        return description
+    return f'{description} ({describe_filters(filters)})'
+
+
+def _matrix_payload(chart_data, row_field, col_field, filters=None):
+    row_title = DIMENSION_TITLES[row_field]
+    col_title = DIMENSION_TITLES[col_field]
+    payload = {
+        'success': True,
+        'chart_data': chart_data,
+        'title': f'Matrice {row_title}/{col_title}',
+        'description': _filtered_description(
+            f'Répartition des cas de test par {row_title.lower()} et {col_title.lower()}', filters
+        ),
+        'is_heatmap': True  # Indique au frontend qu'il s'agit d'une heatmap
+    }
+    if filters:
+        payload['filters'] = filters
+    return payload
+
+
+def _dimension_payload(chart_key, chart_data, filters=None):
+    spec = CHART_REGISTRY[chart_key]
+    payload = {
+        'success': True,
+        'chart_data': chart_data,
+        'title': spec['title'],
+        'description': _filtered_description(spec['description'], filters),
+        'is_heatmap': False
+    }
+    if filters:
+        payload['filters'] = filters
+    return payload
+
+
+def _search_payload(terms, filters=None):
+    """Première page d'une recherche plein texte, pour le chatbot"""
+    return _search_results_payload(search_casdetest(terms, filters, page_size=CHAT_SEARCH_RESULTS), filters)
+
+
+async def _asearch_payload(terms, filters=None):
+    found = await asearch_casdetest(terms, filters, page_size=CHAT_SEARCH_RESULTS)
+    return _search_results_payload(found, filters)
+
+
+def _search_results_payload(found, filters):
+    return {
+        'success': True,
+        'is_search': True,
+        'title': f"Cas de test : « {found['query']} »",
+        'description': _filtered_description(f"{found['total']} cas de test trouvé(s)", filters),
+        **found,
+    }
+
+
+def _analysis_payload(chart_config, chart_data):
+    return {
+        'success': True,
+        'chart_data': chart_data,
+        'title': chart_config.get('title', 'Graphique ALTEN'),
+        'description': chart_config.get('description', ''),
+        'query_analysis': chart_config,
+        'is_heatmap': False
+    }
+
 def analyze_chart_request(llm, user_query):
     """
     Utilise Mistral AI pour analyser la demande de graphique
     """
-    
-    # Prompt structuré pour l'analyse
-    analysis_prompt = f"""
+    try:
+        response = llm.invoke(chart_analysis_prompt(user_query))
+        return parse_chart_analysis(response.content)
+    except json.JSONDecodeError as e:
+        return {'error': f'Erreur de parsing JSON: {str(e)}'}
+    except FilterError as e:
+        return {'error': f'Filtre invalide: {str(e)}'}
+    except Exception as e:
+        return {'error': f'Erreur lors de l\'analyse de la requête: {str(e)}'}
+
+
+async def aanalyze_chart_request(llm, user_query):
+    """Variante asynchrone de analyze_chart_request (ainvoke, sans bloquer la boucle)"""
+    try:
+        response = await llm.ainvoke(chart_analysis_prompt(user_query))
+        return parse_chart_analysis(response.content)
+    except json.JSONDecodeError as e:
+        return {'error': f'Erreur de parsing JSON: {str(e)}'}
+    except FilterError as e:
+        return {'error': f'Filtre invalide: {str(e)}'}
+    except Exception as e:
+        return {'error': f'Erreur lors de l\'analyse de la requête: {str(e)}'}
+
+
+def chart_analysis_prompt(user_query):
+    """Prompt structuré pour l'analyse"""
+    return f"""
     Tu es un expert en analyse de données pour le système ALTEN. 
     Analyse cette requête utilisateur et détermine quel type de graphique générer.
 
@@ -176,7 +741,9 @@ def analyze_chart_request(llm, user_query):
     {{
         "chart_type": "bar|line|pie|doughnut|radar",
         "data_source": "demandes",  # Toujours 'demandes' car nous n'avons qu'une source de données
-        "groupby": "test_state|projet|périmètre|profil|priorité",
+        "groupby": "test_state|projet|périmètre|profil|priorité|mois|semaine|historique",
+        "dimension": "test_state|projet|périmètre|profil|priorité",  # seulement pour groupby "historique"
+        "time_period": "1_mois|3_mois|6_mois|1_an|tout",
         "metric": "count",  # Toujours 'count' pour l'instant
         "title": "Titre du graphique",
         "description": "Description courte",
@@ -184,6 +751,15 @@ def analyze_chart_request(llm, user_query):
         "x_label": "Label axe X",
         "y_label": "Label axe Y"
     }}
+
+    FILTRES ("filters", objet vide si la requête n'en mentionne pas):
+    - égalité: {{"projet": "Projet A"}}, plusieurs valeurs: {{"prio": ["High", "Medium"]}}
+    - différence: {{"test_state": {{"ne": "OK"}}}}
+    - colonnes: projet, test_perimeter, profile, prio, criticality, test_state
+
+    HISTORIQUE (groupby "historique"): évolution dans le temps du nombre de cas
+    par valeur d'une dimension ("dimension"), filtrable uniquement sur cette
+    même dimension.
     
     Exemples:
     - "graphique des cas de test par état" → chart_type: "bar", groupby: "test_state"
@@ -191,57 +767,104 @@ def analyze_chart_request(llm, user_query):
     - "nombre de cas par profil" → chart_type: "bar", groupby: "profil"
     - "priorité des cas de test" → chart_type: "pie", groupby: "priorité"
     - "périmètre des tests" → chart_type: "bar", groupby: "périmètre"
+    - "évolution des créations sur un an" → chart_type: "line", groupby: "mois", time_period: "1_an"
+    - "cas créés par semaine ce mois-ci" → chart_type: "bar", groupby: "semaine", time_period: "1_mois"
+    - "états des tests du Projet A en priorité High" → groupby: "test_state",
+      filters: {{"projet": "Projet A", "prio": "High"}}
+    - "évolution des KO sur 6 mois" → chart_type: "line", groupby: "historique",
+      dimension: "test_state", time_period: "6_mois", filters: {{"test_state": "KO"}}
     """
+
+
+def parse_chart_analysis(response_text):
+    """Extrait et complète la configuration JSON renvoyée par le LLM"""
+    # Nettoyer la réponse pour extraire le JSON
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:-3]
+    elif response_text.startswith('```'):
+        response_text = response_text[3:-3]
+        
+    return complete_chart_config(json.loads(response_text))
+
+
+def complete_chart_config(config):
+    """Valide et complète une configuration (LLM ou classifieur local)"""
+    # Validation et valeurs par défaut
+    config['chart_type'] = config.get('chart_type', 'bar')
+    config['data_source'] = 'demandes'  # Forcer cette valeur car c'est la seule source
+    config['groupby'] = config.get('groupby', 'test_state')
+    config['metric'] = 'count'  # Forcer cette valeur car c'est la seule métrique supportée
+    config['filters'] = parse_filters(config.get('filters'))
     
-    try:
-        response = llm.invoke(analysis_prompt)
-        
-        # Nettoyer la réponse pour extraire le JSON
-        response_text = response.content.strip()
-        if response_text.startswith('```json'):
-            response_text = response_text[7:-3]
-        elif response_text.startswith('```'):
-            response_text = response_text[3:-3]
-            
-        config = json.loads(response_text)
-        
-        # Validation et valeurs par défaut
-        config['chart_type'] = config.get('chart_type', 'bar')
-        config['data_source'] = 'demandes'  # Forcer cette valeur car c'est la seule source
-        config['groupby'] = config.get('groupby', 'test_state')
-        config['metric'] = 'count'  # Forcer cette valeur car c'est la seule métrique supportée
-        
-        # Titre par défaut basé sur le groupby
-        if 'title' not in config or not config['title']:
-            groupby_labels = {
-                'test_state': 'État des tests',
-                'projet': 'Projets',
-                'périmètre': 'Périmètre des tests',
-                'profil': 'Profils utilisateurs',
-                'priorité': 'Priorité des tests'
-            }
-            config['title'] = f"Répartition par {groupby_labels.get(config['groupby'], 'données')}"
-        
-        return config
-        
-    except json.JSONDecodeError as e:
-        return {'error': f'Erreur de parsing JSON: {str(e)}'}
-    except Exception as e:
-        return {'error': f'Erreur lors de l\'analyse de la requête: {str(e)}'}
+    # Titre par défaut basé sur le groupby
+    if 'title' not in config or not config['title']:
+        groupby_labels = {
+            'test_state': 'État des tests',
+            'projet': 'Projets',
+            'périmètre': 'Périmètre des tests',
+            'test_perimeter': 'Périmètre des tests',
+            'profil': 'Profils utilisateurs',
+            'profile': 'Profils utilisateurs',
+            'priorité': 'Priorité des tests',
+            'prio': 'Priorité des tests',
+            'criticality': 'Criticité des tests',
+            'mois': 'mois',
+            'semaine': 'semaine',
+        }
+        config['title'] = f"Répartition par {groupby_labels.get(config['groupby'], 'données')}"
+        if config['groupby'] in GROUPBY_HISTORY:
+            config['title'] = "Évolution des cas de test"
+    
+    return config
 
 def generate_chart_data(config):
     """
     Génère les données du graphique selon la configuration
     """
-    
+    try:
+        start_date, end_date, params = _chart_data_params(config)
+        return cached_chart(
+            config['groupby'], params, config['chart_type'],
+            lambda: generate_demandes_chart(config, start_date, end_date)
+        )
+    except Exception as e:
+        return _data_unavailable_chart()
+
+
+async def agenerate_chart_data(config):
+    """Variante asynchrone de generate_chart_data"""
+    try:
+        start_date, end_date, params = _chart_data_params(config)
+        return await acached_chart(
+            config['groupby'], params, config['chart_type'],
+            lambda: agenerate_demandes_chart(config, start_date, end_date)
+        )
+    except Exception as e:
+        return _data_unavailable_chart()
+
+
+def _data_unavailable_chart():
+    return {
+        'type': 'bar',
+        'data': {
+            'labels': ['Erreur'],
+            'datasets': [{
+                'label': 'Données indisponibles',
+                'data': [0],
+                'backgroundColor': ['#ff6b6b']
+            }]
+        }
+    }
+
+
+def _chart_data_params(config):
+    """Période (début, fin) et paramètres de cache d'une configuration analysée"""
     data_source = config['data_source']
-    chart_type = config['chart_type']
-    groupby = config['groupby']
-    metric = config['metric']
     time_period = config.get('time_period', '6_mois')
     
     # Définir la période de temps
-    end_date = datetime.now()
+    end_date = timezone.now()
     if time_period == '1_mois':
         start_date = end_date - timedelta(days=30)
     elif time_period == '3_mois':
@@ -253,363 +876,219 @@ def generate_chart_data(config):
     else:
         start_date = None
     
-    try:
-        if data_source == 'demandes':
-            return generate_demandes_chart(config, start_date, end_date)
-        elif data_source == 'applications':
-            return generate_applications_chart(config, start_date, end_date)
-        elif data_source == 'audits':
-            return generate_audits_chart(config, start_date, end_date)
-        elif data_source == 'satisfaction':
-            return generate_satisfaction_chart(config, start_date, end_date)
-        elif data_source == 'transferts':
-            return generate_transferts_chart(config, start_date, end_date)
-        else:
-            raise ValueError(f"Source de données non supportée: {data_source}")
-            
-    except Exception as e:
-        return {
-            'type': 'bar',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Données indisponibles',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    if data_source != 'demandes':
+        raise ValueError(f"Source de données non supportée: {data_source}")
+
+    # Fenêtre relative à aujourd'hui : la date fait partie de la clé de cache,
+    # le titre aussi car il sert de libellé au jeu de données
+    params = {
+        'filters': parse_filters(config.get('filters')),
+        'time_period': time_period,
+        'dimension': config.get('dimension'),
+        'date': end_date.date().isoformat() if start_date else None,
+        'title': config.get('title'),
+    }
+    return start_date, end_date, params
+
 
 def generate_demandes_chart(config, start_date, end_date):
-    """Génère un graphique des demandes"""
-    
-    queryset = CasDeTest.objects.all()
-    
-    # Filtrer par période si définie
-    if start_date:
-        queryset = queryset.filter(date_creation__gte=start_date)
-    if end_date:
-        queryset = queryset.filter(date_creation__lte=end_date)
-    
-    groupby = config['groupby']
-    chart_type = config['chart_type']
+    """
+    Génère un graphique des demandes : comptes par dimension, ou série
+    mensuelle/hebdomadaire des créations (filtres appliqués en base)
+    """
+    filters = parse_filters(config.get('filters'))
+    if config['groupby'] in GROUPBY_HISTORY:
+        dimension, values = _history_dimension(config, filters)
+        days, series = snapshot_series(dimension, values, start_date, end_date, _history_granularity(config))
+        return _history_chart(config, dimension, days, series)
+    column = GROUPBY_COLUMNS.get(config['groupby'])
     
-    if groupby == 'test_state':
-        data = list(queryset.values('test_state').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['test_state'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'projet':
-        data = list(queryset.values('projet').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['projet'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'périmètre':
-        data = list(queryset.values('test_perimeter').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['test_perimeter'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'profil':
-        data = list(queryset.values('profile').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['profile'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'priorité':
-        data = list(queryset.values('prio').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['prio'] for item in data]
-        values = [item['count'] for item in data]
-        
+    if column:
+        data = count_by([column], _demandes_queryset(start_date, end_date), order_by='-count', filters=filters)
     else:
-        # Par défaut: comptage mensuel
-        data = list(queryset.annotate(
-            periode=TruncMonth('date_creation')
-        ).values('periode').annotate(
-            count=Count('id')
-        ).order_by('periode'))
-        
-        labels = [item['periode'].strftime('%Y-%m') for item in data]
-        values = [item['count'] for item in data]
+        data = count_by_period(_groupby_period(config), start_date, end_date, filters)
     
-    # Couleurs selon le type de graphique
-    if chart_type in ['pie', 'doughnut']:
-        colors = [
-            '#FFD700', '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', 
-            '#FECA57', '#FF9FF3', '#54A0FF', '#5F27CD', '#00D2D3'
-        ]
-        background_colors = colors[:len(labels)]
+    return _demandes_chart(config, column, data)
+
+
+async def agenerate_demandes_chart(config, start_date, end_date):
+    """Variante asynchrone de generate_demandes_chart"""
+    filters = parse_filters(config.get('filters'))
+    if config['groupby'] in GROUPBY_HISTORY:
+        dimension, values = _history_dimension(config, filters)
+        days, series = await asnapshot_series(dimension, values, start_date, end_date, _history_granularity(config))
+        return _history_chart(config, dimension, days, series)
+    column = GROUPBY_COLUMNS.get(config['groupby'])
+
+    if column:
+        data = await acount_by([column], _demandes_queryset(start_date, end_date), order_by='-count', filters=filters)
     else:
-        background_colors = ['rgba(255, 215, 0, 0.8)'] * len(labels)
-        border_colors = ['rgba(255, 215, 0, 1)'] * len(labels)
-    
-    chart_data = {
-        'type': chart_type,
-        'data': {
-            'labels': labels,
-            'datasets': [{
-                'label': config.get('title', 'Nombre de demandes'),
-                'data': values,
-                'backgroundColor': background_colors,
-                'borderColor': border_colors if chart_type not in ['pie', 'doughnut'] else None,
-                'borderWidth': 2 if chart_type not in ['pie', 'doughnut'] else None
-            }]
-        }
-    }
-    
-    return chart_data
+        data = await acount_by_period(_groupby_period(config), start_date, end_date, filters)
 
-def generate_audits_chart(config, start_date, end_date):
-    """Génère un graphique des audits"""
-    
-    queryset = CasDeTest.objects.all()
-    
-    if start_date:
-        queryset = queryset.filter(date_creation__gte=start_date)
+    return _demandes_chart(config, column, data)
+
+
+def _demandes_queryset(start_date, end_date):
+    """Fenêtre de dates sur CasDeTest (index de date_creation) ; None sans fenêtre"""
+    if not start_date:
+        # Toute la période : la table agrégée suffit
+        return None
+    queryset = CasDeTest.objects.filter(date_creation__gte=start_date)
     if end_date:
         queryset = queryset.filter(date_creation__lte=end_date)
-    
-    groupby = config['groupby']
-    metric = config['metric']
-    
-    if groupby == 'test_state':
-        data = list(queryset.values('test_state').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['test_state'] for item in data]
-        values = [item['count'] for item in data]
-    
-    elif groupby == 'projet':
-        data = list(queryset.values('projet').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['projet'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'périmètre':
-        data = list(queryset.values('test_perimeter').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['test_perimeter'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'profil':
-        data = list(queryset.values('profile').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['profile'] for item in data]
-        values = [item['count'] for item in data]
-        
-    elif groupby == 'priorité':
-        data = list(queryset.values('prio').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['prio'] for item in data]
-        values = [item['count'] for item in data]
-        
-    else:
-        # Répartition des résultats d'audit
-        data = list(queryset.values('test_state').annotate(
-            count=Count('id')
-        ).order_by('test_state'))
-        
-        labels = [f"Résultat {item['test_state']}" for item in data]
-        values = [item['count'] for item in data]
-    
-    return {
-        'type': config['chart_type'],
-        'data': {
-            'labels': labels,
-            'datasets': [{
-                'label': config.get('title', 'Audits'),
-                'data': values,
-                'backgroundColor': 'rgba(68, 68, 255, 0.8)',
-                'borderColor': 'rgba(68, 68, 255, 1)',
-                'borderWidth': 2
-            }]
-        }
-    }
+    return queryset
 
-def generate_satisfaction_chart(config, start_date, end_date):
-    """Génère un graphique des scores de satisfaction basé sur les priorités des cas de test"""
-    
-    queryset = CasDeTest.objects.all()
-    
-    # Filtrage par période si nécessaire
-    # Note: Comme CasDeTest n'a pas de date, on ne peut pas filtrer par date
-    # On garde la structure pour une éventuelle utilisation future
-    
-    if config['groupby'] == 'test_state':
-        data = list(queryset.values('test_state').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['test_state'] for item in data]
-        values = [item['count'] for item in data]
-    
-    else:
-        # Distribution des priorités
-        data = list(queryset.values('prio').annotate(
-            count=Count('id')
-        ).order_by('prio'))
-        
-        labels = [f"Priorité {item['prio']}" for item in data]
-        values = [item['count'] for item in data]
-    
-    return {
-        'type': config['chart_type'],
-        'data': {
-            'labels': labels,
-            'datasets': [{
-                'label': 'Répartition par priorité',
-                'data': values,
-                'backgroundColor': [
-                    'rgba(255, 99, 132, 0.8)',
-                    'rgba(54, 162, 235, 0.8)',
-                    'rgba(255, 206, 86, 0.8)',
-                    'rgba(75, 192, 192, 0.8)',
-                    'rgba(153, 102, 255, 0.8)'
-                ],
-                'borderColor': [
-                    'rgba(255, 99, 132, 1)',
-                    'rgba(54, 162, 235, 1)',
-                    'rgba(255, 206, 86, 1)',
-                    'rgba(75, 192, 192, 1)',
-                    'rgba(153, 102, 255, 1)'
-                ],
-                'borderWidth': 1
-            }]
-        },
-        'options': {
-            'responsive': True,
-            'plugins': {
-                'legend': {
-                    'position': 'top',
-                },
-                'title': {
-                    'display': True,
-                    'text': 'Répartition des cas de test par priorité'
-                }
-            }
-        }
-    }
 
-def generate_applications_chart(config, start_date, end_date):
-    """Génère un graphique des applications"""
-    
-    # Nombre de demandes par application
-    queryset = CasDeTest.objects.all()
-    
-    # Filtrer par période si nécessaire
-    if start_date or end_date:
-        demande_filter = Q()
-        if start_date:
-            demande_filter &= Q(date_creation__gte=start_date)
-        if end_date:
-            demande_filter &= Q(date_creation__lte=end_date)
-        queryset = queryset.filter(demande_filter)
-    
-    data = list(queryset.values('projet').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10])
-    
-    labels = [item['projet'] for item in data]
-    values = [item['count'] for item in data]
-    
+def _groupby_period(config):
+    # Par défaut: comptage mensuel
+    return GROUPBY_PERIODS.get(config['groupby'], 'month')
+
+
+def _period_label(periode, granularity):
+    if granularity == 'day':
+        return periode.isoformat()
+    if granularity == 'week':
+        return periode.strftime('%G-S%V')
+    return periode.strftime('%Y-%m')
+
+
+def _history_dimension(config, filters):
+    """
+    Dimension et valeurs d'une courbe d'évolution : "dimension" de la
+    configuration, sinon la colonne du filtre. Les photographies ne
+    comptent qu'une dimension à la fois : seul un filtre sur cette
+    dimension est possible.
+    """
+    dimension = GROUPBY_COLUMNS.get(config.get('dimension'))
+    if dimension is None and len(filters) == 1:
+        dimension = next(iter(filters))
+    if dimension is None:
+        raise ValueError("Dimension de l'historique manquante")
+    if set(filters) - {dimension} or not isinstance(filters.get(dimension, []), list):
+        raise ValueError(f"L'historique ne se filtre que sur {dimension}")
+    return dimension, filters.get(dimension)
+
+
+def _history_granularity(config):
+    return HISTORY_GRANULARITIES.get(config.get('time_period', '6_mois'), 'week')
+
+
+def _history_chart(config, dimension, days, series):
+    """Courbes Chart.js : une par valeur de la dimension"""
+    granularity = _history_granularity(config)
+    color_map = STATE_COLORS if dimension == 'test_state' else LEVEL_COLORS if dimension in ('prio', 'criticality') else {}
+    datasets = []
+    for index, (value, counts) in enumerate(series.items()):
+        color = color_map.get(value, CATEGORY_PALETTE[index % len(CATEGORY_PALETTE)])
+        datasets.append({
+            'label': value,
+            'data': counts,
+            'borderColor': color,
+            'backgroundColor': color,
+            'fill': False,
+            'tension': 0.2,
+        })
     return {
-        'type': config['chart_type'],
+        'type': 'line',
         'data': {
-            'labels': labels,
-            'datasets': [{
-                'label': 'Nombre de demandes',
-                'data': values,
-                'backgroundColor': 'rgba(255, 193, 7, 0.8)',
-                'borderColor': 'rgba(255, 193, 7, 1)',
-                'borderWidth': 2
-            }]
-        }
+            'labels': [_period_label(day, granularity) for day in days],
+            'datasets': datasets,
+        },
     }
-
-def generate_transferts_chart(config, start_date, end_date):
-    """Génère un graphique des transferts"""
-    
-    from django.db import models
-    
-    queryset = CasDeTest.objects.all()
-    
-    if start_date:
-        queryset = queryset.filter(date_creation__gte=start_date)
-    if end_date:
-        queryset = queryset.filter(date_creation__lte=end_date)
-    
-    if config['groupby'] == 'test_state':
-        data = list(queryset.values('test_state').annotate(
-            count=Count('id')
-        ).order_by('-count'))
-        
-        labels = [item['test_state'] for item in data]
-        values = [item['count'] for item in data]
+
+
+def _demandes_chart(config, column, data):
+    chart_type = config['chart_type']
+    if column:
+        labels = [item[column] for item in data]
+    else:
+        granularity = _groupby_period(config)
+        labels = [_period_label(item['periode'], granularity) for item in data]
+    values = [item['count'] for item in data]
     
+    # Couleurs selon le type de graphique
+    if chart_type in ['pie', 'doughnut']:
+        colors = [
+            '#FFD700', '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', 
+            '#FECA57', '#FF9FF3', '#54A0FF', '#5F27CD', '#00D2D3'
+        ]
+        background_colors = colors[:len(labels)]
     else:
-        # Transferts par expert
-        data = list(queryset.values(
-            'profile'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')[:10])
-        
-        labels = [f"{item['profile']}" for item in data]
-        values = [item['count'] for item in data]
+        background_colors = ['rgba(255, 215, 0, 0.8)'] * len(labels)
+        border_colors = ['rgba(255, 215, 0, 1)'] * len(labels)
     
-    return {
-        'type': config['chart_type'],
+    chart_data = {
+        'type': chart_type,
         'data': {
             'labels': labels,
             'datasets': [{
-                'label': 'Nombre de transferts',
+                'label': config.get('title', 'Nombre de demandes'),
                 'data': values,
-                'backgroundColor': 'rgba(156, 39, 176, 0.8)',
-                'borderColor': 'rgba(156, 39, 176, 1)',
-                'borderWidth': 2
+                'backgroundColor': background_colors,
+                'borderColor': border_colors if chart_type not in ['pie', 'doughnut'] else None,
+                'borderWidth': 2 if chart_type not in ['pie', 'doughnut'] else None
             }]
         }
     }
+    
+    return chart_data
+
+# Libellés des dimensions utilisables dans les matrices
+DIMENSION_TITLES = {
+    'prio': 'Priorité',
+    'criticality': 'Criticité',
+    'test_state': 'État du test',
+    'projet': 'Projet',
+    'profile': 'Profil',
+    'test_perimeter': 'Périmètre de test',
+}
 
 def generate_priority_criticality_matrix():
     """
     Génère une matrice de priorité/criticité pour les cas de test.
-    Retourne un dictionnaire avec les données formatées pour Chart.js
+    Retourne un dictionnaire avec les données formatées pour Plotly
     """
-    # Récupérer les données groupées par priorité et criticité
-    from django.db.models import Count
-    
-    # Vérifier d'abord s'il y a des données
-    total_cases = CasDeTest.objects.count()
-    if total_cases == 0:
+    return generate_crosstab_heatmap('prio', 'criticality')
+
+def generate_crosstab_heatmap(row_field, col_field, filters=None):
+    """
+    Génère une heatmap croisant deux colonnes de CasDeTest (lignes × colonnes).
+    Les comptes sont découpés dans le résumé du tableau de bord (toutes les
+    paires de dimensions, une seule requête GROUPING SETS) ; un filtre que
+    le résumé ne couvre pas devient la clause WHERE d'un GROUP BY.
+    """
+    summary = dashboard_summary()
+    if summary.covers((row_field, col_field), filters):
+        counts = summary.crosstab(row_field, col_field, filters)
+    else:
+        counts = crosstab(row_field, col_field, filters=filters)
+    return crosstab_heatmap(row_field, col_field, *counts)
+
+
+async def agenerate_crosstab_heatmap(row_field, col_field, filters=None):
+    """Variante asynchrone de generate_crosstab_heatmap"""
+    summary = await adashboard_summary()
+    if summary.covers((row_field, col_field), filters):
+        counts = summary.crosstab(row_field, col_field, filters)
+    else:
+        counts = await acrosstab(row_field, col_field, filters=filters)
+    return crosstab_heatmap(row_field, col_field, *counts)
+
+
+def crosstab_heatmap(row_field, col_field, row_labels, col_labels, counts):
+    """Payload Plotly d'une matrice de comptes (voir aggregations.crosstab)"""
+    row_title = DIMENSION_TITLES.get(row_field, row_field)
+    col_title = DIMENSION_TITLES.get(col_field, col_field)
+    matrix = counts.tolist()
+
+    # Aucune donnée : matrice vide avec un titre explicite
+    if not counts.any():
         return {
             'type': 'heatmap',
             'data': {
-                'x': ['High', 'Medium', 'Low'],
-                'y': ['High', 'Medium', 'Low'],
-                'z': [[0, 0, 0], [0, 0, 0], [0, 0, 0]],
+                'x': col_labels,
+                'y': row_labels,
+                'z': matrix,
                 'type': 'heatmap',
                 'colorscale': [
                     [0, 'rgb(158, 202, 225)'],
@@ -619,36 +1098,18 @@ def generate_priority_criticality_matrix():
                 'showscale': True
             },
             'layout': {
-                'title': 'Matrice Priorité/Criticité (Aucune donnée trouvée)',
-                'xaxis': {'title': 'Criticité'},
-                'yaxis': {'title': 'Priorité'}
+                'title': f'Matrice {row_title}/{col_title} (Aucune donnée trouvée)',
+                'xaxis': {'title': col_title},
+                'yaxis': {'title': row_title}
             }
         }
     
-    # Créer une requête qui compte les cas par priorité et criticité
-    priorities = ['High', 'Medium', 'Low']
-    criticalities = ['High', 'Medium', 'Low']
-    
-    # Initialiser la matrice avec des zéros
-    matrix = []
-    for _ in priorities:
-        matrix.append([0] * len(criticalities))
-    
-    # Récupérer les données de la base
-    queryset = CasDeTest.objects.all()
-    
-    # Remplir la matrice avec les comptes
-    for i, prio in enumerate(priorities):
-        for j, crit in enumerate(criticalities):
-            count = queryset.filter(prio=prio, criticality=crit).count()
-            matrix[i][j] = count
-    
     # Créer les données pour le graphique
     chart_data = {
         'type': 'heatmap',
         'data': {
-            'x': criticalities,
-            'y': priorities,
+            'x': col_labels,
+            'y': row_labels,
             'z': matrix,
             'type': 'heatmap',
             'colorscale': [
@@ -668,7 +1129,10 @@ def generate_priority_criticality_matrix():
                 'thickness': 20,
                 'len': 0.7
             },
-            'hovertemplate': '<b>%{y}</b> priorité<br><b>%{x}</b> criticité<br><b>%{z}</b> cas de test<extra></extra>',
+            'hovertemplate': (
+                f'{row_title}: <b>%{{y}}</b><br>{col_title}: <b>%{{x}}</b><br>'
+                '<b>%{z}</b> cas de test<extra></extra>'
+            ),
             'text': matrix,
             'texttemplate': '%{z}',
             'textfont': {
@@ -679,13 +1143,13 @@ def generate_priority_criticality_matrix():
         },
         'layout': {
             'title': {
-                'text': 'Matrice Priorité/Criticité - Répartition des Cas de Test',
+                'text': f'Matrice {row_title}/{col_title} - Répartition des Cas de Test',
                 'font': {'size': 18, 'color': '#2c3e50'},
                 'x': 0.5
             },
             'xaxis': {
                 'title': {
-                    'text': 'Niveau de Criticité',
+                    'text': col_title,
                     'font': {'size': 14, 'color': '#34495e'}
                 },
                 'tickfont': {'size': 12, 'color': '#2c3e50'},
@@ -693,7 +1157,7 @@ def generate_priority_criticality_matrix():
             },
             'yaxis': {
                 'title': {
-                    'text': 'Niveau de Priorité',
+                    'text': row_title,
                     'font': {'size': 14, 'color': '#34495e'}
                 },
                 'tickfont': {'size': 12, 'color': '#2c3e50'}
@@ -707,533 +1171,34 @@ def generate_priority_criticality_matrix():
     
     return chart_data
 
+# Graphiques directs par dimension (voir CHART_REGISTRY dans charts.py)
 def generate_priority_chart():
-    """
-    Génère directement un graphique des priorités (similaire à la matrice)
-    """
-    try:
-        # Récupérer les données directement depuis la base
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par priorité
-        priority_data = list(CasDeTest.objects.values('prio').annotate(count=Count('id')).order_by('-count'))
-        
-        if not priority_data:
-            # Données par défaut si la base est vide
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['prio'] for item in priority_data]
-            values = [item['count'] for item in priority_data]
-            # Couleurs pour les priorités
-            color_map = {
-                'High': '#e74c3c',    # Rouge
-                'Medium': '#f39c12',  # Orange
-                'Low': '#27ae60'      # Vert
-            }
-            colors = [color_map.get(label, '#3498db') for label in labels]
-        
-        # Construire les données Chart.js
-        chart_data = {
-            'type': 'bar',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderColor': colors,
-                    'borderWidth': 2
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par Priorité'
-                    },
-                    'legend': {
-                        'display': False
-                    }
-                },
-                'scales': {
-                    'y': {
-                        'beginAtZero': True,
-                        'title': {
-                            'display': True,
-                            'text': 'Nombre de cas'
-                        }
-                    },
-                    'x': {
-                        'title': {
-                            'display': True,
-                            'text': 'Niveau de priorité'
-                        }
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_priority_chart: {e}")
-        # Graphique d'erreur
-        return {
-            'type': 'bar',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des priorités"""
+    return generate_dimension_chart('priorite')
 
 def generate_project_chart():
-    """
-    Génère directement un graphique des projets
-    """
-    try:
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par projet
-        project_data = list(CasDeTest.objects.values('projet').annotate(count=Count('id')).order_by('-count'))
-        
-        if not project_data:
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['projet'] for item in project_data]
-            values = [item['count'] for item in project_data]
-            # Couleurs variées pour les projets
-            colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22', '#34495e'][:len(labels)]
-        
-        chart_data = {
-            'type': 'pie',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderWidth': 2
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par Projet'
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_project_chart: {e}")
-        return {
-            'type': 'pie',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des projets"""
+    return generate_dimension_chart('projet')
 
 def generate_status_chart():
-    """
-    Génère directement un graphique des statuts
-    """
-    try:
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par statut
-        status_data = list(CasDeTest.objects.values('test_state').annotate(count=Count('id')).order_by('-count'))
-        
-        if not status_data:
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['test_state'] for item in status_data]
-            values = [item['count'] for item in status_data]
-            # Couleurs selon le statut
-            color_map = {
-                'OK': '#27ae60',           # Vert
-                'KO': '#e74c3c',           # Rouge
-                'In Progress': '#f39c12',  # Orange
-                'Not Started': '#95a5a6',  # Gris
-                'Blocked': '#8e44ad',      # Violet
-                'N/A': '#34495e'           # Gris foncé
-            }
-            colors = [color_map.get(label, '#3498db') for label in labels]
-        
-        chart_data = {
-            'type': 'bar',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderColor': colors,
-                    'borderWidth': 2
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par Statut'
-                    },
-                    'legend': {
-                        'display': False
-                    }
-                },
-                'scales': {
-                    'y': {
-                        'beginAtZero': True,
-                        'title': {
-                            'display': True,
-                            'text': 'Nombre de cas'
-                        }
-                    },
-                    'x': {
-                        'title': {
-                            'display': True,
-                            'text': 'Statut du test'
-                        }
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_status_chart: {e}")
-        return {
-            'type': 'bar',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des statuts"""
+    return generate_dimension_chart('statut')
 
 def generate_test_perimeter_chart():
-    """
-    Génère directement un graphique des périmètres de test
-    """
-    try:
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par périmètre de test
-        perimeter_data = list(CasDeTest.objects.values('test_perimeter').annotate(count=Count('id')).order_by('-count'))
-        
-        if not perimeter_data:
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['test_perimeter'] for item in perimeter_data]
-            values = [item['count'] for item in perimeter_data]
-            # Couleurs variées pour les périmètres
-            colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22', '#34495e'][:len(labels)]
-        
-        chart_data = {
-            'type': 'doughnut',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderWidth': 2,
-                    'borderColor': '#ffffff'
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par Périmètre'
-                    },
-                    'legend': {
-                        'position': 'right'
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_test_perimeter_chart: {e}")
-        return {
-            'type': 'doughnut',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des périmètres de test"""
+    return generate_dimension_chart('perimetre')
 
 def generate_test_states_chart():
-    """
-    Génère directement un graphique des états des tests
-    """
-    try:
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par état de test
-        states_data = list(CasDeTest.objects.values('test_state').annotate(count=Count('id')).order_by('test_state'))
-        
-        if not states_data:
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['test_state'] for item in states_data]
-            values = [item['count'] for item in states_data]
-            # Couleurs selon l'état
-            color_map = {
-                'OK': '#27ae60',           # Vert
-                'KO': '#e74c3c',           # Rouge
-                'KO JDD': '#c0392b',       # Rouge foncé
-                'In Progress': '#f39c12',  # Orange
-                'Not Started': '#95a5a6',  # Gris
-                'Blocked': '#8e44ad',      # Violet
-                'N/A': '#34495e'           # Gris foncé
-            }
-            colors = [color_map.get(label, '#3498db') for label in labels]
-        
-        chart_data = {
-            'type': 'bar',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderColor': colors,
-                    'borderWidth': 2
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par État'
-                    },
-                    'legend': {
-                        'display': False
-                    }
-                },
-                'scales': {
-                    'y': {
-                        'beginAtZero': True,
-                        'title': {
-                            'display': True,
-                            'text': 'Nombre de cas'
-                        }
-                    },
-                    'x': {
-                        'title': {
-                            'display': True,
-                            'text': 'État du test'
-                        }
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_test_states_chart: {e}")
-        return {
-            'type': 'bar',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des états des tests"""
+    return generate_dimension_chart('etat')
 
 def generate_profile_chart():
-    """
-    Génère directement un graphique des profils utilisateurs
-    """
-    try:
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par profil
-        profile_data = list(CasDeTest.objects.values('profile').annotate(count=Count('id')).order_by('-count'))
-        
-        if not profile_data:
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['profile'] for item in profile_data]
-            values = [item['count'] for item in profile_data]
-            # Couleurs pour les profils
-            colors = ['#e74c3c', '#3498db', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c'][:len(labels)]
-        
-        chart_data = {
-            'type': 'pie',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderWidth': 2,
-                    'borderColor': '#ffffff'
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par Profil'
-                    },
-                    'legend': {
-                        'position': 'bottom'
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_profile_chart: {e}")
-        return {
-            'type': 'pie',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des profils utilisateurs"""
+    return generate_dimension_chart('profil')
 
 def generate_criticality_chart():
-    """
-    Génère directement un graphique des niveaux de criticité
-    """
-    try:
-        from django.db.models import Count
-        from .models import CasDeTest
-        
-        # Compter les cas par criticité
-        criticality_data = list(CasDeTest.objects.values('criticality').annotate(count=Count('id')).order_by('criticality'))
-        
-        if not criticality_data:
-            labels = ['Aucune donnée']
-            values = [0]
-            colors = ['#ff6b6b']
-        else:
-            labels = [item['criticality'] for item in criticality_data]
-            values = [item['count'] for item in criticality_data]
-            # Couleurs pour les criticités
-            color_map = {
-                'High': '#e74c3c',    # Rouge
-                'Medium': '#f39c12',  # Orange
-                'Low': '#27ae60'      # Vert
-            }
-            colors = [color_map.get(label, '#3498db') for label in labels]
-        
-        chart_data = {
-            'type': 'bar',
-            'data': {
-                'labels': labels,
-                'datasets': [{
-                    'label': 'Nombre de cas de test',
-                    'data': values,
-                    'backgroundColor': colors,
-                    'borderColor': colors,
-                    'borderWidth': 2
-                }]
-            },
-            'options': {
-                'responsive': True,
-                'plugins': {
-                    'title': {
-                        'display': True,
-                        'text': 'Répartition des Cas de Test par Criticité'
-                    },
-                    'legend': {
-                        'display': False
-                    }
-                },
-                'scales': {
-                    'y': {
-                        'beginAtZero': True,
-                        'title': {
-                            'display': True,
-                            'text': 'Nombre de cas'
-                        }
-                    },
-                    'x': {
-                        'title': {
-                            'display': True,
-                            'text': 'Niveau de criticité'
-                        }
-                    }
-                }
-            }
-        }
-        
-        return chart_data
-        
-    except Exception as e:
-        print(f"Erreur dans generate_criticality_chart: {e}")
-        return {
-            'type': 'bar',
-            'data': {
-                'labels': ['Erreur'],
-                'datasets': [{
-                    'label': 'Erreur de génération',
-                    'data': [0],
-                    'backgroundColor': ['#ff6b6b']
-                }]
-            }
-        }
+    """Génère directement un graphique des niveaux de criticité"""
+    return generate_dimension_chart('criticite')
 
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
@@ -1247,18 +1212,9 @@ def analyze_command(request):
     """Analyse une commande utilisateur et retourne une réponse"""
     if request.method == 'POST':
         try:
-            # Vérifier le type de contenu
-            if request.content_type == 'application/json':
-                try:
-                    data = json.loads(request.body)
-                    user_input = data.get('text', '').strip()
-                except json.JSONDecodeError:
-                    return JsonResponse({'error': 'Invalid JSON data'}, status=400)
-            else:  # format x-www-form-urlencoded
-                user_input = request.POST.get('text', '').strip()
-            
-            if not user_input:
-                return JsonResponse({'error': 'No input provided'}, status=400)
+            user_input, error = _command_input(request)
+            if error:
+                return error
             
             # Construire la réponse de base
             response_data = {
@@ -1268,7 +1224,7 @@ def analyze_command(request):
             
             # Essayer d'ajouter des informations sur les cas de test
             try:
-                test_cases = list(CasDeTest.objects.all()[:5].values('projet', 'marco_scenario', 'test_state'))
+                test_cases = list(_command_test_cases())
                 if test_cases:
                     response_data['test_cases'] = test_cases
             except Exception as e:
@@ -1289,6 +1245,64 @@ def analyze_command(request):
     
     return JsonResponse({'error': 'Méthode non autorisée'}, status=405)
 
+
+async def analyze_command_async(request):
+    """Version asynchrone de analyze_command (ORM asynchrone)"""
+    if request.method == 'POST':
+        try:
+            user_input, error = _command_input(request)
+            if error:
+                return error
+
+            response_data = {
+                'result': f"Commande reçue : {user_input}",
+                'suggestions': []
+            }
+
+            try:
+                test_cases = [row async for row in _command_test_cases()]
+                if test_cases:
+                    response_data['test_cases'] = test_cases
+            except Exception as e:
+                logger.warning(f"Erreur récupération cas de test: {str(e)}")
+
+            return JsonResponse({
+                'success': True,
+                'data': response_data
+            })
+
+        except Exception as e:
+            logger.error(f"Erreur analyse commande: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {'error': 'Une erreur est survenue lors du traitement de votre demande'},
+                status=500
+            )
+
+    return JsonResponse({'error': 'Méthode non autorisée'}, status=405)
+
+analyze_command_async.csrf_exempt = True
+
+
+def _command_input(request):
+    """Texte de la commande (JSON ou formulaire) et réponse d'erreur éventuelle"""
+    # Vérifier le type de contenu
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+            user_input = data.get('text', '').strip()
+        except json.JSONDecodeError:
+            return None, JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    else:  # format x-www-form-urlencoded
+        user_input = request.POST.get('text', '').strip()
+    
+    if not user_input:
+        return None, JsonResponse({'error': 'No input provided'}, status=400)
+    return user_input, None
+
+
+def _command_test_cases():
+    return CasDeTest.objects.all()[:5].values('projet', 'marco_scenario', 'test_state')
+
 @csrf_exempt
 def get_conversation_history(request):
     """Récupère l'historique d'une conversation"""
@@ -1307,6 +1321,160 @@ def get_conversation_history(request):
     return JsonResponse({"error": "ID de conversation requis"}, status=400)
 
 
+# Import : création et mise à jour de cas de test
+IMPORT_PERMISSIONS = ('Chatbot.add_casdetest', 'Chatbot.change_casdetest')
+
+
+@permission_required(IMPORT_PERMISSIONS, raise_exception=True)
+def import_casdetest_file(request):
+    """
+    Import d'un fichier CSV/XLSX de cas de test (champ 'file'), réservé aux
+    utilisateurs autorisés à créer et modifier les cas de test.
+    Paramètre optionnel 'upsert' (défaut : 1). Retourne le rapport d'import
+    avec les premières lignes rejetées ; au-delà de SYNC_MAX_BYTES, le
+    fichier est mis en file (import_worker) et l'import suivi sur
+    /import/<id>/ (réponse 202).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Méthode non autorisée'}, status=405)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Aucun fichier reçu (champ "file")'}, status=400)
+    upsert = request.POST.get('upsert', '1').lower() not in ('0', 'false', 'non')
+
+    if upload.size > import_settings()['SYNC_MAX_BYTES']:
+        try:
+            job = queue_import(upload, upsert=upsert, requested_by=request.user.get_username())
+        except ImportFormatError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'success': True, 'import': import_job_status(job)}, status=202)
+
+    try:
+        report = import_casdetest(upload, upsert=upsert)
+    except ImportFormatError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Erreur import cas de test: {str(e)}", exc_info=True)
+        return JsonResponse({'error': "Erreur lors de l'import du fichier"}, status=500)
+
+    return JsonResponse({'success': True, **report})
+
+
+@permission_required(IMPORT_PERMISSIONS, raise_exception=True)
+def import_status(request, job_id):
+    """Progression d'un import mis en file ; rapport une fois terminé"""
+    job = ImportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Import introuvable'}, status=404)
+    return JsonResponse(import_job_status(job))
+
+
+def search_casdetest_content(request):
+    """
+    Recherche plein texte dans les cas de test (scénario, cas, étapes,
+    résultat attendu), résultats classés par pertinence.
+
+    Paramètres GET : "q" (syntaxe web : "expression exacte", -exclu, or),
+    "filters" (JSON, voir filters.py), "page" et "page_size".
+    """
+    params = request.GET
+    filters, error = _request_filters(params)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    try:
+        found = search_casdetest(params.get('q'), filters, params.get('page'), params.get('page_size'))
+    except SearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(found)
+
+
+def export_casdetest(request):
+    """
+    Export en flux des cas de test, sans charger la table en mémoire.
+
+    Paramètres GET : "format" (csv, jsonl, parquet), "columns" (liste séparée
+    par des virgules ; défaut : toutes sauf les grands champs texte),
+    "filters" (JSON, voir filters.py) et "chunk_size" (lignes par lot).
+    """
+    params = request.GET
+    file_format = params.get('format', 'csv').lower()
+    filters, error = _request_filters(params)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    try:
+        check_format(file_format)
+        columns = parse_columns(params.get('columns'))
+        chunk_size = parse_chunk_size(params.get('chunk_size'))
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if isinstance(request, ASGIRequest):
+        chunks = astream_export(file_format, columns, filters, chunk_size)
+    else:
+        chunks = stream_export(file_format, columns, filters, chunk_size)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="cas_de_test.{file_format}"'
+    return response
+
+
+@csrf_exempt
+def reports(request):
+    """
+    POST : met en file un rapport (corps JSON optionnel : {"title", "projects",
+    "format": "pdf"|"pptx"}), traité par les workers (report_worker).
+    GET : derniers rapports et leur progression.
+    """
+    if request.method == 'POST':
+        try:
+            params = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+        if not isinstance(params, dict):
+            return JsonResponse({'error': 'Objet JSON attendu'}, status=400)
+        projects = params.get('projects')
+        if projects is not None and not isinstance(projects, list):
+            return JsonResponse({'error': '"projects" doit être une liste'}, status=400)
+        try:
+            job = create_report_job(params.get('title'), projects, params.get('format', 'pdf'))
+        except ReportError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'success': True, 'report': _report_status(request, job)}, status=202)
+
+    jobs = ReportJob.objects.order_by('-date_creation')[:20]
+    return JsonResponse({'reports': [_report_status(request, job) for job in jobs]})
+
+
+def report_status(request, job_id):
+    """Progression d'un rapport ; lien de téléchargement une fois terminé"""
+    job = ReportJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Rapport introuvable'}, status=404)
+    return JsonResponse(_report_status(request, job))
+
+
+def report_download(request, job_id):
+    job = ReportJob.objects.filter(pk=job_id, status='done').first()
+    if job is None or not job.report:
+        return JsonResponse({'error': 'Rapport introuvable ou non terminé'}, status=404)
+    return FileResponse(
+        job.report.open('rb'), as_attachment=True,
+        filename=os.path.basename(job.report.name), content_type=REPORT_FORMATS[job.file_format],
+    )
+
+
+def _report_status(request, job):
+    status = job_progress(job)
+    if job.status == 'done':
+        status['download'] = request.build_absolute_uri(reverse('report_download', args=[job.pk]))
+    return status
+
+
+def chart_cache_stats(request):
+    """Compteurs du cache des analyses de graphique (succès, échecs, temps LLM économisé)"""
+    return JsonResponse(get_chart_config_cache().stats())
+
+
 @csrf_exempt
 def chatbot_suggestions(request):
     """Fournit des suggestions de questions pour le chatbot"""
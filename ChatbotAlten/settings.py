@@ -86,6 +86,103 @@ DATABASES = {
     }
 }
 
+# LLM (repli Mistral pour les requêtes non reconnues)
+# Backend: 'mistral', 'stub' (local, sans réseau) ou chemin vers une fabrique
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'mistral')
+# Clé lue dans l'environnement uniquement, jamais dans le dépôt
+MISTRAL_API_KEY = os.environ.get('MISTRAL_API_KEY')
+MISTRAL_MODEL = os.environ.get('MISTRAL_MODEL', 'mistral-large-latest')
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+
+# Cache des analyses LLM de requêtes de graphique (voir Chatbot/query_cache.py)
+CHART_CONFIG_CACHE = {
+    'BACKEND': 'memory',
+    'MAX_ENTRIES': 1000,
+    'TTL': 24 * 3600,
+    'EMBEDDER': None,
+    'SIMILARITY_THRESHOLD': 0.92,
+}
+
+# Cache des graphiques calculés, invalidé à chaque écriture sur CasDeTest.
+# La version des données doit être partagée par tous les processus (workers
+# web, commandes) : table créée par python manage.py createcachetable.
+# En production multi-workers, utiliser aussi un cache partagé (Redis, Memcached...)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chatbot-alten',
+    },
+    'chart_version': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'chatbot_chart_version',
+    },
+}
+CHART_RESULT_CACHE_ALIAS = 'default'
+CHART_VERSION_CACHE_ALIAS = 'chart_version'
+CHART_RESULT_CACHE_TTL = 24 * 3600
+
+# Lire les comptes dans la table agrégée CasDeTestCount plutôt que dans CasDeTest
+# (recalcul complet : python manage.py rebuild_casdetest_counts)
+CHART_USE_COUNTS_TABLE = True
+
+# Valeurs de dimensions citées dans les requêtes ("projet 1", "ProjetA") et
+# converties en filtres sans LLM (voir Chatbot/entities.py)
+ENTITY_MATCHING = {
+    'FIELDS': ('projet', 'profile', 'test_perimeter'),
+    'THRESHOLD': 0.5,           # similarité minimale des trigrammes (0 à 1)
+}
+
+# Classifieur local des demandes de graphique, consulté avant le LLM
+# (voir Chatbot/intents.py ; réentraînement : manage.py train_intent_classifier)
+INTENT_CLASSIFIER = {
+    'ENABLED': True,
+    'THRESHOLD': 0.35,          # confiance minimale (0 à 1), sinon le LLM répond
+    'MODEL_PATH': os.path.join(BASE_DIR, 'intent_model.npz'),  # à défaut : exemples seuls
+}
+
+# Import de cas de test par l'API (POST /Alten/Chatbot/import/, voir Chatbot/importer.py) :
+# au-delà de SYNC_MAX_BYTES, fichier mis en file et chargé par python manage.py import_worker
+CASDETEST_IMPORT = {
+    'SYNC_MAX_BYTES': 2 * 1024 * 1024,
+    'POLL_INTERVAL': 2,         # secondes entre deux consultations de la file vide
+}
+
+# Export en flux des cas de test (GET /Alten/Chatbot/export/, voir Chatbot/exports.py)
+CASDETEST_EXPORT = {
+    'CHUNK_SIZE': 2000,         # lignes lues en base et envoyées par lot
+}
+
+# Rendu serveur des graphiques en PNG/SVG (voir Chatbot/rendering.py) :
+# processus matplotlib dédiés, images en cache par empreinte de leur contenu
+CHART_RENDER = {
+    'WORKERS': 2,
+    'TIMEOUT': 30,              # secondes par lot d'images
+    'WIDTH': 800,               # pixels
+    'HEIGHT': 500,
+    'DPI': 100,
+    'CACHE_TTL': 7 * 24 * 3600,
+}
+
+# File locale des rapports PDF/PowerPoint (python manage.py report_worker)
+REPORT_JOBS = {
+    'POLL_INTERVAL': 2,         # secondes entre deux consultations de la file vide
+    'STALE_AFTER': 600,         # tâche d'un worker arrêté remise en file après ce délai
+    'IMAGE_WIDTH': 1000,        # pixels
+    'IMAGE_HEIGHT': 650,
+}
+
+# Partitionnement mensuel de CasDeTest par date_creation (PostgreSQL uniquement).
+# Conversion : python manage.py partition_casdetest --convert ; la même commande,
+# lancée régulièrement, crée les partitions à venir et archive les anciennes.
+CASDETEST_PARTITIONING = {
+    'ENABLED': False,
+    'MONTHS_AHEAD': 3,
+    'RETENTION_MONTHS': None,  # None : aucune partition détachée
+    'ARCHIVE': 'detach',       # 'detach' (table conservée) ou 'drop'
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -21,7 +21,7 @@ def test_data_and_chart():
     
     # 2. Afficher quelques exemples
     print("\n--- Exemples de données ---")
-    for cas in CasDeTest.objects.all()[:5]:
+    for cas in CasDeTest.objects.slim()[:5]:
         print(f"Projet: {cas.projet}, Priorité: {cas.prio}, Criticité: {cas.criticality}")
     
     # 3. Compter par priorité et criticité
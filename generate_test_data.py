@@ -68,7 +68,7 @@ def generate_test_data(num_entries=50):
     # Afficher quelques exemples
     if total_count > 0:
         print("\nExemples d'entrées créées :")
-        for cas in CasDeTest.objects.all()[:3]:
+        for cas in CasDeTest.objects.slim()[:3]:
             print(f"- {cas.projet}: {cas.marco_scenario} (Priorité: {cas.prio}, Criticité: {cas.criticality})")
     
 if __name__ == "__main__":
@@ -66,7 +66,7 @@ def test_django_orm():
         
         if total_count > 0:
             print("✅ Exemples via Django ORM:")
-            for cas in CasDeTest.objects.all()[:5]:
+            for cas in CasDeTest.objects.slim()[:5]:
                 print(f"  - Projet: {cas.projet}, Priorité: {cas.prio}, Criticité: {cas.criticality}")
         else:
             print("❌ Aucune donnée trouvée via Django ORM")
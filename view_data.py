@@ -12,8 +12,12 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ChatbotAlten.settings')
 django.setup()
 
+from Chatbot.aggregations import count_by
 from Chatbot.models import CasDeTest
 
+# Colonnes affichées : seules celles-ci sont lues (pas les grands champs texte)
+DISPLAY_COLUMNS = ('id', 'projet', 'test_perimeter', 'profile', 'prio', 'criticality', 'test_state')
+
 def view_data():
     """
     Affiche toutes les données dans le terminal
@@ -21,25 +25,29 @@ def view_data():
     print("🚀 ALTEN - Visualisation des Données")
     print("=" * 80)
     
-    # Récupérer toutes les données
-    queryset = CasDeTest.objects.all()
+    total = CasDeTest.objects.count()
     
-    if not queryset.exists():
+    if not total:
         print("❌ Aucune donnée trouvée dans la base")
         return
     
-    print(f"📊 Total: {queryset.count()} cas de test\n")
+    print(f"📊 Total: {total} cas de test\n")
     
     # En-tête du tableau
     print(f"{'ID':<4} {'Projet':<10} {'Périmètre':<15} {'Profil':<12} {'Priorité':<8} {'Criticité':<9} {'État':<12}")
     print("-" * 80)
     
-    # Afficher chaque ligne
-    for cas in queryset:
-        print(f"{cas.id:<4} {cas.projet:<10} {cas.test_perimeter:<15} {cas.profile:<12} {cas.prio:<8} {cas.criticality:<9} {cas.test_state:<12}")
+    # Afficher chaque ligne (lecture par lots, mémoire constante)
+    rows = CasDeTest.objects.order_by('pk').values_list(*DISPLAY_COLUMNS).iterator(chunk_size=2000)
+    for pk, projet, perimeter, profile, prio, criticality, state in rows:
+        print(f"{pk:<4} {projet:<10} {perimeter:<15} {profile:<12} {prio:<8} {criticality:<9} {state:<12}")
     
     print("-" * 80)
-    print(f"📊 Total: {queryset.count()} cas de test")
+    print(f"📊 Total: {total} cas de test")
+
+def _counts(field):
+    """Comptes par valeur d'une colonne, en une requête GROUP BY"""
+    return {row[field]: row['count'] for row in count_by([field], order_by=field)}
 
 def view_summary():
     """
@@ -48,32 +56,26 @@ def view_summary():
     print("\n📈 RÉSUMÉ STATISTIQUE")
     print("=" * 40)
     
-    queryset = CasDeTest.objects.all()
-    
     # Statistiques par priorité
     print("\n🎯 Par Priorité:")
+    counts = _counts('prio')
     for prio in ['High', 'Medium', 'Low']:
-        count = queryset.filter(prio=prio).count()
-        print(f"   {prio:<8}: {count:>3} cas")
+        print(f"   {prio:<8}: {counts.get(prio, 0):>3} cas")
     
     # Statistiques par criticité
     print("\n⚡ Par Criticité:")
+    counts = _counts('criticality')
     for crit in ['High', 'Medium', 'Low']:
-        count = queryset.filter(criticality=crit).count()
-        print(f"   {crit:<8}: {count:>3} cas")
+        print(f"   {crit:<8}: {counts.get(crit, 0):>3} cas")
     
     # Statistiques par état
     print("\n📋 Par État:")
-    states = queryset.values_list('test_state', flat=True).distinct().order_by('test_state')
-    for state in states:
-        count = queryset.filter(test_state=state).count()
+    for state, count in _counts('test_state').items():
         print(f"   {state:<12}: {count:>3} cas")
     
     # Statistiques par projet
     print("\n🏗️ Par Projet:")
-    projects = queryset.values_list('projet', flat=True).distinct().order_by('projet')
-    for project in projects:
-        count = queryset.filter(projet=project).count()
+    for project, count in _counts('projet').items():
         print(f"   {project:<10}: {count:>3} cas")
 
 if __name__ == "__main__":